@@ -5,11 +5,16 @@ export interface Player {
     name: string;
     avatar: string;
     funds: number;
-    user_id: string;
-    labs: Lab[];
+    labs: LabSummary[];
     investments: Investment[];
 }
 
+export interface PlayerSummary {
+    id: string;
+    name: string;
+    avatar: string;
+}
+
 export interface Employee {
     id: string;
     name: string;
@@ -17,9 +22,7 @@ export interface Employee {
     image_url: string;
     role_id: number;
     quality_id: number;
-    lab_id: string;
-    // modifiers: Modifier[];
-    lab: Lab;
+    lab_id: string | null;
 }
 
 export interface AIModel {
@@ -31,12 +34,12 @@ export interface AIModel {
 }
 
 export interface Investor {
-    player: Player;
+    player: PlayerSummary;
     part: number;
 }
 
 export interface Investment {
-    lab: Lab;
+    lab: LabSummary;
     part: number;
 }
 
@@ -45,7 +48,7 @@ export interface UpdateFunds {
     update_type: "increment" | "decrement";
 }
 
-export interface Lab {
+export interface LabSummary {
     id: string;
     name: string;
     location: string;
@@ -53,10 +56,13 @@ export interface Lab {
     income: number;
     tech_tree_id: string;
     player_id: string;
+}
+
+export interface Lab extends LabSummary {
     employees: Employee[];
     models: AIModel[];
     investors: Investor[];
-    player: Player | null;
+    player: PlayerSummary | null;
 }
 
 function createPlayerStore() {
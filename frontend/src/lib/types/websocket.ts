@@ -9,6 +9,9 @@ export const GameActions = {
     RETRIEVE_LAB: "retrieve-lab",
     RETRIEVE_PLAYER_DATA: "retrieve-player-data",
     UPDATE_FUNDS: "update-funds",
+    BATCH: "batch",
+    PING: "ping",
+    PONG: "pong",
 } as const;
 
 export type GameAction = typeof GameActions[keyof typeof GameActions];
@@ -16,10 +19,13 @@ export type GameAction = typeof GameActions[keyof typeof GameActions];
 export interface GameMessage {
     action: GameAction;
     payload: Record<string, any>;
+    /** Echoed in the responses, to match them when messages are sent without waiting. */
+    request_id?: string;
 }
 
 export interface GameMessageResponse {
     action: GameAction;
     payload: Record<string, any>;
     error?: string;
+    request_id?: string;
 }
@@ -79,10 +79,20 @@ export class GameWebSocketClient {
                     reason: event.reason,
                     wasClean: event.wasClean
                 });
+                if (event.code === 1013) {
+                    // The server is admitting too many connections at once, reconnect after the delay it asks for
+                    const retryAfter = Number(event.reason.match(/retry-after=(\d+)/)?.[1] ?? 5);
+                    setTimeout(() => this.connectWebSocket().catch(console.error), retryAfter * 1000);
+                }
             };
 
             this.socket.onmessage = (event) => {
                 const data: GameMessageResponse = JSON.parse(event.data);
+                if (data.action === GameActions.PING) {
+                    // Heartbeat of the server, which closes the connections that stop answering
+                    this.sendCommand(GameActions.PONG);
+                    return;
+                }
                 this.gameContext.messages = [...this.gameContext.messages, JSON.stringify(data)];
 
                 if (data.error) {
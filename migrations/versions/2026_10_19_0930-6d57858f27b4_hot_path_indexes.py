@@ -0,0 +1,50 @@
+"""hot path indexes
+
+Revision ID: 6d57858f27b4
+Revises: 9d6146e29abc
+Create Date: 2026-10-19 09:30:12.184523
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6d57858f27b4"
+down_revision: Union[str, None] = "9d6146e29abc"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The id columns are primary keys, which are already indexed
+    op.drop_index(op.f("ix_users_id"), table_name="users")
+    op.drop_index(op.f("ix_players_id"), table_name="players")
+    op.drop_index(op.f("ix_labs_id"), table_name="labs")
+    op.drop_index(op.f("ix_ai_models_id"), table_name="ai_models")
+    op.drop_index(op.f("ix_employees_id"), table_name="employees")
+    # Foreign keys and filters used by the CRUD lookups
+    op.create_index(op.f("ix_labs_player_id"), "labs", ["player_id"], unique=False)
+    op.create_index(op.f("ix_labs_valuation"), "labs", ["valuation"], unique=False)
+    op.create_index(op.f("ix_ai_models_name"), "ai_models", ["name"], unique=False)
+    op.create_index(op.f("ix_ai_models_lab_id"), "ai_models", ["lab_id"], unique=False)
+    op.create_index(op.f("ix_employees_lab_id"), "employees", ["lab_id"], unique=False)
+    op.create_index(
+        op.f("ix_player_lab_investment_link_lab_id"), "player_lab_investment_link", ["lab_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_player_lab_investment_link_lab_id"), table_name="player_lab_investment_link")
+    op.drop_index(op.f("ix_employees_lab_id"), table_name="employees")
+    op.drop_index(op.f("ix_ai_models_lab_id"), table_name="ai_models")
+    op.drop_index(op.f("ix_ai_models_name"), table_name="ai_models")
+    op.drop_index(op.f("ix_labs_valuation"), table_name="labs")
+    op.drop_index(op.f("ix_labs_player_id"), table_name="labs")
+    op.create_index(op.f("ix_employees_id"), "employees", ["id"], unique=True)
+    op.create_index(op.f("ix_ai_models_id"), "ai_models", ["id"], unique=True)
+    op.create_index(op.f("ix_labs_id"), "labs", ["id"], unique=True)
+    op.create_index(op.f("ix_players_id"), "players", ["id"], unique=True)
+    op.create_index(op.f("ix_users_id"), "users", ["id"], unique=True)
@@ -0,0 +1,42 @@
+"""uuid key storage
+
+Revision ID: d5a71c62a6f2
+Revises: 6d57858f27b4
+Create Date: 2026-10-19 10:15:48.602371
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+from aiventure.config import settings
+from aiventure.keys import convert_keys
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d5a71c62a6f2"
+down_revision: Union[str, None] = "6d57858f27b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# UUID columns of the tables at this revision, later revisions convert the tables they create
+KEY_COLUMNS = {
+    "users": ["id"],
+    "players": ["id", "user_id"],
+    "labs": ["id", "player_id"],
+    "ai_models": ["id", "lab_id"],
+    "employees": ["id", "lab_id"],
+    "player_lab_investment_link": ["player_id", "lab_id"],
+    "employee_modifier_link": ["employee_id"],
+}
+
+
+def upgrade() -> None:
+    # Keys are created as text, rewrite them when the binary storage is configured
+    if settings.db_uuid_keys == "binary":
+        convert_keys(op.get_bind(), binary=True, tables=KEY_COLUMNS)
+
+
+def downgrade() -> None:
+    convert_keys(op.get_bind(), binary=False, tables=KEY_COLUMNS)
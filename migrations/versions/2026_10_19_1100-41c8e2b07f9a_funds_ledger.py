@@ -0,0 +1,52 @@
+"""funds ledger
+
+Revision ID: 41c8e2b07f9a
+Revises: d5a71c62a6f2
+Create Date: 2026-10-19 11:00:27.519846
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from aiventure.keys import UUIDKey
+
+
+# revision identifiers, used by Alembic.
+revision: str = "41c8e2b07f9a"
+down_revision: Union[str, None] = "d5a71c62a6f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Created empty, so its keys are written in the configured storage and need no conversion
+    op.create_table(
+        "funds_ledger",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("player_id", UUIDKey(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("reason", sa.Enum("INCOME", "CREATE_LAB", "CREATE_MODEL", name="fundsreasonenum"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["player_id"],
+            ["players.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_funds_ledger_player_id_id", "funds_ledger", ["player_id", "id"], unique=False)
+    # Existing funds become the first snapshot, with no ledger entry folded yet
+    op.add_column("players", sa.Column("ledger_seq", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    # Fold the ledger tail into the funds before dropping it
+    op.execute(
+        "UPDATE players SET funds = funds + COALESCE((SELECT SUM(amount) FROM funds_ledger "
+        "WHERE funds_ledger.player_id = players.id AND funds_ledger.id > players.ledger_seq), 0)"
+    )
+    op.drop_column("players", "ledger_seq")
+    op.drop_index("ix_funds_ledger_player_id_id", table_name="funds_ledger")
+    op.drop_table("funds_ledger")
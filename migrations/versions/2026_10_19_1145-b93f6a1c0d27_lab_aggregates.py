@@ -0,0 +1,49 @@
+"""lab aggregates
+
+Revision ID: b93f6a1c0d27
+Revises: 41c8e2b07f9a
+Create Date: 2026-10-19 11:45:03.277195
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from aiventure.constants import EMPLOYEE_VALUATION_QUALITY_MULTIPLIERS
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b93f6a1c0d27"
+down_revision: Union[str, None] = "41c8e2b07f9a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("labs", sa.Column("model_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("labs", sa.Column("employee_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("labs", sa.Column("employee_quality_sum", sa.Float(), nullable=False, server_default="0"))
+    op.add_column("labs", sa.Column("investor_count", sa.Integer(), nullable=False, server_default="0"))
+    # Backfill the aggregates of the existing labs
+    quality_multiplier = " ".join(
+        f"WHEN {quality_id} THEN {multiplier}"
+        for quality_id, multiplier in EMPLOYEE_VALUATION_QUALITY_MULTIPLIERS.items()
+    )
+    op.execute(
+        "UPDATE labs SET "
+        "model_count = (SELECT COUNT(*) FROM ai_models WHERE ai_models.lab_id = labs.id), "
+        "employee_count = (SELECT COUNT(*) FROM employees WHERE employees.lab_id = labs.id), "
+        f"employee_quality_sum = (SELECT COALESCE(SUM(CASE quality_id {quality_multiplier} ELSE 0 END), 0) "
+        "FROM employees WHERE employees.lab_id = labs.id), "
+        "investor_count = (SELECT COUNT(*) FROM player_lab_investment_link "
+        "WHERE player_lab_investment_link.lab_id = labs.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("labs", "investor_count")
+    op.drop_column("labs", "employee_quality_sum")
+    op.drop_column("labs", "employee_count")
+    op.drop_column("labs", "model_count")
@@ -0,0 +1,27 @@
+"""player version
+
+Revision ID: 5c2e8d41a7f3
+Revises: b93f6a1c0d27
+Create Date: 2026-10-19 12:30:11.482530
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c2e8d41a7f3"
+down_revision: Union[str, None] = "b93f6a1c0d27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("players", sa.Column("version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    op.drop_column("players", "version")
@@ -0,0 +1,31 @@
+"""funds ledger operation id
+
+Revision ID: 8a4f1e6b2c90
+Revises: 5c2e8d41a7f3
+Create Date: 2026-10-19 13:15:42.907316
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from aiventure.keys import UUIDKey
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8a4f1e6b2c90"
+down_revision: Union[str, None] = "5c2e8d41a7f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("funds_ledger", sa.Column("operation_id", UUIDKey(), nullable=True))
+    op.create_index("ix_funds_ledger_operation_id", "funds_ledger", ["operation_id"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_funds_ledger_operation_id", table_name="funds_ledger")
+    op.drop_column("funds_ledger", "operation_id")
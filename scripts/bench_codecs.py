@@ -0,0 +1,86 @@
+"""Compare the JSON and MessagePack encodings of the game websocket messages.
+
+Run it from the repository root with the `msgpack` extra installed:
+
+    uv run --extra msgpack python scripts/bench_codecs.py
+"""
+
+import timeit
+import uuid
+
+from aiventure.codecs import JSON, MESSAGE_PACK, Codec
+from aiventure.game_manager import GameAction, encode_response, game_message_adapter
+from aiventure.models import (
+    AIModelDataResponse,
+    EmployeeSummary,
+    FundsUpdate,
+    Investor,
+    LabDataResponse,
+    PlayerSummary,
+)
+
+
+def lab_snapshot(n_employees: int = 10, n_models: int = 10, n_investors: int = 5) -> LabDataResponse:
+    """Build a lab snapshot as sent after each model creation."""
+    lab_id = str(uuid.uuid4())
+    player = PlayerSummary(id=str(uuid.uuid4()), name="Player", avatar="avatar.png")
+
+    return LabDataResponse(
+        id=lab_id,
+        name="Lab Zero",
+        location="us",
+        valuation=123_456.78,
+        income=1.25,
+        tech_tree_id=str(uuid.uuid4()),
+        player_id=player.id,
+        employees=[
+            EmployeeSummary(
+                id=str(uuid.uuid4()),
+                name=f"Employee {i}",
+                salary=1000,
+                image_url="avatar.png",
+                role_id=i % 25 + 1,
+                quality_id=i % 7 + 1,
+                lab_id=lab_id,
+            )
+            for i in range(n_employees)
+        ],
+        models=[
+            AIModelDataResponse(
+                id=str(uuid.uuid4()),
+                name=f"Model {i}",
+                ai_model_type_id=i % 4 + 1,
+                tech_tree_id=str(uuid.uuid4()),
+                lab_id=lab_id,
+            )
+            for i in range(n_models)
+        ],
+        investors=[Investor(player=player, part=1 / n_investors) for _ in range(n_investors)],
+        player=player,
+    )
+
+
+def bench(label: str, codec: Codec, action: GameAction, payload: LabDataResponse | FundsUpdate, number: int) -> None:
+    """Print the size and the encoding time of a response, and the decoding time of a client message."""
+    encoded = encode_response(action, payload, codec=codec)
+    encode = timeit.timeit(lambda: encode_response(action, payload, codec=codec), number=number) / number
+
+    message = codec.encode_data({"action": "create-lab", "payload": {"name": "Lab Zero", "location": "us"}})
+    decode = timeit.timeit(lambda: codec.decode(message, game_message_adapter), number=number) / number
+
+    print(f"{label:<14} {codec.name:<8} {len(encoded):>7,} B {encode * 1e6:>9.1f} us {decode * 1e6:>9.1f} us")
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    snapshot = lab_snapshot()
+    funds = FundsUpdate(funds=1_234_567.89, update_type="increment")
+
+    print(f"{'message':<14} {'codec':<8} {'size':>9} {'encode':>12} {'decode':>12}")
+    for codec in (JSON, MESSAGE_PACK):
+        bench("lab snapshot", codec, GameAction.RETRIEVE_LAB, snapshot, 2_000)
+        bench("funds update", codec, GameAction.UPDATE_FUNDS, funds, 20_000)
+
+
+if __name__ == "__main__":
+    main()
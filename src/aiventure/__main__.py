@@ -1,12 +1,17 @@
 """Main entry point for the package."""
 
+import asyncio
 import os
-from typing import Annotated
+from typing import Annotated, Literal
 
 import typer
 from typer import Typer
 
 from aiventure import __version__
+from aiventure.database import convert_database_keys
+from aiventure.revaluation import RevaluationConfig, revalue_labs
+from aiventure.seed import Distribution, SeedConfig, seed_world
+from aiventure.simulation import Percentiles, Policy, SimulationConfig, simulate
 
 
 app = Typer(name="AI Venture CLI", no_args_is_help=True)
@@ -27,6 +32,120 @@ def run(
     os.system("uv run fastapi dev src/aiventure/api.py --reload")
 
 
+@app.command()
+def seed(
+    players: Annotated[int, typer.Option(help="Number of users and players to create.")] = 1_000,
+    labs_per_player: Annotated[float, typer.Option(help="Mean number of labs per player.")] = 1.0,
+    models_per_lab: Annotated[float, typer.Option(help="Mean number of AI models per lab.")] = 3.0,
+    employees_per_lab: Annotated[float, typer.Option(help="Mean number of employees per lab.")] = 5.0,
+    investments_per_player: Annotated[float, typer.Option(help="Mean number of investments in other labs.")] = 0.5,
+    distribution: Annotated[Distribution, typer.Option(help="Distribution of the per-entity counts.")] = (
+        Distribution.PARETO
+    ),
+    batch_size: Annotated[int, typer.Option(help="Number of rows per bulk insert.")] = 10_000,
+    random_seed: Annotated[int | None, typer.Option("--seed", help="Random seed for reproducible worlds.")] = None,
+    db: Annotated[str | None, typer.Option(help="Database connection string, defaults to the settings.")] = None,
+) -> None:
+    """Populate the database with a synthetic world for scale testing."""
+    config = SeedConfig(
+        players=players,
+        labs_per_player=labs_per_player,
+        models_per_lab=models_per_lab,
+        employees_per_lab=employees_per_lab,
+        investments_per_player=investments_per_player,
+        distribution=distribution,
+        batch_size=batch_size,
+        seed=random_seed,
+    )
+    report = asyncio.run(seed_world(config, db))
+
+    for table, rows in report.rows.items():
+        typer.echo(f"{table}: {rows:,} rows")
+    typer.secho(
+        f"Seeded in {report.elapsed:.1f}s ({report.rows_per_second:,.0f} rows/s)",
+        fg=typer.colors.GREEN,
+    )
+
+
+@app.command()
+def convert_keys(
+    to: Annotated[Literal["text", "binary"], typer.Option(help="Target storage of the UUID keys.")],
+    db: Annotated[str | None, typer.Option(help="Database connection string, defaults to the settings.")] = None,
+) -> None:
+    """Rewrite the UUID keys of an existing database, set DB_UUID_KEYS accordingly afterwards."""
+    n_rows = asyncio.run(convert_database_keys(binary=to == "binary", db_connection_str=db))
+
+    typer.secho(f"Converted {n_rows:,} rows to {to} keys", fg=typer.colors.GREEN)
+
+
+@app.command()
+def revalue(
+    chunk_size: Annotated[int, typer.Option(help="Number of labs read and updated at once.")] = 50_000,
+    recount: Annotated[bool, typer.Option(help="Recount the models, employees and investors of every lab first.")] = (
+        False
+    ),
+    db: Annotated[str | None, typer.Option(help="Database connection string, defaults to the settings.")] = None,
+) -> None:
+    """Recompute the income and valuation of every lab, e.g. after changing the economy constants."""
+    report = asyncio.run(revalue_labs(RevaluationConfig(chunk_size=chunk_size, recount=recount), db))
+
+    typer.secho(
+        f"Revalued {report.labs:,} labs ({report.updated:,} updated) in {report.elapsed:.1f}s "
+        f"({report.labs_per_second:,.0f} labs/s)",
+        fg=typer.colors.GREEN,
+    )
+
+
+@app.command(name="simulate")
+def simulate_economy(
+    players: Annotated[int, typer.Option(help="Number of simulated players.")] = 1_000,
+    ticks: Annotated[int, typer.Option(help="Number of income ticks to fast-forward.")] = 1_440,
+    policy: Annotated[
+        list[str] | None,
+        typer.Option(help="Share of the players following a policy, as name=weight, e.g. --policy expander=0.5."),
+    ] = None,
+    max_labs_per_player: Annotated[int, typer.Option(help="Maximum number of labs per player.")] = 10,
+    models_per_lab: Annotated[int, typer.Option(help="Models target per lab of the balanced policy.")] = 5,
+    sample_every: Annotated[int, typer.Option(help="Number of ticks between two leaderboard samples.")] = 60,
+    random_seed: Annotated[int | None, typer.Option("--seed", help="Random seed for reproducible runs.")] = None,
+) -> None:
+    """Simulate the economy offline with the game formulas, to tune the balance constants."""
+    config = SimulationConfig(
+        players=players,
+        ticks=ticks,
+        max_labs_per_player=max_labs_per_player,
+        models_per_lab=models_per_lab,
+        sample_every=sample_every,
+        seed=random_seed,
+    )
+    if policy:
+        try:
+            config.policies = {Policy(name): float(weight) for name, weight in (item.split("=") for item in policy)}
+        except ValueError as e:
+            raise typer.BadParameter(f"Expected name=weight with a name in {[p.value for p in Policy]}") from e
+
+    report = simulate(config)
+
+    def describe(name: str, values: Percentiles) -> None:
+        typer.echo(
+            f"{name}: mean {values.mean:,.0f} | p10 {values.p10:,.0f} | p50 {values.p50:,.0f} | "
+            f"p90 {values.p90:,.0f} | p99 {values.p99:,.0f} | max {values.max:,.0f} | gini {values.gini:.2f}"
+        )
+
+    typer.echo(f"{report.players:,} players, {report.labs:,} labs, {report.models:,} models")
+    describe("Player funds", report.funds)
+    describe("Lab valuation", report.valuation)
+    if report.churn:
+        typer.echo(
+            f"Leaderboard churn per sample: mean {sum(report.churn) / len(report.churn):.1%} | "
+            f"last {report.churn[-1]:.1%}"
+        )
+    typer.secho(
+        f"Simulated {report.ticks:,} ticks in {report.elapsed:.1f}s ({report.ticks_per_second:,.0f} ticks/s)",
+        fg=typer.colors.GREEN,
+    )
+
+
 @app.command()
 def version() -> None:
     """Show the version of the CLI."""
@@ -0,0 +1,132 @@
+"""Per-player actors, serializing everything that changes the state of a player."""
+
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+from aiventure.constants import PLAYER_ACTOR_IDLE_TIMEOUT
+from aiventure.metrics import metrics
+
+
+logger = logging.getLogger("uvicorn.error")
+
+T = TypeVar("T")
+
+Work = Callable[[], Awaitable[Any]]
+"""Message of a mailbox, run by the actor of the player."""
+
+
+class PlayerActor:
+    """Task owning the state of a player, running the messages of its mailbox one at a time.
+
+    The websocket actions, income credits and events of other players changing a player are all sent to its actor,
+    so they never interleave and need neither locks nor retries, while the actors of different players run in
+    parallel. A message runs in the context of its sender, e.g. for `count_queries` to see its queries.
+    """
+
+    def __init__(self, player_id: str, idle_timeout: float, on_stop: Callable[["PlayerActor"], None]) -> None:
+        """Initialize the actor and start its task."""
+        self.player_id = player_id
+        self.idle_timeout = idle_timeout
+        self.mailbox: asyncio.Queue[tuple[Work, asyncio.Future[Any], contextvars.Context, float]] = asyncio.Queue()
+        self._on_stop = on_stop
+        self.task = asyncio.create_task(self._run(), name=f"player-actor-{player_id}")
+
+    def send(self, work: Work) -> asyncio.Future[Any]:
+        """Add a message to the mailbox, returning the future of its result."""
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self.mailbox.put_nowait((work, future, contextvars.copy_context(), time.perf_counter()))
+        metrics.observe("game.actors.mailbox_size", self.mailbox.qsize())
+        return future
+
+    async def _run(self) -> None:
+        """Run the messages until the mailbox stays empty for `idle_timeout` seconds."""
+        current: asyncio.Future[Any] | None = None
+        try:
+            while True:
+                try:
+                    work, future, context, sent_at = await asyncio.wait_for(self.mailbox.get(), self.idle_timeout)
+                except TimeoutError:
+                    # No await between here and the removal from the actors, so no message can be sent in between
+                    if self.mailbox.empty():
+                        return
+                    continue
+
+                current = future
+                metrics.observe("game.actors.mailbox_wait", time.perf_counter() - sent_at)
+                await self._handle(work, future, context)
+        finally:
+            self._on_stop(self)
+            if current is not None:
+                current.cancel()
+            while not self.mailbox.empty():
+                self.mailbox.get_nowait()[1].cancel()
+
+    @staticmethod
+    async def _handle(work: Work, future: asyncio.Future[Any], context: contextvars.Context) -> None:
+        """Run a message in the context of its sender, unless the sender stopped waiting for it."""
+        if future.cancelled():
+            return
+
+        async def run() -> Any:
+            return await work()
+
+        try:
+            result = await asyncio.create_task(run(), context=context)
+        except Exception as e:
+            if not future.cancelled():
+                future.set_exception(e)
+        else:
+            if not future.cancelled():
+                future.set_result(result)
+
+
+class PlayerActors:
+    """Actors of the players, started by their first message and stopped once idle."""
+
+    def __init__(self, idle_timeout: float = PLAYER_ACTOR_IDLE_TIMEOUT) -> None:
+        """Initialize without actors."""
+        self.idle_timeout = idle_timeout
+        self._actors: dict[str, PlayerActor] = {}
+
+    def actor(self, player_id: str) -> PlayerActor:
+        """Actor of a player, started if the player has none."""
+        actor = self._actors.get(player_id)
+        if actor is None or actor.task.done():
+            actor = PlayerActor(player_id, self.idle_timeout, self._remove)
+            self._actors[player_id] = actor
+            metrics.set_gauge("game.actors.active", len(self._actors))
+        return actor
+
+    async def ask(self, player_id: str, work: Callable[[], Awaitable[T]]) -> T:
+        """Run a message in the actor of a player and return its result."""
+        result: T = await self.actor(player_id).send(work)
+        return result
+
+    def tell(self, player_id: str, work: Work) -> None:
+        """Send a message to the actor of a player without waiting for it, its failure being logged."""
+        self.actor(player_id).send(work).add_done_callback(self._log_failure)
+
+    async def stop(self) -> None:
+        """Stop all the actors, cancelling their pending messages."""
+        actors = list(self._actors.values())
+        for actor in actors:
+            actor.task.cancel()
+        await asyncio.gather(*(actor.task for actor in actors), return_exceptions=True)
+
+    def _remove(self, actor: PlayerActor) -> None:
+        """Forget a stopped actor."""
+        if self._actors.get(actor.player_id) is actor:
+            del self._actors[actor.player_id]
+            metrics.set_gauge("game.actors.active", len(self._actors))
+
+    @staticmethod
+    def _log_failure(future: asyncio.Future[Any]) -> None:
+        """Log the failure of a message nobody waits for."""
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Player actor message failed: {future.exception()}")
+
+
+actors = PlayerActors()
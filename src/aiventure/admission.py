@@ -0,0 +1,83 @@
+"""Admission control of the game websocket handshakes."""
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import WebSocket
+
+from aiventure.codecs import Codec, accepted_subprotocol
+from aiventure.config import settings
+from aiventure.metrics import metrics
+
+
+TRY_AGAIN_LATER = 1013
+"""Websocket close code of the handshakes rejected by the admission control."""
+
+
+class AdmissionController:
+    """Bound the number of concurrent handshakes, queueing a bounded number of others and rejecting the rest.
+
+    After a deploy every client reconnects at once; each handshake decodes a token and reads the user, so the
+    handshakes are let through `max_concurrent` at a time. Rejected clients are told to retry after a randomized
+    delay, which spreads their next attempts instead of repeating the storm.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float, retry_after: int) -> None:
+        """Initialize the controller."""
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[bool]:
+        """Hold a handshake slot during the block, yielding False if the handshake must be rejected instead."""
+        start = time.perf_counter()
+        admitted = await self._acquire()
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self._slots.release()
+                metrics.observe("game.admission.handshake_latency", time.perf_counter() - start)
+
+    async def reject(self, websocket: WebSocket, codec: Codec) -> None:
+        """Close a rejected handshake, telling the client when to retry."""
+        metrics.increment("game.admission.rejected")
+        await websocket.accept(subprotocol=accepted_subprotocol(websocket, codec))
+        await websocket.close(code=TRY_AGAIN_LATER, reason=f"retry-after={self.jittered_retry_after()}")
+
+    def jittered_retry_after(self) -> int:
+        """Seconds to wait before reconnecting, randomized between `retry_after` and twice as much."""
+        return random.randint(self.retry_after, 2 * self.retry_after)
+
+    async def _acquire(self) -> bool:
+        """Wait for a handshake slot in the queue, unless the queue is full or the wait times out."""
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            return False
+
+        start = time.perf_counter()
+        self.waiting += 1
+        metrics.set_gauge("game.admission.queue_depth", self.waiting)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+            metrics.set_gauge("game.admission.queue_depth", self.waiting)
+
+        metrics.observe("game.admission.queue_wait", time.perf_counter() - start)
+        return True
+
+
+admission = AdmissionController(
+    settings.game_max_handshakes,
+    settings.game_handshake_queue,
+    settings.game_handshake_queue_timeout,
+    settings.game_reconnect_retry_after,
+)
@@ -0,0 +1,63 @@
+"""Aggregate of the player of a game connection, kept in memory between the actions."""
+
+from aiventure.models import Investment, LabSummary, PlayerDataResponse
+
+
+class PlayerAggregate:
+    """Player of a connection with their labs and investments, updated from the results of the connection writes.
+
+    `version` is the `players.version` the aggregate reflects. Each write of the connection applies its change to the
+    aggregate, then compares the version it reads back from the database: a different version means that the labs or
+    investments of the player were changed elsewhere, and that the aggregate must be read again.
+    """
+
+    def __init__(self, data: PlayerDataResponse, version: int) -> None:
+        """Initialize the aggregate from the player data read at the given version."""
+        self.data = data
+        self.version = version
+
+    @property
+    def id(self) -> str:
+        """Id of the player."""
+        return self.data.id
+
+    @property
+    def funds(self) -> float:
+        """Funds of the player, a lower bound as the income is credited outside of the connection."""
+        return self.data.funds
+
+    def owned_lab(self, lab_id: str) -> LabSummary | None:
+        """Lab of the player with the given id, if the player owns it."""
+        return next((lab for lab in self.data.labs if lab.id == lab_id), None)
+
+    def is_current(self, version: int) -> bool:
+        """Whether the aggregate reflects the given version of the player."""
+        return version == self.version
+
+    def set_funds(self, funds: float) -> None:
+        """Set the funds read back from the database."""
+        self.data.funds = funds
+
+    def add_lab(self, lab: LabSummary) -> None:
+        """Add a lab created by the player, who owns all of its parts."""
+        lab = _summary(lab)
+        self.data.labs.append(lab)
+        self.data.investments.append(Investment(lab=lab, part=1.0))
+        self.version += 1
+
+    def update_lab(self, lab: LabSummary) -> None:
+        """Replace the values of a lab of the player, e.g. after a revaluation."""
+        lab = _summary(lab)
+        self.data.labs = [lab if owned.id == lab.id else owned for owned in self.data.labs]
+        for investment in self.data.investments:
+            if investment.lab.id == lab.id:
+                investment.lab = lab
+
+
+def _summary(lab: LabSummary) -> LabSummary:
+    """Lab summary without the relationships of a lab response, which the player data doesn't hold."""
+    return (
+        lab
+        if type(lab) is LabSummary
+        else LabSummary.model_validate(lab.model_dump(include=set(LabSummary.model_fields)))
+    )
@@ -0,0 +1,114 @@
+"""Wire encodings of the game websocket messages."""
+
+from abc import ABC, abstractmethod
+from typing import Any, cast
+
+from fastapi import WebSocket
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+
+class Codec(ABC):
+    """Encoding of the messages exchanged on a game websocket."""
+
+    name: str
+    subprotocol: str | None = None
+
+    @abstractmethod
+    def encode(self, message: BaseModel) -> str | bytes:
+        """Encode a message."""
+
+    @abstractmethod
+    def encode_data(self, data: dict[str, Any]) -> str | bytes:
+        """Encode a plain dictionary."""
+
+    @abstractmethod
+    def decode(self, data: str | bytes, adapter: TypeAdapter) -> Any:
+        """Validate a received frame against the type of the given adapter."""
+
+    @abstractmethod
+    async def send(self, websocket: WebSocket, data: str | bytes) -> None:
+        """Send an encoded message."""
+
+    @abstractmethod
+    async def receive(self, websocket: WebSocket) -> str | bytes:
+        """Receive a frame."""
+
+
+class JsonCodec(Codec):
+    """JSON text frames, the default encoding."""
+
+    name = "json"
+
+    def encode(self, message: BaseModel) -> str:
+        """Encode a message."""
+        return message.model_dump_json()
+
+    def encode_data(self, data: dict[str, Any]) -> str:
+        """Encode a plain dictionary."""
+        return to_json(data).decode()
+
+    def decode(self, data: str | bytes, adapter: TypeAdapter) -> Any:
+        """Validate a received frame against the type of the given adapter."""
+        return adapter.validate_json(data)
+
+    async def send(self, websocket: WebSocket, data: str | bytes) -> None:
+        """Send an encoded message."""
+        await websocket.send_text(data)  # type: ignore[arg-type]
+
+    async def receive(self, websocket: WebSocket) -> str:
+        """Receive a frame."""
+        return await websocket.receive_text()
+
+
+class MessagePackCodec(Codec):
+    """MessagePack binary frames, smaller and cheaper to decode for the clients receiving many updates."""
+
+    name = "msgpack"
+    subprotocol = "aiventure.msgpack"
+
+    def encode(self, message: BaseModel) -> bytes:
+        """Encode a message."""
+        return cast(bytes, msgpack.packb(message.model_dump(mode="json")))
+
+    def encode_data(self, data: dict[str, Any]) -> bytes:
+        """Encode a plain dictionary."""
+        return cast(bytes, msgpack.packb(data))
+
+    def decode(self, data: str | bytes, adapter: TypeAdapter) -> Any:
+        """Validate a received frame against the type of the given adapter."""
+        return adapter.validate_python(msgpack.unpackb(data))
+
+    async def send(self, websocket: WebSocket, data: str | bytes) -> None:
+        """Send an encoded message."""
+        await websocket.send_bytes(data)  # type: ignore[arg-type]
+
+    async def receive(self, websocket: WebSocket) -> bytes:
+        """Receive a frame."""
+        return await websocket.receive_bytes()
+
+
+JSON = JsonCodec()
+MESSAGE_PACK = MessagePackCodec()
+
+
+def negotiate_codec(websocket: WebSocket) -> Codec:
+    """Pick the encoding requested with the `aiventure.msgpack` subprotocol or `?encoding=msgpack`.
+
+    JSON is used by default, and whenever MessagePack is requested but `msgpack` is not installed.
+    """
+    requested = MESSAGE_PACK.subprotocol in websocket.scope.get("subprotocols", []) or (
+        websocket.query_params.get("encoding") == MESSAGE_PACK.name
+    )
+    return MESSAGE_PACK if requested and msgpack is not None else JSON
+
+
+def accepted_subprotocol(websocket: WebSocket, codec: Codec) -> str | None:
+    """Subprotocol to confirm when accepting a websocket, the one of the encoding if the client requested it."""
+    return codec.subprotocol if codec.subprotocol in websocket.scope.get("subprotocols", []) else None
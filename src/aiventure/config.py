@@ -2,8 +2,46 @@
 
 from __future__ import annotations
 
-from pydantic import Field
+from typing import Any, Literal
+
+from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from sqlalchemy.engine import make_url
+
+
+SQLITE_PROFILES: dict[str, dict[str, Any]] = {
+    "default": {},
+    "throughput": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,
+        "busy_timeout": 5_000,
+        "temp_store": "MEMORY",
+    },
+}
+"""SQLite pragma presets, the `default` profile keeps the driver defaults untouched.
+
+    throughput: WAL journal so readers never block the writer, fsync only at checkpoints, 256 MiB of memory-mapped
+    I/O, a 64 MiB page cache, 5s of retries on a locked database and temporary tables kept in memory.
+"""
+
+POOL_DEFAULTS: dict[str, dict[str, Any]] = {
+    "sqlite": {"pool_size": 5, "max_overflow": 10, "pool_pre_ping": False, "pool_recycle": -1, "pool_timeout": 30},
+    "postgresql": {
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+        "pool_timeout": 10,
+    },
+    "mysql": {"pool_size": 10, "max_overflow": 20, "pool_pre_ping": True, "pool_recycle": 3600, "pool_timeout": 10},
+}
+"""Connection pool defaults per database backend.
+
+    SQLite connections are local files that never go stale, while network databases close idle connections on their
+    side and benefit from pre-ping and recycling.
+"""
 
 
 class Settings(BaseSettings):
@@ -19,6 +57,166 @@ class Settings(BaseSettings):
         default="sqlite+aiosqlite:///aiventure.db",
         description="The connection string for the database.",
     )
+    db_profile: Literal["default", "throughput"] = Field(
+        alias="DB_PROFILE",
+        default="default",
+        description="The SQLite pragma preset applied on every new connection.",
+    )
+    db_journal_mode: Literal["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"] | None = Field(
+        alias="DB_JOURNAL_MODE",
+        default=None,
+        description="Override of the SQLite journal_mode pragma.",
+    )
+    db_synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] | None = Field(
+        alias="DB_SYNCHRONOUS",
+        default=None,
+        description="Override of the SQLite synchronous pragma.",
+    )
+    db_mmap_size: int | None = Field(
+        alias="DB_MMAP_SIZE",
+        default=None,
+        description="Override of the SQLite mmap_size pragma, in bytes.",
+    )
+    db_cache_size: int | None = Field(
+        alias="DB_CACHE_SIZE",
+        default=None,
+        description="Override of the SQLite cache_size pragma, in pages or in KiB when negative.",
+    )
+    db_busy_timeout: int | None = Field(
+        alias="DB_BUSY_TIMEOUT",
+        default=None,
+        description="Override of the SQLite busy_timeout pragma, in milliseconds.",
+    )
+    db_temp_store: Literal["DEFAULT", "FILE", "MEMORY"] | None = Field(
+        alias="DB_TEMP_STORE",
+        default=None,
+        description="Override of the SQLite temp_store pragma.",
+    )
+    db_pool_size: int | None = Field(
+        alias="DB_POOL_SIZE",
+        default=None,
+        description="The number of connections kept open by the pool, defaults depend on the backend.",
+    )
+    db_max_overflow: int | None = Field(
+        alias="DB_MAX_OVERFLOW",
+        default=None,
+        description="The number of connections that can be opened beyond the pool size.",
+    )
+    db_pool_pre_ping: bool | None = Field(
+        alias="DB_POOL_PRE_PING",
+        default=None,
+        description="Whether to test connections for liveness on checkout.",
+    )
+    db_pool_recycle: int | None = Field(
+        alias="DB_POOL_RECYCLE",
+        default=None,
+        description="The age in seconds after which a connection is replaced, -1 to never recycle.",
+    )
+    db_pool_timeout: float | None = Field(
+        alias="DB_POOL_TIMEOUT",
+        default=None,
+        description="The number of seconds to wait for a connection before giving up.",
+    )
+    db_pool_warmup: bool = Field(
+        alias="DB_POOL_WARMUP",
+        default=True,
+        description="Whether to open the pool connections and prime the statement cache at startup.",
+    )
+    db_uuid_keys: Literal["text", "binary"] = Field(
+        alias="DB_UUID_KEYS",
+        default="text",
+        description="The storage of UUID keys, 36 characters of text or 16 bytes.",
+    )
+    db_uuid_version: Literal[4, 7] = Field(
+        alias="DB_UUID_VERSION",
+        default=4,
+        description="The UUID version of new keys, 7 generates time-ordered keys.",
+    )
+    # Write-behind buffer
+    write_behind_enabled: bool = Field(
+        alias="WRITE_BEHIND_ENABLED",
+        default=False,
+        description="Whether to buffer funds and lab metrics updates in memory and write them in batches.",
+    )
+    write_behind_flush_interval_ms: int = Field(
+        alias="WRITE_BEHIND_FLUSH_INTERVAL_MS",
+        default=500,
+        description="The maximum time in milliseconds an update stays in the write-behind buffer.",
+    )
+    write_behind_max_ops: int = Field(
+        alias="WRITE_BEHIND_MAX_OPS",
+        default=1000,
+        description="The number of pending operations that triggers an early flush of the write-behind buffer.",
+    )
+    write_behind_journal_path: str | None = Field(
+        alias="WRITE_BEHIND_JOURNAL_PATH",
+        default=None,
+        description="The file journaling buffered operations to replay them after a crash, disabled if unset.",
+    )
+    write_behind_journal_fsync: bool = Field(
+        alias="WRITE_BEHIND_JOURNAL_FSYNC",
+        default=False,
+        description="Whether to fsync the journal after every operation, surviving power loss and not only crashes.",
+    )
+    # Game websocket
+    game_max_in_flight: int = Field(
+        alias="GAME_MAX_IN_FLIGHT",
+        default=8,
+        ge=1,
+        description="The number of read actions of a game connection processed concurrently.",
+    )
+    game_rate_limit: float | None = Field(
+        alias="GAME_RATE_LIMIT",
+        default=20.0,
+        description="The number of messages per second a game connection can send, unlimited if unset.",
+    )
+    game_rate_limit_burst: int = Field(
+        alias="GAME_RATE_LIMIT_BURST",
+        default=40,
+        ge=1,
+        description="The number of messages a game connection can send at once before being limited.",
+    )
+    game_rate_limit_max_wait: float = Field(
+        alias="GAME_RATE_LIMIT_MAX_WAIT",
+        default=0.5,
+        ge=0,
+        description="The seconds a message over the rate limit is held back, rejecting it if it would wait longer.",
+    )
+    game_action_rate_limits: dict[str, float] = Field(
+        alias="GAME_ACTION_RATE_LIMITS",
+        default={"create-lab": 1.0, "create-model": 5.0, "batch": 1.0},
+        description="The number of messages per second of each action a game connection can send, as JSON.",
+    )
+    game_action_rate_limit_burst: int = Field(
+        alias="GAME_ACTION_RATE_LIMIT_BURST",
+        default=5,
+        ge=1,
+        description="The number of messages of an action a game connection can send at once before being limited.",
+    )
+    game_max_handshakes: int = Field(
+        alias="GAME_MAX_HANDSHAKES",
+        default=32,
+        ge=1,
+        description="The number of game websocket handshakes authenticated concurrently.",
+    )
+    game_handshake_queue: int = Field(
+        alias="GAME_HANDSHAKE_QUEUE",
+        default=256,
+        ge=0,
+        description="The number of game websocket handshakes waiting for a slot, the next ones being rejected.",
+    )
+    game_handshake_queue_timeout: float = Field(
+        alias="GAME_HANDSHAKE_QUEUE_TIMEOUT",
+        default=5.0,
+        gt=0,
+        description="The seconds a game websocket handshake waits for a slot before being rejected.",
+    )
+    game_reconnect_retry_after: int = Field(
+        alias="GAME_RECONNECT_RETRY_AFTER",
+        default=5,
+        ge=1,
+        description="The seconds a rejected client waits before reconnecting, randomized up to twice as long.",
+    )
     # Auth
     openssl_key: str = Field(
         alias="OPENSSL_KEY",
@@ -36,5 +234,44 @@ class Settings(BaseSettings):
         description="The expiration time for the JWT token in minutes.",
     )
 
+    @field_validator("db_uuid_version", mode="before")
+    @classmethod
+    def parse_uuid_version(cls, value: Any) -> Any:
+        """Accept the UUID version as a string, as read from the environment."""
+        return int(value) if isinstance(value, str) and value.isdigit() else value
+
+    @property
+    def sqlite_pragmas(self) -> dict[str, Any]:
+        """The pragmas of the selected profile, with the individual overrides applied on top."""
+        overrides = {
+            "journal_mode": self.db_journal_mode,
+            "synchronous": self.db_synchronous,
+            "mmap_size": self.db_mmap_size,
+            "cache_size": self.db_cache_size,
+            "busy_timeout": self.db_busy_timeout,
+            "temp_store": self.db_temp_store,
+        }
+        return SQLITE_PROFILES[self.db_profile] | {key: value for key, value in overrides.items() if value is not None}
+
+    def get_pool_options(self, db_connection_str: str | None = None) -> dict[str, Any]:
+        """The connection pool options of the backend, with the individual overrides applied on top.
+
+        In-memory SQLite databases live in a single shared connection and do not accept pool options.
+        """
+        url = make_url(db_connection_str or self.db_connection_str)
+        if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+            return {}
+
+        overrides = {
+            "pool_size": self.db_pool_size,
+            "max_overflow": self.db_max_overflow,
+            "pool_pre_ping": self.db_pool_pre_ping,
+            "pool_recycle": self.db_pool_recycle,
+            "pool_timeout": self.db_pool_timeout,
+        }
+        return POOL_DEFAULTS.get(url.get_backend_name(), POOL_DEFAULTS["postgresql"]) | {
+            key: value for key, value in overrides.items() if value is not None
+        }
+
 
 settings = Settings()
@@ -26,8 +26,28 @@ EMPLOYEE_VALUATION_QUALITY_MULTIPLIERS = {
     Legendary: 2.2 = +120%
     Star: 3.0 = +200%
 """
+QUALITY_WEIGHTS = [30, 25, 20, 12, 7, 4, 2]
+"""Relative odds of drawing each employee quality, from poor (1) to star (7)."""
 INCOME_TICK_RATE = 60
 """Number of seconds per tick for handling income for labs."""
+FUNDS_SNAPSHOT_RATE = 300
+"""Number of seconds between two folds of the funds ledger into the players funds."""
+GLOBAL_STATE_BROADCAST_DELAY = 1
+"""Number of seconds the global game state broadcast waits for other connections, sending it once for all of them."""
+HEARTBEAT_INTERVAL = 20
+"""Number of seconds between two heartbeats sent to each game connection."""
+HEARTBEAT_TIMEOUT = 60
+"""Number of seconds without any message after which a game connection is considered dead."""
+CONNECTION_IDLE_TIMEOUT = 1800
+"""Number of seconds without any action other than heartbeats after which a game connection is closed."""
+BATCH_MAX_ACTIONS = 20
+"""Maximum number of actions in a batch."""
+PLAYER_ACTOR_IDLE_TIMEOUT = 300
+"""Number of seconds without messages after which the actor of a player stops."""
+STATE_FULL_RESYNC_INTERVAL = 50
+"""Number of state versions between two full states sent to a delta-synchronized connection."""
+STATE_MAX_PENDING_VERSIONS = 16
+"""Number of unacknowledged state versions after which a delta-synchronized connection gets a full state."""
 LOCATION_VALUATION_MULTIPLIER = {
     "us": 1.05,
     "eu": 0.95,
@@ -0,0 +1,166 @@
+"""Database engine factory."""
+
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+from sqlalchemy import Executable, event, exc
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+from sqlmodel import col, select
+
+from aiventure.config import settings
+from aiventure.keys import convert_keys
+from aiventure.metrics import metrics
+from aiventure.models import AIModel, Lab, Player, PlayerLabInvestmentLink, User
+
+
+_SYNCHRONOUS = {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"}
+_TEMP_STORE = {0: "DEFAULT", 1: "FILE", 2: "MEMORY"}
+_NIL_ID = str(uuid.UUID(int=0))
+
+WARM_UP_STATEMENTS: list[Executable] = [
+    select(User).where(col(User.email) == ""),
+    select(Player).where(col(Player.id) == _NIL_ID),
+    select(Player).where(col(Player.user_id) == _NIL_ID),
+    select(Lab).where(col(Lab.id) == _NIL_ID),
+    select(Lab).where(col(Lab.player_id) == _NIL_ID),
+    select(AIModel).where(col(AIModel.name) == ""),
+    select(PlayerLabInvestmentLink).where(col(PlayerLabInvestmentLink.player_id) == _NIL_ID),
+]
+"""Hot path queries executed on every pooled connection at startup to prime the statement caches."""
+
+
+class QueryCounter:
+    """Number of statements sent to the database, see `count_queries`."""
+
+    def __init__(self) -> None:
+        """Initialize the counter."""
+        self.count = 0
+
+
+_query_counter: ContextVar[QueryCounter | None] = ContextVar("query_counter", default=None)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """Count the statements executed by the current task, through any engine created by `create_engine`."""
+    counter = QueryCounter()
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool reporting checkout wait time, usage and exhaustion events to the metrics."""
+
+    def connect(self) -> PoolProxiedConnection:
+        """Check out a connection, waiting for one to be returned when the pool is exhausted."""
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            metrics.increment("db.pool.exhausted")
+            raise
+        finally:
+            metrics.observe("db.pool.checkout_wait", time.perf_counter() - start)
+            metrics.set_gauge("db.pool.checked_out", self.checkedout())
+            metrics.set_gauge("db.pool.overflow", max(self.overflow(), 0))
+
+    def _do_return_conn(self, record: Any) -> None:
+        """Return a connection to the pool."""
+        super()._do_return_conn(record)
+        metrics.set_gauge("db.pool.checked_out", self.checkedout())
+
+
+def create_engine(db_connection_str: str | None = None, **kwargs: Any) -> AsyncEngine:
+    """Create the async engine with the configured pool, applying the pragmas on every new SQLite connection."""
+    pool_options = settings.get_pool_options(db_connection_str)
+    if pool_options:
+        pool_options["poolclass"] = InstrumentedQueuePool
+
+    async_engine = create_async_engine(
+        db_connection_str or settings.db_connection_str, future=True, **(pool_options | kwargs)
+    )
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def count_query(*_: Any) -> None:
+        """Count the statement in the counter of the current task, if any."""
+        counter = _query_counter.get()
+        if counter is not None:
+            counter.count += 1
+
+    pragmas = settings.sqlite_pragmas
+    if async_engine.dialect.name == "sqlite" and pragmas:
+
+        @event.listens_for(async_engine.sync_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection: Any, _: Any) -> None:
+            """Apply the pragmas to a freshly opened connection."""
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+            cursor.close()
+
+    return async_engine
+
+
+async def warm_up(async_engine: AsyncEngine) -> int:
+    """Open every connection of the pool and prime the statement caches with the hot path queries.
+
+    Connections are all checked out at once so that the pool has to create each of them, then executing the
+    statements through an ORM session fills both the engine compiled cache and the driver statement cache of each
+    connection. Returns the number of warmed up connections.
+    """
+    pool = async_engine.sync_engine.pool
+    size = pool.size() if isinstance(pool, AsyncAdaptedQueuePool) else 1
+
+    connections: list[AsyncConnection] = []
+    try:
+        for _ in range(size):
+            connection = await async_engine.connect()
+            connections.append(connection)
+
+            async with AsyncSession(bind=connection) as session:
+                for statement in WARM_UP_STATEMENTS:
+                    await session.execute(statement)
+                await session.rollback()
+
+    finally:
+        for connection in connections:
+            await connection.close()
+
+    return len(connections)
+
+
+async def read_sqlite_pragmas(async_engine: AsyncEngine) -> dict[str, Any]:
+    """Read back the pragmas that are actually active on a connection of the engine."""
+    if async_engine.dialect.name != "sqlite":
+        return {}
+
+    active: dict[str, Any] = {}
+    async with async_engine.connect() as connection:
+        for name in ("journal_mode", "synchronous", "mmap_size", "cache_size", "busy_timeout", "temp_store"):
+            result = await connection.exec_driver_sql(f"PRAGMA {name}")
+            active[name] = result.scalar()
+
+    active["journal_mode"] = str(active["journal_mode"]).upper()
+    active["synchronous"] = _SYNCHRONOUS.get(active["synchronous"], active["synchronous"])
+    active["temp_store"] = _TEMP_STORE.get(active["temp_store"], active["temp_store"])
+
+    return active
+
+
+async def convert_database_keys(binary: bool, db_connection_str: str | None = None) -> int:
+    """Rewrite the UUID keys of an existing database to the binary or text storage, in a single transaction."""
+    async_engine = create_engine(db_connection_str)
+
+    try:
+        async with async_engine.begin() as connection:
+            return await connection.run_sync(convert_keys, binary)
+
+    finally:
+        await async_engine.dispose()
@@ -1,7 +1,8 @@
 """Regroup all the database CRUD operations."""
 
 from .ai_model import AIModelCRUD, AIModelTypeCRUD
-from .base import BaseCRUD
+from .base import BaseCRUD, unit_of_work
+from .employee import EmployeeCRUD
 from .lab import LabCRUD
 from .location import LocationCRUD
 from .modifier import ModifierCRUD, ModifierTypeCRUD
@@ -16,6 +17,7 @@ __all__ = [
     "AIModelCRUD",
     "AIModelTypeCRUD",
     "BaseCRUD",
+    "EmployeeCRUD",
     "LabCRUD",
     "LocationCRUD",
     "ModifierCRUD",
@@ -26,4 +28,5 @@ __all__ = [
     "RoleCategoryCRUD",
     "RoleCRUD",
     "UsersCRUD",
+    "unit_of_work",
 ]
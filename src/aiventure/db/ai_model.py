@@ -5,7 +5,8 @@ from uuid import UUID
 from sqlmodel import col, select
 
 from aiventure.db.base import BaseCRUD
-from aiventure.models import AIModel, AIModelBase, AIModelType, AIModelTypeBase, Lab
+from aiventure.db.lab import LabCRUD
+from aiventure.models import AIModel, AIModelBase, AIModelType, AIModelTypeBase
 
 
 class AIModelTypeCRUD(BaseCRUD):
@@ -16,7 +17,7 @@ class AIModelTypeCRUD(BaseCRUD):
         ai_model_type = AIModelType(**ai_model_type.model_dump())
 
         self.session.add(ai_model_type)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(ai_model_type)
 
         return ai_model_type
@@ -40,7 +41,7 @@ class AIModelTypeCRUD(BaseCRUD):
 
         _ai_model_type.name = ai_model_type.name or _ai_model_type.name
 
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(_ai_model_type)
 
         return _ai_model_type
@@ -49,12 +50,13 @@ class AIModelTypeCRUD(BaseCRUD):
 class AIModelCRUD(BaseCRUD):
     """CRUD operations for the ai_models table."""
 
-    async def create(self, ai_model: AIModelBase, lab: Lab) -> AIModel:
+    async def create(self, ai_model: AIModelBase) -> AIModel:
         """Create a new AI model."""
         ai_model = AIModel(**ai_model.model_dump())
 
         self.session.add(ai_model)
-        await self.session.commit()
+        await LabCRUD(self.session).increment_aggregates(ai_model.lab_id, model_count=1)
+        await self.commit()
         await self.session.refresh(ai_model)
 
         return ai_model
@@ -78,7 +80,7 @@ class AIModelCRUD(BaseCRUD):
 
         _ai_model.name = ai_model.name or _ai_model.name
 
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(_ai_model)
 
         return _ai_model
@@ -3,14 +3,34 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
 from types import TracebackType
-from typing import Any, TypeVar
+from typing import Any, AsyncIterator, TypeVar
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 T = TypeVar("T", bound="BaseCRUD")
 
+_UNIT_OF_WORK = "unit_of_work"
+
+
+@asynccontextmanager
+async def unit_of_work(session: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """Run the CRUD operations of the block in a single transaction, committed at the end of the block.
+
+    The CRUD operations only flush their changes instead of committing them, and a failure rolls back all of them.
+    """
+    session.info[_UNIT_OF_WORK] = True
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        del session.info[_UNIT_OF_WORK]
+
 
 class BaseCRUD(ABC):
     """Base CRUD class."""
@@ -26,11 +46,25 @@ class BaseCRUD(ABC):
     async def __aexit__(
         self, exc_type: type | None, exc_value: Exception | None, traceback: TracebackType | None
     ) -> None:
-        """Exit the context manager."""
+        """Exit the context manager, leaving the session to the unit of work running it if any."""
+        if self.in_unit_of_work:
+            return
         if exc_type is not None:
             await self.rollback()
         await self.session.close()
 
+    @property
+    def in_unit_of_work(self) -> bool:
+        """Whether the operations run within a unit of work, see `unit_of_work`."""
+        return bool(self.session.info.get(_UNIT_OF_WORK, False))
+
+    async def commit(self) -> None:
+        """Commit the session, or only flush it within a unit of work, which commits once at its end."""
+        if self.in_unit_of_work:
+            await self.session.flush()
+        else:
+            await self.session.commit()
+
     async def rollback(self) -> None:
         """Rollback the session."""
         await self.session.rollback()
@@ -0,0 +1,79 @@
+"""Database operations for the employees table."""
+
+from typing import Sequence
+
+from sqlmodel import col, select
+
+from aiventure import economy
+from aiventure.db.base import BaseCRUD
+from aiventure.db.lab import LabCRUD
+from aiventure.models import Employee, EmployeeBase
+
+
+class EmployeeCRUD(BaseCRUD):
+    """CRUD operations for the employees table, keeping the employee aggregates of the labs up to date."""
+
+    async def create(self, employee: EmployeeBase) -> Employee:
+        """Create a new employee."""
+        employee = Employee(**employee.model_dump())
+
+        self.session.add(employee)
+        if employee.lab_id:
+            await self._increment_lab(employee.lab_id, employee.quality_id, 1)
+        await self.commit()
+        await self.session.refresh(employee)
+
+        return employee
+
+    async def get_by_id(self, employee_id: str) -> Employee | None:
+        """Get an employee by id."""
+        employee = await self.session.execute(select(Employee).where(col(Employee.id) == employee_id))
+        return employee.scalar_one_or_none()
+
+    async def get_by_lab_id(self, lab_id: str) -> Sequence[Employee]:
+        """Get all employees of a lab."""
+        employees = await self.session.execute(select(Employee).where(col(Employee.lab_id) == lab_id))
+        return employees.scalars().all()
+
+    async def update(self, employee: EmployeeBase) -> Employee | None:
+        """Update an employee, moving them to another lab or changing their quality."""
+        _employee = await self.get_by_id(employee.id)
+
+        if _employee is None:
+            return None
+
+        if _employee.lab_id:
+            await self._increment_lab(_employee.lab_id, _employee.quality_id, -1)
+        if employee.lab_id:
+            await self._increment_lab(employee.lab_id, employee.quality_id, 1)
+
+        _employee.name = employee.name or _employee.name
+        _employee.salary = employee.salary or _employee.salary
+        _employee.quality_id = employee.quality_id
+        _employee.lab_id = employee.lab_id
+
+        self.session.add(_employee)
+        await self.commit()
+        await self.session.refresh(_employee)
+
+        return _employee
+
+    async def delete(self, employee_id: str) -> None:
+        """Delete an employee."""
+        employee = await self.get_by_id(employee_id)
+
+        if employee is None:
+            return None
+
+        if employee.lab_id:
+            await self._increment_lab(employee.lab_id, employee.quality_id, -1)
+        await self.session.delete(employee)
+        await self.commit()
+
+    async def _increment_lab(self, lab_id: str, quality_id: int, count: int) -> None:
+        """Add or remove an employee of the given quality from the aggregates of a lab."""
+        await LabCRUD(self.session).increment_aggregates(
+            lab_id,
+            employee_count=count,
+            employee_quality_sum=count * economy.employee_quality_multiplier(quality_id),
+        )
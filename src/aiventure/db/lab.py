@@ -1,91 +1,190 @@
 """Lab CRUD operations"""
 
-from typing import Sequence
+from collections import defaultdict
+from typing import Any, Callable, Collection, Sequence
 
-from sqlalchemy.orm import selectinload
+from sqlalchemy import Row, Select, case, func, update
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlmodel import col, select
 
+from aiventure.constants import EMPLOYEE_VALUATION_QUALITY_MULTIPLIERS
 from aiventure.db.base import BaseCRUD
-from aiventure.models import Lab, LabBase, Player, PlayerLabInvestmentLink
+from aiventure.db.loaders import LAB_SUMMARY, LoaderProfile
+from aiventure.db.player import PlayerCRUD
+from aiventure.db.projections import columns, lab_summary
+from aiventure.models import (
+    AIModel,
+    AIModelDataResponse,
+    Employee,
+    EmployeeSummary,
+    Investor,
+    Lab,
+    LabBase,
+    LabDataResponse,
+    LabIncludeEnum,
+    LabSummary,
+    Player,
+    PlayerLabInvestmentLink,
+    PlayerSummary,
+)
+from aiventure.write_buffer import write_buffer
 
 
 class LabCRUD(BaseCRUD):
     """CRUD operations for the lab table."""
 
-    async def create(self, lab: LabBase, player: Player) -> Lab:
-        """Create a new lab."""
-        lab_link = PlayerLabInvestmentLink(player=player, lab=Lab(**lab.model_dump()), part=1.0)
+    async def create(self, lab: LabBase) -> Lab:
+        """Create a new lab, owned entirely by its player."""
+        _lab = Lab(**lab.model_dump(), investor_count=1)
 
-        self.session.add(lab_link)
-        await self.session.commit()
-        await self.session.refresh(lab_link)
+        self.session.add(_lab)
+        self.session.add(PlayerLabInvestmentLink(player_id=_lab.player_id, lab_id=_lab.id, part=1.0))
+        await PlayerCRUD(self.session).increment_version(_lab.player_id)
+        await self.commit()
 
-        # We retrieve the full lab from the database to expose created data to the client
-        lab = await self.read_by_id(lab_link.lab_id)
-        if not lab:
-            raise ValueError("Lab not found")
+        return _lab
 
-        return lab
-
-    async def get_by_id(self, lab_id: str) -> Lab | None:
-        """Get a lab by id."""
-        lab = await self.session.execute(select(Lab).where(col(Lab.id) == lab_id))
+    async def get_by_id(self, lab_id: str, profile: LoaderProfile = LAB_SUMMARY) -> Lab | None:
+        """Get a lab by id, with the relationships of the given loader profile."""
+        lab = await self.session.execute(profile.apply(select(Lab).where(col(Lab.id) == lab_id)))
         return lab.scalar_one_or_none()
 
-    async def get_by_player_id(self, player_id: str) -> Sequence[Lab]:
-        """Get all labs by player id."""
-        labs = await self.session.execute(select(Lab).where(col(Lab.player_id) == player_id))
-        return labs.scalars().all()
+    async def get_by_player_id(self, player_id: str, profile: LoaderProfile = LAB_SUMMARY) -> Sequence[Lab]:
+        """Get all labs by player id, with the relationships of the given loader profile."""
+        labs = await self.session.execute(profile.apply(select(Lab).where(col(Lab.player_id) == player_id)))
+        return labs.scalars().unique().all()
 
     async def update(self) -> Lab | None:
         """Update a lab."""
         pass
 
-    async def read_by_id(self, lab_id: str) -> Lab | None:
-        """Read a lab by id."""
-        lab = await self.session.execute(
-            select(Lab)
-            .where(col(Lab.id) == lab_id)
-            .options(
-                selectinload(Lab.player),
-                selectinload(Lab.employees),
-                selectinload(Lab.models),
-                selectinload(Lab.investors),
+    async def read_data_by_id(
+        self, lab_id: str, include: Collection[LabIncludeEnum] | None = None
+    ) -> LabDataResponse | None:
+        """Read the response of a lab by id, with the given relationships or all of them."""
+        labs = await self._read_data(lambda query: query.where(col(Lab.id) == lab_id), include)
+        return labs[0] if labs else None
+
+    async def read_leaderboard(
+        self, limit: int = 100, include: Collection[LabIncludeEnum] | None = None
+    ) -> list[LabDataResponse]:
+        """Read the responses of the most valued labs, with the given relationships or all of them."""
+        return await self._read_data(lambda query: query.order_by(col(Lab.valuation).desc()).limit(limit), include)
+
+    async def _read_data(
+        self, filter_labs: Callable[[Select], Select], include: Collection[LabIncludeEnum] | None
+    ) -> list[LabDataResponse]:
+        """Build the responses of the selected labs, with one projection query per included relationship.
+
+        The relationships that are not included are neither queried nor serialized, so that the labs alone are read
+        with a single query on the `labs` table.
+        """
+        include = set(LabIncludeEnum) if include is None else set(include)
+
+        query = select(*columns(Lab, LabSummary))
+        if LabIncludeEnum.PLAYER in include:
+            query = query.add_columns(
+                col(Player.name).label("player_name"), col(Player.avatar).label("player_avatar")
+            ).outerjoin(Player, col(Player.id) == col(Lab.player_id))
+        labs = (await self.session.execute(filter_labs(query))).all()
+        if not labs:
+            return []
+
+        lab_ids = [lab.id for lab in labs]
+        relations: dict[str, dict[str, list[Any]]] = {}
+        if LabIncludeEnum.EMPLOYEES in include:
+            relations["employees"] = await self._group_by_lab(
+                select(*columns(Employee, EmployeeSummary)).where(col(Employee.lab_id).in_(lab_ids)),
+                lambda row: EmployeeSummary.model_validate(row._mapping),
             )
-        )
-        return lab.scalar_one_or_none()
-
-    async def read_all_for_leaderboard(self) -> Sequence[Lab]:
-        """Read all labs for the leaderboard."""
-        labs = await self.session.execute(
-            select(Lab)
-            .order_by(col(Lab.valuation).desc())
-            .options(
-                selectinload(Lab.player),
-                selectinload(Lab.employees),
-                selectinload(Lab.models),
-                selectinload(Lab.investors),
+        if LabIncludeEnum.MODELS in include:
+            relations["models"] = await self._group_by_lab(
+                select(*columns(AIModel, AIModelDataResponse)).where(col(AIModel.lab_id).in_(lab_ids)),
+                lambda row: AIModelDataResponse.model_validate(row._mapping),
+            )
+        if LabIncludeEnum.INVESTORS in include:
+            relations["investors"] = await self._group_by_lab(
+                select(
+                    col(PlayerLabInvestmentLink.lab_id),
+                    col(PlayerLabInvestmentLink.part),
+                    *columns(Player, PlayerSummary),
+                )
+                .join(Player, col(Player.id) == col(PlayerLabInvestmentLink.player_id))
+                .where(col(PlayerLabInvestmentLink.lab_id).in_(lab_ids)),
+                lambda row: Investor(player=PlayerSummary.model_validate(row._mapping), part=row.part),
             )
-            .limit(100)
-        )
-        return labs.scalars().all()
+
+        responses = []
+        for lab in labs:
+            fields: dict[str, Any] = {name: groups[lab.id] for name, groups in relations.items()}
+            if LabIncludeEnum.PLAYER in include:
+                fields["player"] = (
+                    PlayerSummary(id=lab.player_id, name=lab.player_name, avatar=lab.player_avatar)
+                    if lab.player_name is not None
+                    else None
+                )
+            responses.append(LabDataResponse.model_validate(lab_summary(lab).model_dump() | fields))
+
+        return responses
+
+    async def _group_by_lab(self, query: Select, build: Callable[[Row], Any]) -> dict[str, list[Any]]:
+        """Run a query selecting a `lab_id` column and group the objects built from its rows by lab."""
+        groups: dict[str, list[Any]] = defaultdict(list)
+        for row in await self.session.execute(query):
+            groups[row.lab_id].append(build(row))
+        return groups
 
     async def update_valuation(self, lab_id: str) -> Lab | None:
         """Update the valuation of a lab."""
-        lab = await self.read_by_id(lab_id)
-        if lab:
+        lab = await self.get_by_id(lab_id)
+        if lab and write_buffer.enabled and not self.in_unit_of_work:
+            valuation = lab.calculate_valuation()
+            await write_buffer.set_lab_metrics(lab_id, valuation=valuation)
+            set_committed_value(lab, "valuation", valuation)
+        elif lab:
             lab.valuation = lab.calculate_valuation()
-            await self.session.commit()
+            await self.commit()
             await self.session.refresh(lab)
 
         return lab
 
     async def update_income(self, lab_id: str) -> Lab | None:
         """Update the income of a lab."""
-        lab = await self.read_by_id(lab_id)
-        if lab:
+        lab = await self.get_by_id(lab_id)
+        if lab and write_buffer.enabled and not self.in_unit_of_work:
+            income = lab.calculate_income()
+            await write_buffer.set_lab_metrics(lab_id, income=income)
+            set_committed_value(lab, "income", income)
+        elif lab:
             lab.income = lab.calculate_income()
-            await self.session.commit()
+            await self.commit()
             await self.session.refresh(lab)
 
         return lab
+
+    async def increment_aggregates(self, lab_id: str, **deltas: float) -> None:
+        """Increment aggregates such as `model_count`, within the transaction of the caller."""
+        await self.session.execute(
+            update(Lab)
+            .where(col(Lab.id) == lab_id)
+            .values({name: getattr(Lab, name) + delta for name, delta in deltas.items()})
+        )
+
+    async def recount_aggregates(self) -> None:
+        """Recompute the aggregates of every lab from the relationship tables."""
+        quality_multiplier = case(EMPLOYEE_VALUATION_QUALITY_MULTIPLIERS, value=col(Employee.quality_id), else_=0.0)
+        await self.session.execute(
+            update(Lab)
+            .values(
+                model_count=select(func.count()).where(col(AIModel.lab_id) == col(Lab.id)).scalar_subquery(),
+                employee_count=select(func.count()).where(col(Employee.lab_id) == col(Lab.id)).scalar_subquery(),
+                employee_quality_sum=select(func.coalesce(func.sum(quality_multiplier), 0.0))
+                .where(col(Employee.lab_id) == col(Lab.id))
+                .scalar_subquery(),
+                investor_count=select(func.count())
+                .where(col(PlayerLabInvestmentLink.lab_id) == col(Lab.id))
+                .scalar_subquery(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await self.commit()
@@ -0,0 +1,62 @@
+"""Loader profiles, declaring the relationships loaded by each query.
+
+The relationships of the models are declared with `lazy="raise"`: an entity is loaded with its columns only, and
+accessing a relationship that the query didn't load raises instead of emitting queries. Queries needing relationships
+load them with one of these profiles, so the cost of a query is decided where it is written.
+"""
+
+from typing import Any
+
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.sql.base import ExecutableOption
+
+from aiventure.models import Lab, Player, PlayerLabInvestmentLink
+
+
+class LoaderProfile:
+    """Named set of loader options, applied to a query with `apply`."""
+
+    def __init__(self, name: str, *options: ExecutableOption) -> None:
+        """Initialize the profile."""
+        self.name = name
+        self.options = options
+
+    def apply(self, query: Any) -> Any:
+        """Add the loader options of the profile to a query."""
+        return query.options(*self.options) if self.options else query
+
+    def __repr__(self) -> str:
+        """Name the profile."""
+        return f"LoaderProfile({self.name!r})"
+
+
+PLAYER_SUMMARY = LoaderProfile("player_summary")
+"""Player columns only, e.g. to update the funds."""
+
+PLAYER_DETAIL = LoaderProfile(
+    "player_detail",
+    selectinload(Player.labs),  # type: ignore[arg-type]
+    selectinload(Player.investments).joinedload(PlayerLabInvestmentLink.lab),  # type: ignore[arg-type]
+)
+"""Player with their labs and the labs they invested in, in three queries."""
+
+LAB_SUMMARY = LoaderProfile("lab_summary")
+"""Lab columns only, which include the aggregates the income and valuation formulas use."""
+
+LEADERBOARD_ROW = LoaderProfile("leaderboard_row", joinedload(Lab.player))  # type: ignore[arg-type]
+"""Lab with its owner, joined in the same query."""
+
+LAB_DETAIL = LoaderProfile(
+    "lab_detail",
+    joinedload(Lab.player),  # type: ignore[arg-type]
+    selectinload(Lab.employees),  # type: ignore[arg-type]
+    selectinload(Lab.models),  # type: ignore[arg-type]
+    selectinload(Lab.investors).joinedload(PlayerLabInvestmentLink.player),  # type: ignore[arg-type]
+)
+"""Lab with its owner, employees, models and investors, in four queries."""
+
+INVESTMENT_INCOME = LoaderProfile(
+    "investment_income",
+    joinedload(PlayerLabInvestmentLink.lab).load_only(Lab.income),  # type: ignore[arg-type]
+)
+"""Investment links with the income of their lab, joined in the same query."""
@@ -14,7 +14,7 @@ class LocationCRUD(BaseCRUD):
         location = Location(**location.model_dump())
 
         self.session.add(location)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(location)
 
         return location
@@ -36,7 +36,7 @@ class LocationCRUD(BaseCRUD):
         _location.modifier_id = location.modifier_id or _location.modifier_id
 
         self.session.add(_location)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(_location)
 
         return _location
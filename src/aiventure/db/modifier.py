@@ -14,7 +14,7 @@ class ModifierTypeCRUD(BaseCRUD):
         modifier_type = ModifierType(**modifier_type.model_dump())
 
         self.session.add(modifier_type)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(modifier_type)
 
         return modifier_type
@@ -33,7 +33,7 @@ class ModifierTypeCRUD(BaseCRUD):
 
         _modifier_type.name = modifier_type.name
 
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(_modifier_type)
 
         return _modifier_type
@@ -47,7 +47,7 @@ class ModifierCRUD(BaseCRUD):
         modifier = Modifier(**modifier.model_dump())
 
         self.session.add(modifier)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(modifier)
 
         return modifier
@@ -68,7 +68,7 @@ class ModifierCRUD(BaseCRUD):
         _modifier.description = modifier.description
         _modifier.type_id = modifier.type_id
 
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(_modifier)
 
         return _modifier
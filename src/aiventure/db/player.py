@@ -1,10 +1,27 @@
 """Database operations for the player table."""
 
-from sqlalchemy.orm import selectinload
+from typing import Any
+
+from sqlalchemy import func, text, update
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlmodel import col, select
 
+from aiventure.aggregates import PlayerAggregate
 from aiventure.db.base import BaseCRUD
-from aiventure.models import Player, PlayerBase
+from aiventure.db.loaders import PLAYER_SUMMARY, LoaderProfile
+from aiventure.db.projections import columns, lab_summary
+from aiventure.models import (
+    FundsLedgerEntry,
+    FundsReasonEnum,
+    Investment,
+    Lab,
+    LabSummary,
+    Player,
+    PlayerBase,
+    PlayerDataResponse,
+    PlayerLabInvestmentLink,
+)
+from aiventure.write_buffer import write_buffer
 
 
 class PlayerCRUD(BaseCRUD):
@@ -15,19 +32,19 @@ class PlayerCRUD(BaseCRUD):
         player = Player(**player.model_dump())
 
         self.session.add(player)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(player)
 
         return player
 
-    async def get_by_id(self, player_id: str) -> Player | None:
-        """Get a player by id."""
-        player = await self.session.execute(select(Player).where(col(Player.id) == player_id))
+    async def get_by_id(self, player_id: str, profile: LoaderProfile = PLAYER_SUMMARY) -> Player | None:
+        """Get a player by id, with the relationships of the given loader profile."""
+        player = await self.session.execute(profile.apply(select(Player).where(col(Player.id) == player_id)))
         return player.scalar_one_or_none()
 
-    async def get_by_user_id(self, user_id: str) -> Player | None:
-        """Get a player by user id."""
-        player = await self.session.execute(select(Player).where(col(Player.user_id) == user_id))
+    async def get_by_user_id(self, user_id: str, profile: LoaderProfile = PLAYER_SUMMARY) -> Player | None:
+        """Get a player by user id, with the relationships of the given loader profile."""
+        player = await self.session.execute(profile.apply(select(Player).where(col(Player.user_id) == user_id)))
         return player.scalar_one_or_none()
 
     async def update(self, player: PlayerBase) -> Player | None:
@@ -38,60 +55,151 @@ class PlayerCRUD(BaseCRUD):
             return None
 
         _player.name = player.name or _player.name
-        _player.funds = player.funds or _player.funds
+        if player.funds:
+            # The funds are set as a new snapshot, so the ledger entries recorded so far must not be added anymore
+            last_entry_id = await self.session.execute(
+                select(func.max(FundsLedgerEntry.id)).where(col(FundsLedgerEntry.player_id) == _player.id)
+            )
+            _player.funds = player.funds
+            _player.ledger_seq = last_entry_id.scalar_one_or_none() or _player.ledger_seq
 
         self.session.add(_player)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(_player)
 
         return _player
 
-    async def increment_funds(self, player_id: str, amount: int) -> Player | None:
-        """Increment a player's funds."""
+    async def increment_funds(self, player_id: str, amount: float, reason: FundsReasonEnum) -> Player | None:
+        """Increment a player's funds, recording the change in the funds ledger.
+
+        Within a unit of work, the ledger entry is written in its transaction instead of the write-behind buffer.
+        """
         _player = await self.get_by_id(player_id)
 
         if _player is None:
             return None
 
-        _player.funds += amount
+        if write_buffer.enabled and not self.in_unit_of_work:
+            await write_buffer.add_funds(player_id, amount, reason)
+            set_committed_value(_player, "funds", _player.funds + amount)
+            return _player
 
-        self.session.add(_player)
-        await self.session.commit()
+        self.session.add(FundsLedgerEntry(player_id=player_id, amount=amount, reason=reason))
+        await self.commit()
         await self.session.refresh(_player)
 
         return _player
 
-    async def decrement_funds(self, player_id: str, amount: int) -> Player | None:
-        """Decrement a player's funds."""
+    async def decrement_funds(self, player_id: str, amount: float, reason: FundsReasonEnum) -> Player | None:
+        """Decrement a player's funds, recording the change in the funds ledger.
+
+        Within a unit of work, the ledger entry is written in its transaction instead of the write-behind buffer.
+        """
         _player = await self.get_by_id(player_id)
 
         if _player is None:
             return None
 
-        _player.funds -= amount
+        if write_buffer.enabled and not self.in_unit_of_work:
+            await write_buffer.add_funds(player_id, -amount, reason)
+            set_committed_value(_player, "funds", _player.funds - amount)
+            return _player
 
-        self.session.add(_player)
-        await self.session.commit()
+        self.session.add(FundsLedgerEntry(player_id=player_id, amount=-amount, reason=reason))
+        await self.commit()
         await self.session.refresh(_player)
 
         return _player
 
-    async def read_player_data_by_id(self, player_id: str) -> Player | None:
-        """Read player data by id."""
-        query = (
-            select(Player)
-            .where(col(Player.id) == player_id)
-            .options(selectinload(Player.labs), selectinload(Player.investments))
+    async def increment_version(self, player_id: str) -> None:
+        """Record a change of the labs or investments of a player, within the transaction of the caller."""
+        await self.session.execute(
+            update(Player).where(col(Player.id) == player_id).values(version=col(Player.version) + 1)
         )
-        result = await self.session.execute(query)
-        return result.scalar_one_or_none()
-
-    async def read_player_data_by_user_id(self, user_id: str) -> Player | None:
-        """Read player data by user id."""
-        query = (
-            select(Player)
-            .where(col(Player.user_id) == user_id)
-            .options(selectinload(Player.labs), selectinload(Player.investments))
+
+    async def read_data_by_id(self, player_id: str) -> PlayerDataResponse | None:
+        """Read the response of a player by id."""
+        aggregate = await self._read_aggregate(col(Player.id) == player_id)
+        return aggregate.data if aggregate else None
+
+    async def read_data_by_user_id(self, user_id: str) -> PlayerDataResponse | None:
+        """Read the response of a player by user id."""
+        aggregate = await self._read_aggregate(col(Player.user_id) == user_id)
+        return aggregate.data if aggregate else None
+
+    async def read_aggregate_by_id(self, player_id: str) -> PlayerAggregate | None:
+        """Read the aggregate of a player by id."""
+        return await self._read_aggregate(col(Player.id) == player_id)
+
+    async def read_aggregate_by_user_id(self, user_id: str) -> PlayerAggregate | None:
+        """Read the aggregate of a player by user id."""
+        return await self._read_aggregate(col(Player.user_id) == user_id)
+
+    async def _read_aggregate(self, condition: Any) -> PlayerAggregate | None:
+        """Read a player with their labs and investments, from projections of the needed columns."""
+        result = await self.session.execute(
+            select(  # type: ignore[call-overload]
+                col(Player.id),
+                col(Player.name),
+                col(Player.avatar),
+                (col(Player.funds) + Player.ledger_tail).label("funds"),  # type: ignore[attr-defined]
+                col(Player.version),
+            ).where(condition)
         )
-        result = await self.session.execute(query)
-        return result.scalar_one_or_none()
+        player = result.one_or_none()
+        if player is None:
+            return None
+
+        labs = await self.session.execute(select(*columns(Lab, LabSummary)).where(col(Lab.player_id) == player.id))
+        investments = await self.session.execute(
+            select(col(PlayerLabInvestmentLink.part), *columns(Lab, LabSummary))
+            .join(Lab, col(Lab.id) == col(PlayerLabInvestmentLink.lab_id))
+            .where(col(PlayerLabInvestmentLink.player_id) == player.id)
+        )
+
+        data = PlayerDataResponse(
+            id=player.id,
+            name=player.name,
+            avatar=player.avatar,
+            funds=player.funds + write_buffer.pending_funds(player.id),
+            labs=[lab_summary(lab) for lab in labs],
+            investments=[Investment(lab=lab_summary(lab), part=lab.part) for lab in investments],
+        )
+        return PlayerAggregate(data, player.version)
+
+    async def snapshot_funds(self, since: int = 0) -> int:
+        """Fold the funds ledger entries recorded after `since` into the players funds snapshots.
+
+        Entries are folded up to the last id, which assumes that every entry with a lower id is already committed.
+        SQLite has a single writer so ids become visible in order, while on PostgreSQL ids are allocated before the
+        commit, so the ledger is locked against writes until the snapshot commits, waiting for the pending ones.
+        Returns the id of the last folded entry, to pass as `since` to the next snapshot.
+        """
+        if self.session.get_bind().dialect.name == "postgresql":
+            await self.session.execute(text(f"LOCK TABLE {FundsLedgerEntry.__tablename__} IN SHARE MODE"))
+
+        last_entry_id = (await self.session.execute(select(func.max(FundsLedgerEntry.id)))).scalar_one_or_none()
+        if last_entry_id is None or last_entry_id <= since:
+            return since
+
+        tail = (
+            select(func.coalesce(func.sum(FundsLedgerEntry.amount), 0.0))
+            .where(
+                col(FundsLedgerEntry.player_id) == col(Player.id),
+                col(FundsLedgerEntry.id) > col(Player.ledger_seq),
+                col(FundsLedgerEntry.id) <= last_entry_id,
+            )
+            .scalar_subquery()
+        )
+        updated_players = select(FundsLedgerEntry.player_id).where(
+            col(FundsLedgerEntry.id) > since, col(FundsLedgerEntry.id) <= last_entry_id
+        )
+        await self.session.execute(
+            update(Player)
+            .where(col(Player.id).in_(updated_players))
+            .values(funds=col(Player.funds) + tail, ledger_seq=last_entry_id)
+            .execution_options(synchronize_session=False)
+        )
+        await self.commit()
+
+        return last_entry_id
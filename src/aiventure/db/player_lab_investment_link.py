@@ -2,10 +2,12 @@
 
 from typing import Sequence
 
-from sqlalchemy.orm import selectinload
 from sqlmodel import col, select
 
 from aiventure.db.base import BaseCRUD
+from aiventure.db.lab import LabCRUD
+from aiventure.db.loaders import INVESTMENT_INCOME
+from aiventure.db.player import PlayerCRUD
 from aiventure.models import PlayerLabInvestmentLink
 
 
@@ -17,7 +19,9 @@ class PlayerLabInvestmentLinkCRUD(BaseCRUD):
         link = PlayerLabInvestmentLink(player_id=player_id, lab_id=lab_id, part=part)
 
         self.session.add(link)
-        await self.session.commit()
+        await LabCRUD(self.session).increment_aggregates(lab_id, investor_count=1)
+        await PlayerCRUD(self.session).increment_version(player_id)
+        await self.commit()
         await self.session.refresh(link)
 
         return link
@@ -43,9 +47,9 @@ class PlayerLabInvestmentLinkCRUD(BaseCRUD):
     async def get_income_for_player(self, player_id: str) -> float | None:
         """Get the income for a player."""
         links = await self.session.execute(
-            select(PlayerLabInvestmentLink)
-            .where(col(PlayerLabInvestmentLink.player_id) == player_id)
-            .options(selectinload(PlayerLabInvestmentLink.lab))
+            INVESTMENT_INCOME.apply(
+                select(PlayerLabInvestmentLink).where(col(PlayerLabInvestmentLink.player_id) == player_id)
+            )
         )
         links = links.scalars().all()
         if links is None:
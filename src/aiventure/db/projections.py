@@ -0,0 +1,20 @@
+"""Helpers building the response models from column projections."""
+
+from typing import Any
+
+from pydantic import BaseModel
+from sqlalchemy import Row
+from sqlmodel import col
+
+from aiventure.models import LabSummary
+from aiventure.write_buffer import write_buffer
+
+
+def columns(table: Any, dto: type[BaseModel]) -> list[Any]:
+    """Columns of a table selected to build a response model, one per field."""
+    return [col(getattr(table, name)) for name in dto.model_fields]
+
+
+def lab_summary(row: Row) -> LabSummary:
+    """Build a lab from a row of lab columns, with the metrics pending in the write-behind buffer."""
+    return LabSummary.model_validate(dict(row._mapping) | write_buffer.pending_lab_metrics(row.id))
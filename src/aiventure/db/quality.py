@@ -14,7 +14,7 @@ class QualityCRUD(BaseCRUD):
         quality = Quality(**quality.model_dump())
 
         self.session.add(quality)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(quality)
 
         return quality
@@ -35,7 +35,7 @@ class QualityCRUD(BaseCRUD):
         _quality.hex_color = quality.hex_color or _quality.hex_color
 
         self.session.add(_quality)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(_quality)
 
         return _quality
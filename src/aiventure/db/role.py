@@ -14,7 +14,7 @@ class RoleCategoryCRUD(BaseCRUD):
         role_category = RoleCategory(**role_category.model_dump())
 
         self.session.add(role_category)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(role_category)
 
         return role_category
@@ -35,7 +35,7 @@ class RoleCategoryCRUD(BaseCRUD):
         _role_category.hex_color = role_category.hex_color or _role_category.hex_color
 
         self.session.add(_role_category)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(_role_category)
 
         return _role_category
@@ -49,7 +49,7 @@ class RoleCRUD(BaseCRUD):
         role = Role(**role.model_dump())
 
         self.session.add(role)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(role)
 
         return role
@@ -71,7 +71,7 @@ class RoleCRUD(BaseCRUD):
         _role.category_id = role.category_id or _role.category_id
 
         self.session.add(_role)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(_role)
 
         return _role
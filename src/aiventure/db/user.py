@@ -27,7 +27,7 @@ class UsersCRUD(BaseCRUD):
         user = User(**values)
         self.session.add(user)
 
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(user)
 
         return user
@@ -64,7 +64,7 @@ class UsersCRUD(BaseCRUD):
             return None
 
         await self.session.execute(delete(User).where(col(User.email) == email))
-        await self.session.commit()
+        await self.commit()
 
         return True
 
@@ -77,7 +77,7 @@ class UsersCRUD(BaseCRUD):
 
         user.is_admin = True
 
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(user)
 
         return user
@@ -92,7 +92,7 @@ class UsersCRUD(BaseCRUD):
         _user.email = data.email
 
         self.session.add(_user)
-        await self.session.commit()
+        await self.commit()
         await self.session.refresh(_user)
 
         return _user
@@ -1,39 +1,54 @@
 """Dependencies for the API."""
 
 import asyncio
+import logging
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 from fastapi import FastAPI, Request, WebSocket
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from sqlmodel import SQLModel
 
 from aiventure.config import settings
+from aiventure.database import create_engine, read_sqlite_pragmas, warm_up
 from aiventure.db import UsersCRUD
 from aiventure.game_manager import game_manager
 from aiventure.models import UserCreate
+from aiventure.write_buffer import write_buffer
+
+
+logger = logging.getLogger("uvicorn.error")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Lifespan for the API."""
-    async_engine = create_async_engine(settings.db_connection_str, future=True)
+    async_engine = create_engine()
 
     app.state.async_engine = async_engine
+    app.state.db_pragmas = await read_sqlite_pragmas(async_engine)
+    if app.state.db_pragmas:
+        logger.info(f"Database profile '{settings.db_profile}' active pragmas: {app.state.db_pragmas}")
     app.state.async_session = async_sessionmaker(bind=async_engine, expire_on_commit=False)
 
     async with async_engine.begin() as connection:
         await connection.run_sync(SQLModel.metadata.create_all)
 
+    if settings.db_pool_warmup:
+        n_connections = await warm_up(async_engine)
+        logger.info(f"Database pool warmed up with {n_connections} connections")
+
     await init_database(app.state.async_session())
-    game_task = asyncio.create_task(game_manager.start(app.state.async_session()))
+    await write_buffer.start(app.state.async_session)
+    game_task = asyncio.create_task(game_manager.start(app.state.async_session))
 
     yield
 
     await game_manager.stop()
     await game_task
+    await write_buffer.stop()
     await app.state.async_engine.dispose()
 
 
@@ -0,0 +1,380 @@
+"""Dispatch of the game websocket messages to their handlers, through a chain of middlewares."""
+
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from fastapi import WebSocket
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from aiventure.actors import actors
+from aiventure.aggregates import PlayerAggregate
+from aiventure.codecs import JSON, Codec
+from aiventure.database import count_queries
+from aiventure.game_manager import (
+    GameAction,
+    GameMessage,
+    encode_error,
+    encode_response,
+    game_manager,
+    game_message_adapter,
+)
+from aiventure.metrics import metrics
+from aiventure.models import User
+from aiventure.rate_limit import RateLimiter
+from aiventure.sync import StatePatch, StateSync, flatten
+
+
+logger = logging.getLogger("uvicorn.error")
+
+_request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+"""Identifier of the message being handled, echoed in its responses."""
+
+RATE_LIMITED = "Rate limited"
+
+
+class GameError(Exception):
+    """Expected failure of an action, sent back to the client as the error of its response."""
+
+
+class GameConnection:
+    """State of a game websocket, shared by all its messages."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        session: AsyncSession,
+        user: User,
+        codec: Codec = JSON,
+        sync: StateSync | None = None,
+        async_session: async_sessionmaker[AsyncSession] | None = None,
+        max_in_flight: int = 1,
+        rate_limiter: RateLimiter | None = None,
+    ) -> None:
+        """Initialize the connection state, the player and lab states being delta-synchronized if `sync` is set.
+
+        With `async_session`, up to `max_in_flight` read actions are processed concurrently, each in its own session.
+        With `rate_limiter`, the messages over the rate limits are held back or rejected.
+        """
+        self.websocket = websocket
+        self.session = session
+        self.user = user
+        self.codec = codec
+        self.sync = sync
+        self.async_session = async_session
+        self.player: PlayerAggregate | None = None
+        self.in_flight: set[asyncio.Task[None]] = set()
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.rate_limiter = rate_limiter
+
+    async def receive(self) -> str | bytes:
+        """Receive the next raw message."""
+        return await self.codec.receive(self.websocket)
+
+    async def send(self, action: GameAction, payload: BaseModel | dict[str, Any]) -> None:
+        """Send a response to the client, encoded straight from the payload model."""
+        await self.codec.send(
+            self.websocket, encode_response(action, payload, codec=self.codec, request_id=_request_id.get())
+        )
+
+    async def send_state(self, action: GameAction, scope: str, payload: BaseModel) -> None:
+        """Send a player or lab state, as a patch of the synchronized state if the connection is delta-synchronized."""
+        if self.sync is None:
+            await self.send(action, payload)
+            return
+
+        patch = self.sync.update(scope, flatten(scope, payload.model_dump(mode="json")))
+        if patch is None:
+            patch = StatePatch(version=self.sync.version, base=self.sync.version, upserts={})
+        await self.send(GameAction.SYNC_STATE, patch)
+
+    async def send_error(self, action: GameAction, error: str, request_id: str | None = None) -> None:
+        """Send the error response of an action, encoded once per error unless it answers an identified message."""
+        if request_id is None:
+            await self.codec.send(self.websocket, encode_error(action, error, self.codec))
+        else:
+            await self.codec.send(self.websocket, encode_response(action, {}, error, self.codec, request_id))
+
+    async def send_raw(self, data: dict[str, Any]) -> None:
+        """Send a message which is not the response of an action."""
+        await self.codec.send(self.websocket, self.codec.encode_data(data))
+
+    async def wait_in_flight(self) -> None:
+        """Wait for the actions processed concurrently to complete."""
+        if self.in_flight:
+            await asyncio.wait(self.in_flight)
+
+    async def close(self) -> None:
+        """Cancel the actions still processed concurrently, e.g. once the client disconnected."""
+        for task in self.in_flight:
+            task.cancel()
+        await asyncio.gather(*self.in_flight, return_exceptions=True)
+
+
+class GameRequest:
+    """A message being handled, filled along the middlewares."""
+
+    def __init__(self, connection: GameConnection, data: str | bytes) -> None:
+        """Initialize the request from the raw message."""
+        self.connection = connection
+        self.data = data
+        self.session = connection.session
+        self._message: GameMessage | None = None
+        self._route: Route | None = None
+
+    @property
+    def player(self) -> PlayerAggregate:
+        """The player of the connection, for the actions that require one."""
+        if self.connection.player is None:
+            raise GameError("Player not found")
+        return self.connection.player
+
+    @property
+    def message(self) -> GameMessage:
+        """The validated message, set by the `parse_message` middleware."""
+        if self._message is None:
+            raise RuntimeError("The message must be parsed by a middleware before it is read")
+        return self._message
+
+    @message.setter
+    def message(self, message: GameMessage) -> None:
+        """Set the validated message."""
+        self._message = message
+
+    @property
+    def route(self) -> "Route":
+        """The route of the action, set by the `parse_message` middleware."""
+        if self._route is None:
+            raise RuntimeError("The message must be parsed by a middleware before its route is read")
+        return self._route
+
+    @route.setter
+    def route(self, route: "Route") -> None:
+        """Set the route of the action."""
+        self._route = route
+
+
+Handler = Callable[[GameRequest, Any], Awaitable[None]]
+"""Handle the payload of an action."""
+CallNext = Callable[[GameRequest], Awaitable[None]]
+Middleware = Callable[[GameRequest, CallNext], Awaitable[None]]
+"""Run around the rest of the chain, calling `call_next(request)` to continue."""
+
+
+class Route:
+    """Handler of an action and its options."""
+
+    def __init__(self, handler: Handler, requires_player: bool, query_budget: int | None, concurrent: bool) -> None:
+        """Initialize the route."""
+        self.handler = handler
+        self.requires_player = requires_player
+        self.query_budget = query_budget
+        self.concurrent = concurrent
+
+
+class HandlerRegistry:
+    """Map each game action to its handler, and run every message through the middlewares.
+
+    Middlewares are called in the order they were added, the first one wrapping all the others, and the last one
+    calls the handler of the parsed action.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self.routes: dict[GameAction, Route] = {}
+        self.middlewares: list[Middleware] = []
+
+    def register(
+        self,
+        action: GameAction,
+        requires_player: bool = True,
+        query_budget: int | None = None,
+        concurrent: bool = False,
+    ) -> Callable[[Handler], Handler]:
+        """Register the decorated function as the handler of an action.
+
+        Handlers of `concurrent` actions must only read: they run alongside the other concurrent actions of the
+        connection, in a session of their own and outside of the actor of the player.
+        """
+
+        def decorator(handler: Handler) -> Handler:
+            if action in self.routes:
+                raise ValueError(f"A handler is already registered for {action.value}")
+            self.routes[action] = Route(handler, requires_player, query_budget, concurrent)
+            return handler
+
+        return decorator
+
+    def use(self, middleware: Middleware) -> Middleware:
+        """Add a middleware at the end of the chain."""
+        self.middlewares.append(middleware)
+        return middleware
+
+    async def dispatch(self, connection: GameConnection, data: str | bytes) -> None:
+        """Handle a raw message of a connection."""
+        await self._call(GameRequest(connection, data), 0)
+
+    async def _call(self, request: GameRequest, index: int) -> None:
+        """Run the middleware at the given index, or the handler once they all ran."""
+        if index < len(self.middlewares):
+            await self.middlewares[index](request, lambda request: self._call(request, index + 1))
+            return
+
+        await request.route.handler(request, request.message.payload)
+
+
+async def limit_message_rate(request: GameRequest, call_next: CallNext) -> None:
+    """Hold back the messages over the rate of the connection, rejecting them undecoded if they would wait too long.
+
+    Holding a message back stops reading the socket, so that a client sending too fast is slowed down by the transport.
+    """
+    limiter = request.connection.rate_limiter
+    if limiter is not None:
+        wait = limiter.reserve_message()
+        if wait is None:
+            metrics.increment("game.rate_limit.rejected")
+            await request.connection.send_raw({"error": RATE_LIMITED})
+            return
+        if wait:
+            metrics.observe("game.rate_limit.wait", wait)
+            await asyncio.sleep(wait)
+    await call_next(request)
+
+
+async def shape_errors(request: GameRequest, call_next: CallNext) -> None:
+    """Send the failures of a message back to the client instead of closing the connection."""
+    try:
+        await call_next(request)
+    except ValidationError as e:
+        details = e.errors(include_url=False, include_context=False, include_input=False)
+        await request.connection.send_raw({"error": "Invalid message", "details": details})
+    except GameError as e:
+        await request.connection.send_error(request.message.action, str(e), request.message.request_id)
+    except Exception as e:
+        logger.error(e)
+        await request.connection.send_raw({"error": str(e)})
+
+
+def parse_message(registry: HandlerRegistry) -> Middleware:
+    """Validate the raw message against the actions payload models and find its route."""
+
+    async def middleware(request: GameRequest, call_next: CallNext) -> None:
+        request.message = request.connection.codec.decode(request.data, game_message_adapter)
+        route = registry.routes.get(request.message.action)
+        if route is None:
+            logger.info(request.data)
+            return
+        request.route = route
+        await call_next(request)
+
+    return middleware
+
+
+async def record_activity(request: GameRequest, call_next: CallNext) -> None:
+    """Record the actions of the user other than heartbeats, for the reaper of the idle connections."""
+    if request.message.action is not GameAction.PONG:
+        game_manager.seen(request.connection.user.id, active=True)
+    await call_next(request)
+
+
+async def limit_action_rate(request: GameRequest, call_next: CallNext) -> None:
+    """Reject the actions over their own rate, before they reach the database."""
+    limiter = request.connection.rate_limiter
+    action = request.message.action.value
+    if limiter is not None and not limiter.allow_action(action):
+        metrics.increment(f"game.actions.{action}.rate_limited")
+        raise GameError(RATE_LIMITED)
+    await call_next(request)
+
+
+async def pipeline(request: GameRequest, call_next: CallNext) -> None:
+    """Process the concurrent actions in the background, and the others once the previous actions completed.
+
+    The receive loop waits for a free slot before starting a concurrent action and for the completion of any other
+    action, so a client can send a batch of reads at once while its writes still apply in order.
+    """
+    connection = request.connection
+    token = _request_id.set(request.message.request_id)
+    try:
+        if request.route.concurrent and connection.async_session is not None:
+            await connection.slots.acquire()
+            task = asyncio.create_task(_run_concurrently(request, call_next, connection.async_session))
+            connection.in_flight.add(task)
+            task.add_done_callback(connection.in_flight.discard)
+            metrics.observe("game.actions.in_flight", len(connection.in_flight))
+        else:
+            await connection.wait_in_flight()
+            await call_next(request)
+    finally:
+        _request_id.reset(token)
+
+
+async def _run_concurrently(
+    request: GameRequest, call_next: CallNext, async_session: async_sessionmaker[AsyncSession]
+) -> None:
+    """Process a concurrent action in its own session, its failures being sent back like the others."""
+    try:
+        async with async_session() as session:
+            request.session = session
+            await shape_errors(request, call_next)
+    finally:
+        request.connection.in_flight.discard(asyncio.current_task())  # type: ignore[arg-type]
+        request.connection.slots.release()
+
+
+async def measure_latency(request: GameRequest, call_next: CallNext) -> None:
+    """Record the number of calls, errors and latency of every action."""
+    name = f"game.actions.{request.message.action.value}"
+    start = time.perf_counter()
+    try:
+        await call_next(request)
+    except Exception:
+        metrics.increment(f"{name}.errors")
+        raise
+    finally:
+        metrics.increment(f"{name}.calls")
+        metrics.observe(f"{name}.latency", time.perf_counter() - start)
+
+
+async def require_player(request: GameRequest, call_next: CallNext) -> None:
+    """Reject the actions needing a player until the user created or retrieved theirs."""
+    if request.route.requires_player and request.connection.player is None:
+        raise GameError("Player not found")
+    await call_next(request)
+
+
+async def run_in_player_actor(request: GameRequest, call_next: CallNext) -> None:
+    """Run the actions of a player in the actor of the player, one at a time with the other changes of the player."""
+    if request.connection.player is None or request.route.concurrent:
+        await call_next(request)
+        return
+    await actors.ask(request.connection.player.id, lambda: call_next(request))
+
+
+async def enforce_query_budget(request: GameRequest, call_next: CallNext) -> None:
+    """Record the number of queries of every action, and warn about the actions exceeding their budget."""
+    action = request.message.action.value
+    with count_queries() as counter:
+        await call_next(request)
+
+    metrics.observe(f"game.actions.{action}.queries", counter.count)
+    budget = request.route.query_budget
+    if budget is not None and counter.count > budget:
+        metrics.increment(f"game.actions.{action}.over_budget")
+        logger.warning(f"Action {action} ran {counter.count} queries, over its budget of {budget}")
+
+
+registry = HandlerRegistry()
+registry.use(limit_message_rate)
+registry.use(shape_errors)
+registry.use(parse_message(registry))
+registry.use(record_activity)
+registry.use(limit_action_rate)
+registry.use(pipeline)
+registry.use(measure_latency)
+registry.use(require_player)
+registry.use(run_in_player_actor)
+registry.use(enforce_query_budget)
@@ -0,0 +1,83 @@
+"""Income and valuation rules of the game, shared by the labs, the bulk revaluation and the simulator.
+
+The functions are pure and only use arithmetic and comparison operators, so they accept Python numbers for a single
+lab as well as numpy arrays for many labs at once.
+"""
+
+from typing import Any
+
+from aiventure.constants import (
+    EMPLOYEE_VALUATION_QUALITY_MULTIPLIERS,
+    LOCATION_INCOME_MULTIPLIER,
+    LOCATION_VALUATION_MULTIPLIER,
+)
+
+
+Value = Any
+"""A number, or a numpy array of numbers."""
+
+MINUTES_PER_YEAR = 60 * 24 * 365
+"""The income of a lab is per minute, its valuation is based on a year of income."""
+MODEL_INCOME = 0.05
+"""Income per minute of each model of a lab."""
+MODEL_VALUATION_BONUS = 0.02
+"""Valuation bonus of each model of a lab."""
+INVESTOR_VALUATION_BONUS = 0.05
+"""Valuation bonus of each investor of a lab, besides its owner."""
+EMPLOYEE_QUALITY_WEIGHT = 0.5
+"""Weight of the employees average quality multiplier in the valuation."""
+
+
+def employee_quality_multiplier(quality_id: int) -> float:
+    """Valuation multiplier of an employee, summed in the `employee_quality_sum` of their lab."""
+    return EMPLOYEE_VALUATION_QUALITY_MULTIPLIERS[quality_id]
+
+
+def location_income_multiplier(location: str) -> float:
+    """Income multiplier of a lab location."""
+    return LOCATION_INCOME_MULTIPLIER[location]
+
+
+def location_valuation_multiplier(location: str) -> float:
+    """Valuation multiplier of a lab location."""
+    return LOCATION_VALUATION_MULTIPLIER[location]
+
+
+def lab_income(model_count: Value, income_multiplier: Value) -> Value:
+    """Income per minute of a lab.
+
+    1. Each model gives $0.05 on a base income
+    2. The model modifiers (not implemented yet)
+    3. The location multiplier
+    4. The salary of the employees (not implemented yet)
+    """
+    return model_count * MODEL_INCOME * income_multiplier
+
+
+def lab_valuation(
+    income: Value,
+    model_count: Value,
+    employee_count: Value,
+    employee_quality_sum: Value,
+    investor_count: Value,
+    valuation_multiplier: Value,
+) -> Value:
+    """Valuation of a lab.
+
+    1. A year of income
+    2. Employees: half of their average quality multiplier deviation
+    3. AI model portfolio: each model adds 2%
+    4. The location multiplier
+    5. Investors: each investor adds 5%, minus the first one which is the owner
+    """
+    # Comparisons give 0 or 1 (False or True), so that empty labs keep neutral multipliers without branching
+    has_employees = employee_count > 0
+    employee_multiplier = 1.0 + has_employees * (
+        (employee_quality_sum / (employee_count + (1 - has_employees)) - 1) * EMPLOYEE_QUALITY_WEIGHT
+    )
+    model_multiplier = 1.0 + model_count * MODEL_VALUATION_BONUS
+    investor_multiplier = 1.0 + (investor_count - (investor_count > 0)) * INVESTOR_VALUATION_BONUS
+
+    return (
+        income * MINUTES_PER_YEAR * employee_multiplier * model_multiplier * valuation_multiplier * investor_multiplier
+    )
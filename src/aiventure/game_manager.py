@@ -2,18 +2,32 @@
 
 import asyncio
 import logging
+import time
 from enum import Enum
-from typing import Any
+from functools import lru_cache, partial
+from typing import Annotated, Any, Literal
 
 from fastapi import WebSocket
 from jose import JWTError, jwt
-from pydantic import BaseModel, ConfigDict
-from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from aiventure.actors import actors
+from aiventure.codecs import JSON, Codec, accepted_subprotocol
 from aiventure.config import settings
-from aiventure.constants import INCOME_TICK_RATE
+from aiventure.constants import (
+    BATCH_MAX_ACTIONS,
+    CONNECTION_IDLE_TIMEOUT,
+    FUNDS_SNAPSHOT_RATE,
+    GLOBAL_STATE_BROADCAST_DELAY,
+    HEARTBEAT_INTERVAL,
+    HEARTBEAT_TIMEOUT,
+    INCOME_TICK_RATE,
+)
 from aiventure.db import PlayerCRUD, PlayerLabInvestmentLinkCRUD, UsersCRUD
-from aiventure.models import FundsUpdate, GlobalGameState, User
+from aiventure.metrics import metrics
+from aiventure.models import FundsReasonEnum, FundsUpdate, GlobalGameState, LabIncludeEnum, LocationEnum, User
+from aiventure.write_buffer import write_buffer
 
 
 logger = logging.getLogger("uvicorn.error")
@@ -26,6 +40,11 @@ class ConnectedUser(BaseModel):
 
     player_id: str | None = None
     websocket: WebSocket
+    codec: Codec = JSON
+    last_seen: float = Field(default_factory=time.monotonic, description="Monotonic time of the last message.")
+    last_active: float = Field(
+        default_factory=time.monotonic, description="Monotonic time of the last message other than a heartbeat."
+    )
 
 
 class GameAction(str, Enum):
@@ -37,21 +56,184 @@ class GameAction(str, Enum):
     RETRIEVE_LAB = "retrieve-lab"
     RETRIEVE_PLAYER_DATA = "retrieve-player-data"
     UPDATE_FUNDS = "update-funds"
+    SYNC_STATE = "sync-state"
+    ACK_STATE = "ack-state"
+    BATCH = "batch"
+    PING = "ping"
+    PONG = "pong"
 
 
-class GameMessage(BaseModel):
-    """Game message."""
+class EmptyPayload(BaseModel):
+    """Payload of the actions without parameters."""
 
-    action: GameAction
-    payload: dict[str, Any]
+
+class CreateLabPayload(BaseModel):
+    """Payload of the create lab action."""
+
+    name: str = Field(min_length=1)
+    location: LocationEnum
+
+
+class CreateModelPayload(BaseModel):
+    """Payload of the create model action."""
+
+    name: str = Field(min_length=1)
+    category: int
+    lab_id: str
+
+
+class CreatePlayerPayload(BaseModel):
+    """Payload of the create player action."""
+
+    name: str = Field(min_length=1)
+    avatar: str
+
+
+class RetrieveLabPayload(BaseModel):
+    """Payload of the retrieve lab action."""
+
+    id: str
+    include: set[LabIncludeEnum] | None = Field(
+        default=None, description="Relationships to include in the response, all of them if not set."
+    )
+
+
+class AckStatePayload(BaseModel):
+    """Payload of the ack state action."""
+
+    version: int = Field(ge=0, description="Version of the state applied by the client, 0 to request a full state.")
+
+
+class GameMessageBase(BaseModel):
+    """Fields shared by the game messages."""
+
+    request_id: str | None = Field(
+        default=None,
+        max_length=64,
+        description="Identifier echoed in the responses to the message, to match them when messages are pipelined.",
+    )
+
+
+class CreateLabMessage(GameMessageBase):
+    """Create lab message."""
+
+    action: Literal[GameAction.CREATE_LAB]
+    payload: CreateLabPayload
+
+
+class CreateModelMessage(GameMessageBase):
+    """Create model message."""
+
+    action: Literal[GameAction.CREATE_MODEL]
+    payload: CreateModelPayload
+
+
+class CreatePlayerMessage(GameMessageBase):
+    """Create player message."""
+
+    action: Literal[GameAction.CREATE_PLAYER]
+    payload: CreatePlayerPayload
+
+
+class RetrieveLabMessage(GameMessageBase):
+    """Retrieve lab message."""
+
+    action: Literal[GameAction.RETRIEVE_LAB]
+    payload: RetrieveLabPayload
+
+
+class RetrievePlayerDataMessage(GameMessageBase):
+    """Retrieve player data message."""
+
+    action: Literal[GameAction.RETRIEVE_PLAYER_DATA]
+    payload: EmptyPayload = EmptyPayload()
+
+
+class AckStateMessage(GameMessageBase):
+    """Ack state message."""
+
+    action: Literal[GameAction.ACK_STATE]
+    payload: AckStatePayload
+
+
+class PongMessage(GameMessageBase):
+    """Pong message, the answer of a client to a ping."""
+
+    action: Literal[GameAction.PONG]
+    payload: EmptyPayload = EmptyPayload()
+
+
+BatchAction = Annotated[CreateLabMessage | CreateModelMessage, Field(discriminator="action")]
+"""Action of a batch."""
+
+
+class BatchPayload(BaseModel):
+    """Payload of the batch action."""
+
+    actions: list[BatchAction] = Field(
+        min_length=1,
+        max_length=BATCH_MAX_ACTIONS,
+        description=(
+            "Actions applied in order and all or nothing. The `lab_id` of a create model action can be `$<index>`, "
+            "the index of a create lab action earlier in the batch."
+        ),
+    )
+
+
+class BatchMessage(GameMessageBase):
+    """Batch message."""
+
+    action: Literal[GameAction.BATCH]
+    payload: BatchPayload
+
+
+GameMessage = Annotated[
+    CreateLabMessage
+    | CreateModelMessage
+    | CreatePlayerMessage
+    | RetrieveLabMessage
+    | RetrievePlayerDataMessage
+    | AckStateMessage
+    | BatchMessage
+    | PongMessage,
+    Field(discriminator="action"),
+]
+"""Game message sent by a client, the action selects the payload model."""
+
+game_message_adapter: TypeAdapter[GameMessage] = TypeAdapter(GameMessage)
+"""Validator of the raw game messages, built once so that each message is parsed in a single pass."""
 
 
 class GameMessageResponse(BaseModel):
     """Game message response."""
 
     action: GameAction
-    payload: dict[str, Any]
+    payload: Any = Field(description="A response model or a dictionary, serialized as is.")
     error: str | None = None
+    request_id: str | None = Field(
+        default=None,
+        exclude_if=lambda request_id: request_id is None,
+        description="Identifier of the message this is the response to, omitted if the message had none.",
+    )
+
+
+def encode_response(
+    action: GameAction,
+    payload: BaseModel | dict[str, Any],
+    error: str | None = None,
+    codec: Codec = JSON,
+    request_id: str | None = None,
+) -> str | bytes:
+    """Encode a response in one pass, without validating nor dumping the payload to a dictionary first."""
+    return codec.encode(
+        GameMessageResponse.model_construct(action=action, payload=payload, error=error, request_id=request_id)
+    )
+
+
+@lru_cache(maxsize=256)
+def encode_error(action: GameAction, error: str, codec: Codec = JSON) -> str | bytes:
+    """Encode an error response, the handlers errors being fixed messages they are encoded only once."""
+    return encode_response(action, {}, error, codec)
 
 
 class GameManager:
@@ -61,57 +243,115 @@ class GameManager:
         """Initialize game manager."""
         self.active_connections: dict[str, ConnectedUser] = {}
 
-        self._async_session = None
+        self._async_session: async_sessionmaker[AsyncSession] | None = None
         self._running = False
         self._income_tick_rate = INCOME_TICK_RATE
-
-    async def start(self, async_session: AsyncSession) -> None:
+        self._funds_snapshot_rate = FUNDS_SNAPSHOT_RATE
+        self._heartbeat_interval = HEARTBEAT_INTERVAL
+        self._heartbeat_timeout = HEARTBEAT_TIMEOUT
+        self._idle_timeout = CONNECTION_IDLE_TIMEOUT
+        self._global_state_delay = GLOBAL_STATE_BROADCAST_DELAY
+        self._global_state_task: asyncio.Task[None] | None = None
+        self._last_snapshot_entry_id = 0
+
+    @property
+    def async_session(self) -> async_sessionmaker[AsyncSession]:
+        """Session factory of the database, set when the game manager starts."""
+        if self._async_session is None:
+            raise RuntimeError("The game manager must be started before it uses the database")
+        return self._async_session
+
+    async def start(self, async_session: async_sessionmaker[AsyncSession]) -> None:
         """Start the game manager."""
         self._async_session = async_session
         self._running = True
         self._income_task = asyncio.create_task(self._income_loop())
+        self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
 
     async def stop(self) -> None:
         """Stop the game manager."""
         self._running = False
-        if self._income_task:
-            self._income_task.cancel()
+        for task in (self._income_task, self._snapshot_task, self._heartbeat_task, self._global_state_task):
+            if task is None:
+                continue
+            task.cancel()
             try:
-                await self._income_task
+                await task
             except asyncio.CancelledError:
                 pass
+        await actors.stop()
+
+        # The last income ticks may still be waiting in the write-behind buffer
+        await write_buffer.flush()
+        await self._snapshot_funds()
 
-    async def connect(self, websocket: WebSocket, token: str, session: AsyncSession) -> User | None:
-        """Connect to the websocket."""
-        await websocket.accept()
+    async def connect(
+        self, websocket: WebSocket, token: str, session: AsyncSession, codec: Codec = JSON
+    ) -> User | None:
+        """Connect to the websocket, confirming the subprotocol of the encoding if the client requested it."""
+        await websocket.accept(subprotocol=accepted_subprotocol(websocket, codec))
 
         user = await self.get_websocket_user(token, session)
         if not user:
             await websocket.close(code=4001, reason="Unauthorized")
             return None
 
-        self.active_connections[user.id] = ConnectedUser(websocket=websocket)
-
-        _state = GlobalGameState(n_connected_players=len(self.active_connections))
-        await self.broadcast(_state.model_dump())
+        self.active_connections[user.id] = ConnectedUser(websocket=websocket, codec=codec)
+        metrics.increment("game.connections.opened")
+        metrics.set_gauge("game.connections.active", len(self.active_connections))
+        self._schedule_global_state()
 
         return user
 
-    def disconnect(self, user_id: str) -> None:
-        """Disconnect from the websocket."""
-        if user_id in self.active_connections:
+    def disconnect(self, user_id: str, websocket: WebSocket | None = None) -> None:
+        """Forget the connection of a user, only if it is still the given websocket and not a newer one."""
+        connection = self.active_connections.get(user_id)
+        if connection is not None and (websocket is None or connection.websocket is websocket):
             del self.active_connections[user_id]
-
-    async def send_personal_message(self, message: dict[str, Any], user_id: str) -> None:
+            metrics.increment("game.connections.closed")
+            metrics.set_gauge("game.connections.active", len(self.active_connections))
+
+    def seen(self, user_id: str, active: bool = False) -> None:
+        """Record a message of a user, `active` if it was an action other than a heartbeat."""
+        connection = self.active_connections.get(user_id)
+        if connection is not None:
+            connection.last_seen = time.monotonic()
+            if active:
+                connection.last_active = connection.last_seen
+
+    async def send_personal_message(self, message: GameMessageResponse, user_id: str) -> None:
         """Send a personal message to a user."""
         if user_id in self.active_connections:
-            await self.active_connections[user_id].websocket.send_json(GameMessageResponse(**message).model_dump())
+            connection = self.active_connections[user_id]
+            await connection.codec.send(connection.websocket, connection.codec.encode(message))
 
-    async def broadcast(self, message: dict[str, Any], exclude: str | None = None) -> None:
-        """Broadcast a message to all users except one if specified."""
-        for user_id, connection in self.active_connections.items():
+    async def broadcast(self, message: BaseModel, exclude: str | None = None) -> None:
+        """Broadcast a message to all users except one if specified, encoding it only once per encoding.
+
+        A failed send doesn't stop the broadcast, the heartbeats close the broken connections.
+        """
+        encoded: dict[str, str | bytes] = {}
+        for user_id, connection in list(self.active_connections.items()):
             if user_id != exclude:
-                await connection.websocket.send_json(message)
+                codec = connection.codec
+                if codec.name not in encoded:
+                    encoded[codec.name] = codec.encode(message)
+                try:
+                    await codec.send(connection.websocket, encoded[codec.name])
+                except Exception as e:
+                    logger.debug(f"Failed to broadcast to {user_id}: {e}")
+
+    def _schedule_global_state(self) -> None:
+        """Broadcast the global game state after a short delay, once for all the users connecting meanwhile."""
+        if self._global_state_task is None or self._global_state_task.done():
+            self._global_state_task = asyncio.create_task(self._broadcast_global_state())
+
+    async def _broadcast_global_state(self) -> None:
+        """Broadcast the number of connected players once the delay elapsed."""
+        await asyncio.sleep(self._global_state_delay)
+        metrics.increment("game.global_state.broadcasts")
+        await self.broadcast(GlobalGameState(n_connected_players=len(self.active_connections)))
 
     async def set_player_id(self, user_id: str, player_id: str) -> None:
         """Set the player ID for a user."""
@@ -149,24 +389,79 @@ class GameManager:
                 raise e
 
     async def _process_income(self) -> None:
-        """Process income for all connected clients."""
+        """Send the income of the connected players to their actors, which credit it in parallel."""
         for user_id, connection in self.active_connections.items():
             if connection.player_id is not None:
-                async with PlayerLabInvestmentLinkCRUD(self._async_session) as player_lab_investment_link_crud:
-                    income = await player_lab_investment_link_crud.get_income_for_player(connection.player_id)
-
-                if income is not None:
-                    async with PlayerCRUD(self._async_session) as player_crud:
-                        player = await player_crud.increment_funds(connection.player_id, income)
-
-                    if player:
-                        await self.send_personal_message(
-                            {
-                                "action": GameAction.UPDATE_FUNDS,
-                                "payload": FundsUpdate(funds=player.funds, update_type="increment").model_dump(),
-                            },
-                            user_id,
-                        )
+                actors.tell(connection.player_id, partial(self._credit_income, user_id, connection.player_id))
+
+    async def _credit_income(self, user_id: str, player_id: str) -> None:
+        """Credit the income of a player, in a session of its own as the players are credited in parallel."""
+        async with self.async_session() as session:
+            async with PlayerLabInvestmentLinkCRUD(session) as player_lab_investment_link_crud:
+                income = await player_lab_investment_link_crud.get_income_for_player(player_id)
+
+            if income is not None:
+                async with PlayerCRUD(session) as player_crud:
+                    player = await player_crud.increment_funds(player_id, income, FundsReasonEnum.INCOME)
+
+                if player:
+                    await self.send_personal_message(
+                        GameMessageResponse.model_construct(
+                            action=GameAction.UPDATE_FUNDS,
+                            payload=FundsUpdate(funds=player.funds, update_type="increment"),
+                            error=None,
+                        ),
+                        user_id,
+                    )
+
+    async def _heartbeat_loop(self) -> None:
+        """Heartbeat loop for all connected clients."""
+        while self._running:
+            await asyncio.sleep(self._heartbeat_interval)
+            try:
+                await self._heartbeat()
+            except Exception as e:
+                logger.error(f"Error in heartbeat loop: {e}")
+
+    async def _heartbeat(self) -> None:
+        """Ping the live connections, and close the dead and idle ones so that the income loop skips them."""
+        now = time.monotonic()
+        for user_id, connection in list(self.active_connections.items()):
+            if now - connection.last_seen > self._heartbeat_timeout:
+                await self._reap(user_id, connection, "dead")
+            elif now - connection.last_active > self._idle_timeout:
+                await self._reap(user_id, connection, "idle")
+            else:
+                try:
+                    await connection.codec.send(
+                        connection.websocket, encode_response(GameAction.PING, {}, codec=connection.codec)
+                    )
+                except Exception:
+                    await self._reap(user_id, connection, "dead")
+
+    async def _reap(self, user_id: str, connection: ConnectedUser, reason: Literal["dead", "idle"]) -> None:
+        """Forget a connection and close its websocket, which may never answer if the client is gone."""
+        self.disconnect(user_id, connection.websocket)
+        metrics.increment(f"game.connections.reaped.{reason}")
+        code, message = (4002, "Heartbeat timeout") if reason == "dead" else (4003, "Idle timeout")
+        try:
+            await asyncio.wait_for(connection.websocket.close(code=code, reason=message), timeout=1)
+        except Exception:
+            pass
+
+    async def _snapshot_loop(self) -> None:
+        """Fold the funds ledger into the players funds periodically."""
+        while self._running:
+            await asyncio.sleep(self._funds_snapshot_rate)
+            try:
+                await self._snapshot_funds()
+            except Exception as e:
+                logger.error(f"Error in funds snapshot loop: {e}")
+
+    async def _snapshot_funds(self) -> None:
+        """Fold the funds ledger entries recorded since the last snapshot into the players funds."""
+        async with PlayerCRUD(self.async_session()) as player_crud:
+            self._last_snapshot_entry_id = await player_crud.snapshot_funds(self._last_snapshot_entry_id)
 
 
 game_manager = GameManager()
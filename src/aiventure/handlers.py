@@ -0,0 +1,278 @@
+"""Handlers of the game websocket actions."""
+
+import uuid
+from collections import defaultdict
+
+from aiventure.aggregates import PlayerAggregate
+from aiventure.constants import CREATE_LAB_COST, CREATE_MODEL_COST
+from aiventure.db import AIModelCRUD, LabCRUD, PlayerCRUD, unit_of_work
+from aiventure.dispatch import GameError, GameRequest, registry
+from aiventure.game_manager import (
+    AckStatePayload,
+    BatchPayload,
+    CreateLabMessage,
+    CreateLabPayload,
+    CreateModelPayload,
+    CreatePlayerPayload,
+    EmptyPayload,
+    GameAction,
+    RetrieveLabPayload,
+    game_manager,
+)
+from aiventure.metrics import metrics
+from aiventure.models import (
+    AI_MODEL_TYPE_MAPPING,
+    AIModelBase,
+    AIModelDataResponse,
+    BatchResponse,
+    FundsReasonEnum,
+    FundsUpdate,
+    LabBase,
+    Player,
+    PlayerBase,
+    PlayerDataResponse,
+)
+
+
+async def check_version(request: GameRequest, player: Player) -> None:
+    """Update the player aggregate from a player read back after a write, reading it again if changed elsewhere."""
+    connection = request.connection
+    request.player.set_funds(player.funds)
+    if not request.player.is_current(player.version):
+        metrics.increment("game.player_aggregate.reloads")
+        async with PlayerCRUD(request.session) as crud:
+            connection.player = await crud.read_aggregate_by_id(player.id)
+
+
+async def decrement_funds(request: GameRequest, amount: float, reason: FundsReasonEnum) -> None:
+    """Charge the player of the connection, notify the client and check the player aggregate."""
+    connection = request.connection
+    async with PlayerCRUD(request.session) as crud:
+        player = await crud.decrement_funds(request.player.id, amount, reason)
+        if not player:
+            raise GameError("Failed to update funds")
+
+        await connection.send(GameAction.UPDATE_FUNDS, FundsUpdate(funds=player.funds, update_type="decrement"))
+
+    await check_version(request, player)
+
+
+async def require_funds(request: GameRequest, amount: float) -> None:
+    """Refuse an action the player cannot afford."""
+    if request.player.funds < amount:
+        # The cached funds miss the income credited since the last write, so they are read again before refusing
+        async with PlayerCRUD(request.session) as crud:
+            player = await crud.get_by_id(request.player.id)
+        if player:
+            await check_version(request, player)
+        if request.player.funds < amount:
+            raise GameError("Insufficient funds")
+
+
+def new_lab(payload: CreateLabPayload, player_id: str) -> LabBase:
+    """Lab created by a create lab action."""
+    return LabBase(
+        name=payload.name,
+        location=payload.location,
+        valuation=0,
+        income=0,
+        tech_tree_id=str(uuid.uuid4()),
+        player_id=player_id,
+    )
+
+
+async def create_ai_model(crud: AIModelCRUD, payload: CreateModelPayload, lab_id: str) -> AIModelDataResponse:
+    """Create the model of a create model action in a lab."""
+    ai_model_type = AI_MODEL_TYPE_MAPPING.get(payload.category)
+    if not ai_model_type:
+        raise GameError("Model category not found")
+
+    if await crud.get_by_name(payload.name):
+        raise GameError("Model name already exists")
+
+    model = await crud.create(
+        AIModelBase(name=payload.name, ai_model_type_id=ai_model_type.id, tech_tree_id=str(uuid.uuid4()), lab_id=lab_id)
+    )
+    return AIModelDataResponse(
+        id=model.id,
+        name=model.name,
+        ai_model_type_id=model.ai_model_type_id,
+        tech_tree_id=model.tech_tree_id,
+        lab_id=model.lab_id,
+    )
+
+
+@registry.register(GameAction.CREATE_LAB, query_budget=12)
+async def create_lab(request: GameRequest, payload: CreateLabPayload) -> None:
+    """Create a lab for the player."""
+    connection = request.connection
+    async with LabCRUD(request.session) as crud:
+        lab = await crud.create(new_lab(payload, request.player.id))
+        lab_data = await crud.read_data_by_id(lab.id)
+        if not lab_data:
+            raise GameError("Failed to create lab")
+
+        request.player.add_lab(lab_data)
+        await connection.send_state(GameAction.CREATE_LAB, f"labs/{lab.id}", lab_data)
+
+    await decrement_funds(request, CREATE_LAB_COST, FundsReasonEnum.CREATE_LAB)
+
+
+@registry.register(GameAction.CREATE_MODEL, query_budget=20)
+async def create_model(request: GameRequest, payload: CreateModelPayload) -> None:
+    """Create an AI model in one of the player's labs, then revalue the lab."""
+    connection = request.connection
+    await require_funds(request, CREATE_MODEL_COST)
+
+    lab = request.player.owned_lab(payload.lab_id)
+    if not lab:
+        raise GameError("You can only create a model for your lab.")
+
+    async with AIModelCRUD(request.session) as crud:
+        model = await create_ai_model(crud, payload, lab.id)
+        await connection.send(GameAction.CREATE_MODEL, model)
+
+    await decrement_funds(request, CREATE_MODEL_COST, FundsReasonEnum.CREATE_MODEL)
+
+    async with LabCRUD(request.session) as crud:
+        await crud.update_income(lab.id)
+        await crud.update_valuation(lab.id)
+        lab_data = await crud.read_data_by_id(lab.id)
+        if not lab_data:
+            raise GameError("Lab not found")
+
+        request.player.update_lab(lab_data)
+        await connection.send_state(GameAction.RETRIEVE_LAB, f"labs/{lab.id}", lab_data)
+
+
+@registry.register(GameAction.BATCH)
+async def batch(request: GameRequest, payload: BatchPayload) -> None:
+    """Apply a batch of create lab and create model actions and revalue each lab once, in a single transaction.
+
+    The player is charged once per kind of action and the client gets a single response; if any action fails,
+    none of them is applied.
+    """
+    connection = request.connection
+    charges: dict[FundsReasonEnum, float] = defaultdict(float)
+    for action in payload.actions:
+        if isinstance(action, CreateLabMessage):
+            charges[FundsReasonEnum.CREATE_LAB] += CREATE_LAB_COST
+        else:
+            charges[FundsReasonEnum.CREATE_MODEL] += CREATE_MODEL_COST
+    await require_funds(request, sum(charges.values()))
+
+    created_labs: dict[int, str] = {}
+    models: list[AIModelDataResponse] = []
+    async with unit_of_work(request.session) as session:
+        for index, action in enumerate(payload.actions):
+            try:
+                if isinstance(action, CreateLabMessage):
+                    lab = await LabCRUD(session).create(new_lab(action.payload, request.player.id))
+                    created_labs[index] = lab.id
+                else:
+                    lab_id = batch_lab_id(request, action.payload.lab_id, created_labs)
+                    models.append(await create_ai_model(AIModelCRUD(session), action.payload, lab_id))
+            except GameError as e:
+                raise GameError(f"Action {index} ({action.action.value}) failed: {e}") from e
+
+        player = None
+        for reason, amount in charges.items():
+            player = await PlayerCRUD(session).decrement_funds(request.player.id, amount, reason)
+        if not player:
+            raise GameError("Failed to update funds")
+
+        # The labs are revalued in the same transaction, so that a failure leaves the batch unapplied and uncharged
+        labs = []
+        revalued = {model.lab_id for model in models}
+        for lab_id in dict.fromkeys([*created_labs.values(), *(model.lab_id for model in models)]):
+            if lab_id in revalued:
+                await LabCRUD(session).update_income(lab_id)
+                await LabCRUD(session).update_valuation(lab_id)
+            lab_data = await LabCRUD(session).read_data_by_id(lab_id)
+            if not lab_data:
+                raise GameError("Lab not found")
+            labs.append(lab_data)
+
+    for lab_data in labs:
+        if lab_data.id in created_labs.values():
+            request.player.add_lab(lab_data)
+        else:
+            request.player.update_lab(lab_data)
+
+    await check_version(request, player)
+    await connection.send(GameAction.BATCH, BatchResponse(labs=labs, models=models, funds=request.player.funds))
+
+
+def batch_lab_id(request: GameRequest, lab_id: str, created_labs: dict[int, str]) -> str:
+    """Lab of a create model action of a batch, either a lab of the player or `$<index>` of a lab created before."""
+    if lab_id.startswith("$"):
+        index = lab_id[1:]
+        if not index.isdigit() or int(index) not in created_labs:
+            raise GameError(f"No lab is created by the action {index} of the batch")
+        return created_labs[int(index)]
+
+    if not request.player.owned_lab(lab_id):
+        raise GameError("You can only create a model for your lab.")
+    return lab_id
+
+
+@registry.register(GameAction.CREATE_PLAYER, requires_player=False, query_budget=3)
+async def create_player(request: GameRequest, payload: CreatePlayerPayload) -> None:
+    """Create the player of the user."""
+    connection = request.connection
+    async with PlayerCRUD(request.session) as crud:
+        player = await crud.create(PlayerBase(name=payload.name, avatar=payload.avatar, user_id=connection.user.id))
+        if not player:
+            raise GameError("Failed to create player")
+
+    connection.player = PlayerAggregate(
+        PlayerDataResponse(
+            id=player.id, name=player.name, avatar=player.avatar, funds=player.funds, labs=[], investments=[]
+        ),
+        player.version,
+    )
+    await connection.send_state(GameAction.CREATE_PLAYER, "player", connection.player.data)
+    await game_manager.set_player_id(connection.user.id, player.id)
+
+
+@registry.register(GameAction.RETRIEVE_LAB, requires_player=False, query_budget=5, concurrent=True)
+async def retrieve_lab(request: GameRequest, payload: RetrieveLabPayload) -> None:
+    """Send a lab with the requested relationships."""
+    connection = request.connection
+    async with LabCRUD(request.session) as crud:
+        lab = await crud.read_data_by_id(payload.id, payload.include)
+        if not lab:
+            raise GameError("Lab not found")
+
+        await connection.send_state(GameAction.RETRIEVE_LAB, f"labs/{lab.id}", lab)
+
+
+@registry.register(GameAction.RETRIEVE_PLAYER_DATA, requires_player=False, query_budget=4, concurrent=True)
+async def retrieve_player_data(request: GameRequest, payload: EmptyPayload) -> None:
+    """Send the player of the user with their labs and investments, read again to refresh the player aggregate."""
+    connection = request.connection
+    async with PlayerCRUD(request.session) as crud:
+        if connection.player is None:
+            connection.player = await crud.read_aggregate_by_user_id(connection.user.id)
+        else:
+            connection.player = await crud.read_aggregate_by_id(connection.player.id)
+
+    if not connection.player:
+        raise GameError("Player not found")
+
+    await connection.send_state(GameAction.RETRIEVE_PLAYER_DATA, "player", connection.player.data)
+    await game_manager.set_player_id(connection.user.id, connection.player.id)
+
+
+@registry.register(GameAction.ACK_STATE, requires_player=False, query_budget=0)
+async def ack_state(request: GameRequest, payload: AckStatePayload) -> None:
+    """Record the state version applied by a delta-synchronized client."""
+    if request.connection.sync is None:
+        raise GameError("State synchronization is not enabled, connect with ?sync=delta")
+
+    request.connection.sync.ack(payload.version)
+
+
+@registry.register(GameAction.PONG, requires_player=False, query_budget=0)
+async def pong(request: GameRequest, payload: EmptyPayload) -> None:
+    """Answer of the client to a ping, every message received keeping the connection alive."""
@@ -0,0 +1,145 @@
+"""UUID primary key column type and generators."""
+
+import random
+import time
+import uuid
+from typing import Any, Mapping, Sequence
+
+from sqlalchemy import Connection, LargeBinary, String, TypeDecorator, text
+from sqlalchemy.engine import Dialect
+from sqlalchemy.types import TypeEngine
+from sqlmodel import SQLModel
+
+from aiventure.config import settings
+
+
+def uuid7(rng: random.Random | None = None) -> uuid.UUID:
+    """Generate a time-ordered UUID version 7.
+
+    The 48 most significant bits hold the Unix timestamp in milliseconds, so ids created one after the other land
+    next to each other in the primary key index instead of at random pages.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    random_bits = rng.getrandbits(74) if rng else int.from_bytes(uuid.uuid4().bytes, "big") & ((1 << 74) - 1)
+
+    value = (timestamp_ms & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76  # version
+    value |= (random_bits >> 62) << 64  # rand_a, 12 bits
+    value |= 0b10 << 62  # RFC 9562 variant
+    value |= random_bits & ((1 << 62) - 1)  # rand_b, 62 bits
+
+    return uuid.UUID(int=value)
+
+
+def new_id(rng: random.Random | None = None) -> str:
+    """Generate a new primary key following the configured UUID version, optionally from a seeded generator."""
+    if settings.db_uuid_version == 7:
+        return str(uuid7(rng))
+    if rng is not None:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    return str(uuid.uuid4())
+
+
+class UUIDKey(TypeDecorator[str]):
+    """UUID stored either as 36 characters of text or as 16 raw bytes.
+
+    Python code and the API always see the canonical string form, the storage is picked by the `DB_UUID_KEYS`
+    setting. Binary keys divide the size of the primary key and every foreign key copy by more than two.
+    """
+
+    impl = String
+    cache_ok = True
+
+    def __init__(self, binary: bool | None = None) -> None:
+        """Initialize the type, defaulting to the configured storage."""
+        super().__init__()
+        self.binary = settings.db_uuid_keys == "binary" if binary is None else binary
+
+    def load_dialect_impl(self, dialect: Dialect) -> TypeEngine[Any]:
+        """Return the underlying column type."""
+        return dialect.type_descriptor(LargeBinary(16) if self.binary else String(36))
+
+    def process_bind_param(self, value: Any, dialect: Dialect) -> Any:
+        """Convert the string form to the stored form.
+
+        A value that is not a UUID, such as an unknown id sent by a client, is bound as an empty key that matches no
+        row, as it would with text keys.
+        """
+        if value is None or not self.binary:
+            return value
+        try:
+            return uuid.UUID(str(value)).bytes
+        except ValueError:
+            return b""
+
+    def process_result_value(self, value: Any, dialect: Dialect) -> str | None:
+        """Convert the stored form back to the string form."""
+        if value is None or not self.binary:
+            return value  # type: ignore[no-any-return]
+        return str(uuid.UUID(bytes=value))
+
+
+def convert_keys(
+    connection: Connection,
+    binary: bool,
+    tables: Mapping[str, Sequence[str]] | None = None,
+    batch_size: int = 10_000,
+) -> int:
+    """Rewrite every UUID key and foreign key of a SQLite database to the binary or text storage.
+
+    SQLite columns accept both forms whatever their declared type, so only the values are rewritten, by batches
+    of rows still stored in the source form. The conversion can be interrupted and resumed, and foreign key
+    enforcement must stay off while keys are rewritten, which is the SQLite default. The UUID columns of each
+    table default to those of the models, migrations pass the tables of their own revision. Returns the number
+    of updated rows.
+    """
+    if connection.dialect.name != "sqlite":
+        raise ValueError(
+            f"UUID keys can only be converted in place on SQLite databases, not on {connection.dialect.name}."
+        )
+
+    if tables is None:
+        tables = {
+            table.name: [column.name for column in table.columns if isinstance(column.type, UUIDKey)]
+            for table in SQLModel.metadata.sorted_tables
+        }
+
+    source_type = "text" if binary else "blob"
+    n_rows = 0
+
+    for table_name, key_columns in tables.items():
+        if not key_columns:
+            continue
+
+        # Rows are matched on their rowid, as the primary key itself may be rewritten
+        select_statement = text(
+            f"SELECT rowid, {', '.join(key_columns)} FROM {table_name} "
+            f"WHERE {' OR '.join(f'typeof({name}) = :source_type' for name in key_columns)} LIMIT :batch_size"
+        )
+        update_statement = text(
+            f"UPDATE {table_name} SET {', '.join(f'{name} = :{name}' for name in key_columns)} WHERE rowid = :rowid"
+        )
+
+        while rows := connection.execute(
+            select_statement, {"source_type": source_type, "batch_size": batch_size}
+        ).all():
+            parameters = []
+            for row in rows:
+                values = row._asdict()
+                parameters.append(
+                    {"rowid": values["rowid"]} | {name: _convert_key(values[name], binary) for name in key_columns}
+                )
+
+            connection.execute(update_statement, parameters)
+            n_rows += len(rows)
+
+    return n_rows
+
+
+def _convert_key(value: str | bytes | None, binary: bool) -> str | bytes | None:
+    """Convert a raw stored key to the binary or text form."""
+    if binary and isinstance(value, str):
+        return uuid.UUID(value).bytes
+    if not binary and isinstance(value, bytes):
+        return str(uuid.UUID(bytes=value))
+    return value
@@ -0,0 +1,63 @@
+"""In-process metrics exposed by the `/metrics` endpoint."""
+
+from collections import defaultdict
+
+from aiventure.models import HistogramSnapshot, MetricsSnapshot
+
+
+class Histogram:
+    """Running summary of observed values."""
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a value."""
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> HistogramSnapshot:
+        """Return the current summary."""
+        return HistogramSnapshot(
+            count=self.count,
+            total=self.total,
+            mean=self.total / self.count if self.count else 0.0,
+            max=self.max,
+        )
+
+
+class Metrics:
+    """Registry of counters, gauges and histograms, keyed by dotted names."""
+
+    def __init__(self) -> None:
+        """Initialize the registry."""
+        self.counters: dict[str, int] = defaultdict(int)
+        self.gauges: dict[str, float] = {}
+        self.histograms: dict[str, Histogram] = defaultdict(Histogram)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """Increment a counter."""
+        self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set the current value of a gauge."""
+        self.gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record a value in a histogram."""
+        self.histograms[name].observe(value)
+
+    def snapshot(self) -> MetricsSnapshot:
+        """Return the current value of every metric."""
+        return MetricsSnapshot(
+            counters=dict(self.counters),
+            gauges=dict(self.gauges),
+            histograms={name: histogram.snapshot() for name, histogram in self.histograms.items()},
+        )
+
+
+metrics = Metrics()
@@ -1,19 +1,20 @@
 """Models for AIVenture."""
 
 import enum
-import uuid
-from typing import Literal
-
-from pydantic import BaseModel, ConfigDict
-from sqlmodel import Column, Enum, Field, Relationship, SQLModel
+from datetime import UTC, datetime
+from typing import Any, Literal
+
+from pydantic import BaseModel, ConfigDict, SerializerFunctionWrapHandler, model_serializer
+from pydantic import Field as PydanticField
+from sqlalchemy import Index, event, func, inspect
+from sqlalchemy.orm import column_property
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import Column, Enum, Field, Relationship, SQLModel, col, select
 from sqlmodel._compat import SQLModelConfig
 
-from aiventure.constants import (
-    BASE_PLAYER_FUNDS,
-    EMPLOYEE_VALUATION_QUALITY_MULTIPLIERS,
-    LOCATION_INCOME_MULTIPLIER,
-    LOCATION_VALUATION_MULTIPLIER,
-)
+from aiventure import economy
+from aiventure.constants import BASE_PLAYER_FUNDS
+from aiventure.keys import UUIDKey, new_id
 
 
 class AIModelTypeEnum(str, enum.Enum):
@@ -30,6 +31,15 @@ class AIModelTypeEnum(str, enum.Enum):
         return AI_MODEL_TYPE_MAPPING[self]
 
 
+class LabIncludeEnum(str, enum.Enum):
+    """Relationships of a lab that can be included in its response."""
+
+    EMPLOYEES = "employees"
+    MODELS = "models"
+    INVESTORS = "investors"
+    PLAYER = "player"
+
+
 class LocationEnum(str, enum.Enum):
     """Location enum."""
 
@@ -145,12 +155,11 @@ class UUIDModel(SQLModel):
     """Model with a UUID."""
 
     id: str = Field(
-        # NOTE: This is a workaround to use UUIDs as primary keys in SQLite + aiosqlite and SQLModel/SQLAlchemy.
-        default_factory=lambda: str(uuid.uuid4()),
+        # NOTE: UUIDs are handled as strings, `UUIDKey` stores them as text or as 16 bytes depending on the settings.
+        default_factory=new_id,
         primary_key=True,
-        index=True,
         nullable=False,
-        sa_column_kwargs={"unique": True},
+        sa_type=UUIDKey,
     )
 
     model_config = SQLModelConfig(json_schema_extra={"example": {"id": "123e4567-e89b-12d3-a456-426614174000"}})
@@ -161,7 +170,7 @@ class EmployeeModifierLink(SQLModel, table=True):
 
     __tablename__ = "employee_modifier_link"
 
-    employee_id: str | None = Field(default=None, foreign_key="employees.id", primary_key=True)
+    employee_id: str | None = Field(default=None, foreign_key="employees.id", primary_key=True, sa_type=UUIDKey)
     modifier_id: str | None = Field(default=None, foreign_key="modifiers.id", primary_key=True)
 
     model_config = SQLModelConfig(
@@ -179,12 +188,12 @@ class PlayerLabInvestmentLink(SQLModel, table=True):
 
     __tablename__ = "player_lab_investment_link"
 
-    player_id: str | None = Field(default=None, foreign_key="players.id", primary_key=True)
-    lab_id: str | None = Field(default=None, foreign_key="labs.id", primary_key=True)
+    player_id: str | None = Field(default=None, foreign_key="players.id", primary_key=True, sa_type=UUIDKey)
+    lab_id: str | None = Field(default=None, foreign_key="labs.id", primary_key=True, index=True, sa_type=UUIDKey)
     part: float = Field(default=1.0, ge=0.0, le=1.0, description="The part of the lab that the player owns.")
 
-    player: "Player" = Relationship(back_populates="investments", sa_relationship_kwargs={"lazy": "selectin"})
-    lab: "Lab" = Relationship(back_populates="investors", sa_relationship_kwargs={"lazy": "selectin"})
+    player: "Player" = Relationship(back_populates="investments", sa_relationship_kwargs={"lazy": "raise"})
+    lab: "Lab" = Relationship(back_populates="investors", sa_relationship_kwargs={"lazy": "raise"})
 
     model_config = SQLModelConfig(
         json_schema_extra={
@@ -236,13 +245,40 @@ class Health(BaseModel):
     )
 
 
+class HistogramSnapshot(BaseModel):
+    """Summary of the values observed by a histogram."""
+
+    count: int
+    total: float
+    mean: float
+    max: float
+
+
+class MetricsSnapshot(BaseModel):
+    """Metrics model for the API."""
+
+    counters: dict[str, int]
+    gauges: dict[str, float]
+    histograms: dict[str, HistogramSnapshot]
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "counters": {"db.pool.exhausted": 0},
+                "gauges": {"db.pool.checked_out": 1},
+                "histograms": {"db.pool.checkout_wait": {"count": 10, "total": 0.01, "mean": 0.001, "max": 0.004}},
+            }
+        },
+    )
+
+
 class PlayerBase(UUIDModel):
     """Player model."""
 
     name: str
     avatar: str
     funds: float = Field(default=BASE_PLAYER_FUNDS)
-    user_id: str = Field(foreign_key="users.id", sa_column_kwargs={"unique": True})
+    user_id: str = Field(foreign_key="users.id", sa_type=UUIDKey, sa_column_kwargs={"unique": True})
 
     model_config = SQLModelConfig(
         json_schema_extra={
@@ -261,18 +297,65 @@ class Player(PlayerBase, table=True):
 
     __tablename__ = "players"
 
-    labs: list["Lab"] = Relationship(back_populates="player", sa_relationship_kwargs={"lazy": "selectin"})
+    ledger_seq: int = Field(default=0, description="The last funds ledger entry folded into the funds.")
+    version: int = Field(default=0, description="Incremented whenever the labs or investments of the player change.")
+
+    # Relationships raise when they were not loaded by the query, see the loader profiles of `aiventure.db.loaders`
+    labs: list["Lab"] = Relationship(back_populates="player", sa_relationship_kwargs={"lazy": "raise"})
     investments: list[PlayerLabInvestmentLink] = Relationship(
         back_populates="player",
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={"lazy": "raise"},
     )
 
-    def update_lab(self, lab: "Lab") -> None:
-        """Update the player's lab."""
-        for _lab in self.labs:
-            if _lab.id == lab.id:
-                _lab = lab
-                break
+
+class FundsReasonEnum(str, enum.Enum):
+    """Reason of a funds change."""
+
+    INCOME = "income"
+    CREATE_LAB = "create-lab"
+    CREATE_MODEL = "create-model"
+
+
+class FundsLedgerEntry(SQLModel, table=True):
+    """Append-only ledger of the credits and debits of player funds.
+
+    `players.funds` is a snapshot of the balance up to the `players.ledger_seq` entry, the entries after it are the
+    tail that is added to the snapshot whenever a player is loaded and periodically folded into a new snapshot.
+    Entries written by the write-behind buffer carry the id of their operation, so that replaying its journal
+    after a crash never records an operation twice.
+    """
+
+    __tablename__ = "funds_ledger"
+    __table_args__ = (Index("ix_funds_ledger_player_id_id", "player_id", "id"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    player_id: str = Field(foreign_key="players.id", sa_type=UUIDKey)
+    amount: float
+    reason: FundsReasonEnum = Field(sa_column=Column(Enum(FundsReasonEnum)))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    operation_id: str | None = Field(default=None, index=True, unique=True, sa_type=UUIDKey)
+
+
+inspect(Player).add_property(
+    "ledger_tail",
+    column_property(
+        select(func.coalesce(func.sum(FundsLedgerEntry.amount), 0.0))
+        .where(
+            col(FundsLedgerEntry.player_id) == col(Player.id),
+            col(FundsLedgerEntry.id) > col(Player.ledger_seq),
+        )
+        .correlate_except(FundsLedgerEntry)
+        .scalar_subquery()
+    ),
+)
+
+
+@event.listens_for(Player, "load")
+@event.listens_for(Player, "refresh")
+def _apply_funds_ledger_tail(player: Player, context: Any, attributes: Any = None) -> None:
+    """Add the ledger entries that are not folded in the snapshot yet to the player funds."""
+    if attributes is None or "funds" in attributes:
+        set_committed_value(player, "funds", player.funds + player.__dict__.get("ledger_tail", 0.0))
 
 
 class LabBase(UUIDModel):
@@ -280,10 +363,10 @@ class LabBase(UUIDModel):
 
     name: str
     location: LocationEnum = Field(sa_column=Column(Enum(LocationEnum)))
-    valuation: float
+    valuation: float = Field(index=True)
     income: float
     tech_tree_id: str
-    player_id: str = Field(foreign_key="players.id")
+    player_id: str = Field(foreign_key="players.id", index=True, sa_type=UUIDKey)
 
     model_config = SQLModelConfig(
         json_schema_extra={
@@ -305,13 +388,19 @@ class Lab(LabBase, table=True):
 
     __tablename__ = "labs"
 
-    employees: list["Employee"] = Relationship(back_populates="lab", sa_relationship_kwargs={"lazy": "selectin"})
-    models: list["AIModel"] = Relationship(back_populates="lab", sa_relationship_kwargs={"lazy": "selectin"})
+    # Aggregates of the relationships maintained by the CRUD operations, so that the metrics are computed from the row
+    model_count: int = Field(default=0)
+    employee_count: int = Field(default=0)
+    employee_quality_sum: float = Field(default=0.0, description="Sum of the employees valuation multipliers.")
+    investor_count: int = Field(default=0)
+
+    employees: list["Employee"] = Relationship(back_populates="lab", sa_relationship_kwargs={"lazy": "raise"})
+    models: list["AIModel"] = Relationship(back_populates="lab", sa_relationship_kwargs={"lazy": "raise"})
     investors: list[PlayerLabInvestmentLink] = Relationship(
         back_populates="lab",
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={"lazy": "raise"},
     )
-    player: Player = Relationship(back_populates="labs", sa_relationship_kwargs={"lazy": "selectin"})
+    player: Player = Relationship(back_populates="labs", sa_relationship_kwargs={"lazy": "raise"})
 
     def calculate_income(self) -> float:
         """Calculate the lab's income based on various factors.
@@ -322,19 +411,7 @@ class Lab(LabBase, table=True):
         3. The location of the lab
         4. The salary of the employees
         """
-        base_income = 0.0
-        # 1. The number of models
-        # Each model gives $0.05 on a base income
-        base_income += len(self.models) * 0.05
-        # 2. The model modifiers
-        # TODO: Implement the modifiers for models
-        # 3. The location of the lab
-        location_multiplier = LOCATION_INCOME_MULTIPLIER[self.location]
-        base_income *= location_multiplier
-        # 4. The salary of the employees
-        # TODO: Implement the salary of the employees
-
-        return base_income
+        return float(economy.lab_income(self.model_count, economy.location_income_multiplier(self.location)))
 
     def calculate_valuation(self) -> float:
         """Calculate the lab's valuation based on various factors.
@@ -346,46 +423,25 @@ class Lab(LabBase, table=True):
         4. Location modifier
         5. Investment history
         """
-        # 1. Base income multiplier (60 minutes * 24 hours * 365 days)
-        base_valuation = self.income * 525600
-        # 2. Employee multipliers (quality_id)
-        employee_multiplier = 1.0
-        if self.employees:
-            total_quality = sum(
-                EMPLOYEE_VALUATION_QUALITY_MULTIPLIERS[employee.quality_id] for employee in self.employees
+        return float(
+            economy.lab_valuation(
+                self.income,
+                self.model_count,
+                self.employee_count,
+                self.employee_quality_sum,
+                self.investor_count,
+                economy.location_valuation_multiplier(self.location),
             )
-            employee_multiplier = 1.0 + (total_quality / len(self.employees) - 1) * 0.5
-        # 3. AI Model portfolio value
-        model_multiplier = 1.0
-        if self.models:
-            # Each additional model adds 2% to the valuation
-            model_multiplier = 1.0 + len(self.models) * 0.02
-        # 4. Location modifier
-        location_multiplier = LOCATION_VALUATION_MULTIPLIER[self.location]
-        # 5. Investment history
-        investor_multiplier = 1.0
-        if self.investors:
-            # Each additional investor adds 5% to the valuation minus the first investor
-            # which is the player itself
-            investor_multiplier = 1.0 + (len(self.investors) - 1) * 0.05
-
-        final_valuation = (
-            base_valuation
-            * employee_multiplier
-            * model_multiplier
-            * location_multiplier
-            * investor_multiplier
         )
-        return final_valuation
 
 
 class AIModelBase(UUIDModel):
     """AI model base model."""
 
-    name: str
+    name: str = Field(index=True)
     ai_model_type_id: int = Field(foreign_key="ai_model_types.id")
     tech_tree_id: str
-    lab_id: str = Field(foreign_key="labs.id")
+    lab_id: str = Field(foreign_key="labs.id", index=True, sa_type=UUIDKey)
 
     model_config = SQLModelConfig(
         json_schema_extra={
@@ -404,7 +460,7 @@ class AIModel(AIModelBase, table=True):
 
     __tablename__ = "ai_models"
 
-    lab: Lab = Relationship(back_populates="models", sa_relationship_kwargs={"lazy": "selectin"})
+    lab: Lab = Relationship(back_populates="models", sa_relationship_kwargs={"lazy": "raise"})
 
 
 class EmployeeBase(UUIDModel):
@@ -415,7 +471,7 @@ class EmployeeBase(UUIDModel):
     image_url: str
     role_id: int = Field(foreign_key="roles.id")
     quality_id: int = Field(foreign_key="qualities.id")
-    lab_id: str | None = Field(foreign_key="labs.id", default=None)
+    lab_id: str | None = Field(foreign_key="labs.id", default=None, index=True, sa_type=UUIDKey)
 
     model_config = SQLModelConfig(
         json_schema_extra={
@@ -446,7 +502,7 @@ class Employee(EmployeeBase, table=True):
     #     link_model=EmployeeModifierLink,
     #     sa_relationship_kwargs={"lazy": "selectin"},
     # )
-    lab: Lab | None = Relationship(back_populates="employees", sa_relationship_kwargs={"lazy": "selectin"})
+    lab: Lab | None = Relationship(back_populates="employees", sa_relationship_kwargs={"lazy": "raise"})
 
 
 class LocationBase(SQLModel):
@@ -918,17 +974,59 @@ class Version(BaseModel):
     )
 
 
+class PlayerSummary(BaseModel):
+    """Public fields of a player"""
+
+    id: str
+    name: str
+    avatar: str
+
+
+class LabSummary(BaseModel):
+    """Fields of a lab without its relationships"""
+
+    id: str
+    name: str
+    location: LocationEnum
+    valuation: float
+    income: float
+    tech_tree_id: str
+    player_id: str
+
+
+class EmployeeSummary(BaseModel):
+    """Fields of an employee without its lab"""
+
+    id: str
+    name: str
+    salary: int
+    image_url: str
+    role_id: int
+    quality_id: int
+    lab_id: str | None
+
+
+class AIModelDataResponse(BaseModel):
+    """Response model for create-model"""
+
+    id: str
+    name: str
+    ai_model_type_id: int
+    tech_tree_id: str
+    lab_id: str
+
+
 class Investor(BaseModel):
     """Investor model"""
 
-    player: Player
+    player: PlayerSummary
     part: float
 
 
 class Investment(BaseModel):
     """Investment model"""
 
-    lab: Lab
+    lab: LabSummary
     part: float
 
 
@@ -939,34 +1037,31 @@ class PlayerDataResponse(BaseModel):
     name: str
     avatar: str
     funds: float
-    labs: list[Lab]
+    labs: list[LabSummary]
     investments: list[Investment]
 
 
-class LabDataResponse(BaseModel):
-    """Response model for retrieve-lab-data"""
+class LabDataResponse(LabSummary):
+    """Response model for retrieve-lab-data, the relationships that were not included are left out
 
-    id: str
-    name: str
-    location: LocationEnum
-    valuation: float
-    income: float
-    tech_tree_id: str
-    player_id: str
-    employees: list[Employee]
-    models: list[AIModel]
-    investors: list[Investor]
-    player: Player | None
+    A relationship is included when it is set, even to `None` for a lab without owner, and left out when it keeps
+    its default.
+    """
 
+    employees: list[EmployeeSummary] | None = None
+    models: list[AIModelDataResponse] | None = None
+    investors: list[Investor] | None = None
+    player: PlayerSummary | None = None
 
-class AIModelDataResponse(BaseModel):
-    """Response model for create-model"""
-
-    id: str
-    name: str
-    ai_model_type_id: int
-    tech_tree_id: str
-    lab_id: str
+    # The return type is left out so that the JSON schema remains the one of the fields
+    @model_serializer(mode="wrap")
+    def _serialize_included(self, handler: SerializerFunctionWrapHandler):
+        """Leave out the relationships that were not included."""
+        data = handler(self)
+        for name in ("employees", "models", "investors", "player"):
+            if name not in self.model_fields_set:
+                data.pop(name, None)
+        return data
 
 
 class FundsUpdate(BaseModel):
@@ -974,3 +1069,11 @@ class FundsUpdate(BaseModel):
 
     funds: float
     update_type: Literal["increment", "decrement"]
+
+
+class BatchResponse(BaseModel):
+    """Combined response of a batch of actions."""
+
+    labs: list[LabDataResponse] = PydanticField(description="The labs created or changed by the batch.")
+    models: list[AIModelDataResponse] = PydanticField(description="The models created by the batch, in order.")
+    funds: float = PydanticField(description="The funds of the player once the batch was charged.")
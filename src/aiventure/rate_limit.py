@@ -0,0 +1,65 @@
+"""Token-bucket rate limiting of the messages of the game connections."""
+
+import time
+
+from aiventure.config import settings
+
+
+class TokenBucket:
+    """Bucket of up to `capacity` tokens, refilled at `rate` tokens per second, a message taking one token."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        """Initialize a full bucket."""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def reserve(self, max_wait: float = 0.0, now: float | None = None) -> float | None:
+        """Take a token, returning the seconds to wait for it, or None without taking it if that exceeds `max_wait`.
+
+        A reserved token is taken in advance, so the next messages wait for the refill of the previous ones.
+        """
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        wait = max(1.0 - self.tokens, 0.0) / self.rate
+        if wait > max_wait:
+            return None
+        self.tokens -= 1.0
+        return wait
+
+
+class RateLimiter:
+    """Token buckets of a game connection, one for all its messages and one per limited action."""
+
+    def __init__(
+        self, rate: float | None, burst: int, max_wait: float, action_rates: dict[str, float], action_burst: int
+    ) -> None:
+        """Initialize the buckets, the messages being unlimited without `rate`."""
+        self.messages = TokenBucket(rate, burst) if rate else None
+        self.max_wait = max_wait
+        self.actions = {action: TokenBucket(rate, action_burst) for action, rate in action_rates.items() if rate}
+
+    @classmethod
+    def from_settings(cls) -> "RateLimiter":
+        """Rate limiter configured by the `GAME_RATE_LIMIT` and `GAME_ACTION_RATE_LIMITS` settings."""
+        return cls(
+            settings.game_rate_limit,
+            settings.game_rate_limit_burst,
+            settings.game_rate_limit_max_wait,
+            settings.game_action_rate_limits,
+            settings.game_action_rate_limit_burst,
+        )
+
+    def reserve_message(self) -> float | None:
+        """Take a token for a message, see `TokenBucket.reserve`."""
+        return 0.0 if self.messages is None else self.messages.reserve(self.max_wait)
+
+    def allow_action(self, action: str) -> bool:
+        """Take a token for an action, without waiting."""
+        bucket = self.actions.get(action)
+        return bucket is None or bucket.reserve() is not None
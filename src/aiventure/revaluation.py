@@ -0,0 +1,155 @@
+"""Bulk revaluation of every lab, evaluating the income and valuation formulas as array operations."""
+
+import time
+from typing import Any
+
+from pydantic import BaseModel, Field
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlmodel import SQLModel
+
+from aiventure import economy
+from aiventure.constants import LOCATION_INCOME_MULTIPLIER, LOCATION_VALUATION_MULTIPLIER
+from aiventure.database import create_engine
+from aiventure.db import LabCRUD
+from aiventure.models import Lab
+
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+
+_LABS = SQLModel.metadata.tables[Lab.__tablename__]
+
+
+class RevaluationConfig(BaseModel):
+    """Options of a bulk revaluation."""
+
+    chunk_size: int = Field(default=50_000, gt=0)
+    recount: bool = False
+
+
+class RevaluationReport(BaseModel):
+    """Number of revalued and updated labs and the time it took."""
+
+    labs: int = 0
+    updated: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def labs_per_second(self) -> float:
+        """Overall revaluation throughput."""
+        return self.labs / self.elapsed if self.elapsed else 0.0
+
+
+def lookup(values: "np.ndarray", mapping: dict[Any, float]) -> "np.ndarray":
+    """Map every value of an array through a dictionary, one lookup per distinct value."""
+    uniques, inverse = np.unique(values, return_inverse=True)
+    return np.array([mapping[value] for value in uniques], dtype=np.float64)[inverse]
+
+
+def compute_metrics(columns: dict[str, "np.ndarray"]) -> tuple["np.ndarray", "np.ndarray"]:
+    """Compute the income and valuation of many labs at once, with the formulas of the `Lab.calculate_*` methods."""
+    income = economy.lab_income(columns["model_count"], lookup(columns["location"], LOCATION_INCOME_MULTIPLIER))
+    valuation = economy.lab_valuation(
+        income,
+        columns["model_count"],
+        columns["employee_count"],
+        columns["employee_quality_sum"],
+        columns["investor_count"],
+        lookup(columns["location"], LOCATION_VALUATION_MULTIPLIER),
+    )
+
+    return income, valuation
+
+
+class LabRevaluator:
+    """Recompute the income and valuation of every lab without loading the ORM graph.
+
+    Labs are streamed in chunks of `chunk_size` rows with keyset pagination on the primary key, so memory stays bounded
+    whatever the number of labs. The formulas run on the columns of a chunk at once, then only the labs whose metrics
+    changed are written back with one `executemany` UPDATE, committed per chunk so that an interrupted run keeps its
+    progress.
+    """
+
+    def __init__(self, config: RevaluationConfig) -> None:
+        """Initialize the revaluator."""
+        if np is None:
+            raise ImportError("The bulk revaluation requires numpy, install it with `pip install aiventure[economy]`.")
+
+        self.config = config
+
+    async def run(self, connection: AsyncConnection) -> RevaluationReport:
+        """Revalue every lab through the given connection."""
+        start = time.perf_counter()
+        report = RevaluationReport()
+
+        if self.config.recount:
+            async with AsyncSession(bind=connection) as session:
+                await LabCRUD(session).recount_aggregates()
+            await connection.commit()
+
+        query = (
+            select(
+                _LABS.c.id,
+                _LABS.c.location,
+                _LABS.c.model_count,
+                _LABS.c.employee_count,
+                _LABS.c.employee_quality_sum,
+                _LABS.c.investor_count,
+                _LABS.c.income,
+                _LABS.c.valuation,
+            )
+            .order_by(_LABS.c.id)
+            .limit(self.config.chunk_size)
+        )
+        statement = (
+            update(_LABS)
+            .where(_LABS.c.id == bindparam("lab_id"))
+            .values(income=bindparam("new_income"), valuation=bindparam("new_valuation"))
+        )
+
+        last_id = None
+        while True:
+            result = await connection.execute(query if last_id is None else query.where(_LABS.c.id > last_id))
+            rows = result.all()
+            if not rows:
+                break
+
+            ids, *values = zip(*rows, strict=True)
+            # Locations are enum members, kept as objects so that they are looked up by value
+            columns = {
+                name: np.array(column, dtype=object if name == "location" else None)
+                for name, column in zip(list(result.keys())[1:], values, strict=True)
+            }
+            income, valuation = compute_metrics(columns)
+
+            changed = ~(np.isclose(income, columns["income"]) & np.isclose(valuation, columns["valuation"]))
+            parameters = [
+                {"lab_id": ids[index], "new_income": float(income[index]), "new_valuation": float(valuation[index])}
+                for index in np.flatnonzero(changed)
+            ]
+            if parameters:
+                await connection.execute(statement, parameters)
+            await connection.commit()
+
+            report.labs += len(rows)
+            report.updated += len(parameters)
+            last_id = ids[-1]
+
+        report.elapsed = time.perf_counter() - start
+        return report
+
+
+async def revalue_labs(config: RevaluationConfig, db_connection_str: str | None = None) -> RevaluationReport:
+    """Recompute the income and valuation of every lab of the database."""
+    async_engine = create_engine(db_connection_str)
+
+    try:
+        async with async_engine.connect() as connection:
+            return await LabRevaluator(config).run(connection)
+
+    finally:
+        await async_engine.dispose()
@@ -7,7 +7,8 @@ from fastapi import APIRouter
 from fastapi.responses import FileResponse
 
 from aiventure import __version__
-from aiventure.models import Health, Version
+from aiventure.metrics import metrics
+from aiventure.models import Health, MetricsSnapshot, Version
 
 
 router = APIRouter()
@@ -25,6 +26,12 @@ async def version() -> Version:
     return Version(version=__version__)
 
 
+@router.get("/metrics", response_model=MetricsSnapshot)
+async def get_metrics() -> MetricsSnapshot:
+    """Metrics endpoint for the API."""
+    return metrics.snapshot()
+
+
 @router.get("/avatars", response_model=list[str])
 async def avatars() -> list[str]:
     """Get all avatar images."""
@@ -0,0 +1,297 @@
+"""Synthetic world generator used to populate large databases for scale testing."""
+
+import enum
+import random
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, Field
+from sqlalchemy import Table, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlmodel import SQLModel
+
+from aiventure.constants import BASE_PLAYER_FUNDS, QUALITY_WEIGHTS
+from aiventure.database import create_engine
+from aiventure.db import LabCRUD
+from aiventure.keys import new_id
+from aiventure.models import (
+    AI_MODEL_TYPE_MAPPING,
+    LOCATION_MAPPING,
+    MODIFIER_TYPE_MAPPING,
+    QUALITY_MAPPING,
+    ROLE_CATEGORY_MAPPING,
+    ROLE_MAPPING,
+    AIModel,
+    AIModelType,
+    Employee,
+    Lab,
+    Location,
+    LocationEnum,
+    ModifierType,
+    Player,
+    PlayerLabInvestmentLink,
+    Quality,
+    Role,
+    RoleCategory,
+    User,
+)
+from aiventure.utils import PasswordManager
+
+
+SEED_PASSWORD = "seed"
+"""Password shared by every generated user."""
+
+# Insertion order matters for backends enforcing foreign keys.
+_TABLES: list[Table] = [
+    SQLModel.metadata.tables[model.__tablename__]
+    for model in (User, Player, Lab, PlayerLabInvestmentLink, AIModel, Employee)
+]
+_REFERENCE_DATA: list[tuple[Table, list[dict[str, Any]]]] = [
+    (SQLModel.metadata.tables[model.__tablename__], [item.model_dump() for item in mapping.values()])
+    for model, mapping in (
+        (AIModelType, AI_MODEL_TYPE_MAPPING),
+        (ModifierType, MODIFIER_TYPE_MAPPING),
+        (Quality, QUALITY_MAPPING),
+        (RoleCategory, ROLE_CATEGORY_MAPPING),
+        (Role, ROLE_MAPPING),
+        (Location, LOCATION_MAPPING),
+    )
+]
+
+
+class Distribution(str, enum.Enum):
+    """Distribution used to draw per-entity counts around a mean."""
+
+    CONSTANT = "constant"
+    UNIFORM = "uniform"
+    PARETO = "pareto"
+
+    def sample(self, mean: float, rng: random.Random) -> int:
+        """Draw a non-negative count whose expected value is close to `mean`."""
+        if mean <= 0:
+            return 0
+
+        match self:
+            case Distribution.CONSTANT:
+                # Keep the fractional part as a probability so that e.g. 0.5 gives one item every other draw.
+                return int(mean) + (rng.random() < mean - int(mean))
+            case Distribution.UNIFORM:
+                return round(rng.uniform(0, 2 * mean))
+            case Distribution.PARETO:
+                # A pareto(alpha=2) variate has a mean of 2, rescale it to get a long tail of "whales".
+                return round(rng.paretovariate(2.0) * mean / 2)
+
+
+class SeedConfig(BaseModel):
+    """Sizes and distributions of the generated world."""
+
+    players: int = Field(default=1_000, ge=0)
+    labs_per_player: float = Field(default=1.0, ge=0)
+    models_per_lab: float = Field(default=3.0, ge=0)
+    employees_per_lab: float = Field(default=5.0, ge=0)
+    investments_per_player: float = Field(default=0.5, ge=0)
+    distribution: Distribution = Distribution.PARETO
+    batch_size: int = Field(default=10_000, gt=0)
+    seed: int | None = None
+
+
+class SeedReport(BaseModel):
+    """Number of rows inserted per table and the time it took."""
+
+    rows: dict[str, int]
+    elapsed: float
+
+    @property
+    def rows_per_second(self) -> float:
+        """Overall insert throughput."""
+        return sum(self.rows.values()) / self.elapsed if self.elapsed else 0.0
+
+
+class WorldSeeder:
+    """Generate a synthetic world and bulk insert it with batched `executemany` statements.
+
+    Rows are built as plain dictionaries and buffered per table. Once any buffer reaches `batch_size`, every buffer
+    is flushed in foreign key order with one multi-row `INSERT` per table, so memory stays bounded whatever the size
+    of the world. Lab income and valuation are left at zero.
+    """
+
+    def __init__(self, config: SeedConfig) -> None:
+        """Initialize the seeder."""
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.tag = uuid.UUID(int=self.rng.getrandbits(128)).hex[:8]
+        self.password = PasswordManager().hash_password(SEED_PASSWORD)
+        self.avatars = [image.as_posix() for image in Path("public/avatars").glob("*.png")] or [""]
+        self.locations = list(LocationEnum)
+        self.ai_model_type_ids = list(AI_MODEL_TYPE_MAPPING)
+
+        self._buffers: dict[str, list[dict[str, Any]]] = {table.name: [] for table in _TABLES}
+        self._rows: dict[str, int] = dict.fromkeys(self._buffers, 0)
+        self._player_ids: list[str] = []
+        self._lab_ids: list[str] = []
+        self._lab_owners: list[int] = []
+        self._n_models = 0
+
+    async def run(self, connection: AsyncConnection) -> SeedReport:
+        """Generate the world through the given connection."""
+        start = time.perf_counter()
+
+        await self._ensure_reference_data(connection)
+
+        for index in range(self.config.players):
+            self._add_player(index)
+            if any(len(rows) >= self.config.batch_size for rows in self._buffers.values()):
+                await self._flush(connection)
+
+        # Investments are drawn once every lab exists so that any lab can receive investors
+        for player_index in range(self.config.players):
+            self._add_investments(player_index)
+            if len(self._buffers[PlayerLabInvestmentLink.__tablename__]) >= self.config.batch_size:
+                await self._flush(connection)
+
+        await self._flush(connection)
+
+        # Models, employees and investments are counted once, in bulk, instead of while buffering them
+        async with AsyncSession(bind=connection) as session:
+            await LabCRUD(session).recount_aggregates()
+        await connection.commit()
+
+        return SeedReport(rows=self._rows, elapsed=time.perf_counter() - start)
+
+    def _add_player(self, index: int) -> None:
+        """Buffer a user, its player and the player's labs."""
+        user_id = new_id(self.rng)
+        player_id = new_id(self.rng)
+        self._player_ids.append(player_id)
+
+        self._buffers[User.__tablename__].append(
+            {
+                "id": user_id,
+                "email": f"seed-{self.tag}-{index}@aiventure.dev",
+                "password": self.password,
+                "is_admin": False,
+            }
+        )
+        self._buffers[Player.__tablename__].append(
+            {
+                "id": player_id,
+                "name": f"Player {self.tag}-{index}",
+                "avatar": self.rng.choice(self.avatars),
+                "funds": BASE_PLAYER_FUNDS,
+                "user_id": user_id,
+                "ledger_seq": 0,
+            }
+        )
+
+        for lab_index in range(self.config.distribution.sample(self.config.labs_per_player, self.rng)):
+            self._add_lab(index, f"Lab {self.tag}-{index}-{lab_index}")
+
+    def _add_lab(self, player_index: int, name: str) -> None:
+        """Buffer a lab owned by the player, with its models and employees."""
+        lab_id = new_id(self.rng)
+        player_id = self._player_ids[player_index]
+        self._lab_ids.append(lab_id)
+        self._lab_owners.append(player_index)
+
+        self._buffers[Lab.__tablename__].append(
+            {
+                "id": lab_id,
+                "name": name,
+                "location": self.rng.choice(self.locations),
+                "valuation": 0.0,
+                "income": 0.0,
+                "tech_tree_id": new_id(self.rng),
+                "player_id": player_id,
+                "model_count": 0,
+                "employee_count": 0,
+                "employee_quality_sum": 0.0,
+                "investor_count": 0,
+            }
+        )
+        # The owner holds the full lab, as in `LabCRUD.create`
+        self._buffers[PlayerLabInvestmentLink.__tablename__].append(
+            {"player_id": player_id, "lab_id": lab_id, "part": 1.0}
+        )
+
+        for _ in range(self.config.distribution.sample(self.config.models_per_lab, self.rng)):
+            self._n_models += 1
+            self._buffers[AIModel.__tablename__].append(
+                {
+                    "id": new_id(self.rng),
+                    "name": f"Model {self.tag}-{self._n_models}",
+                    "ai_model_type_id": self.rng.choice(self.ai_model_type_ids),
+                    "tech_tree_id": new_id(self.rng),
+                    "lab_id": lab_id,
+                }
+            )
+
+        for employee_index in range(self.config.distribution.sample(self.config.employees_per_lab, self.rng)):
+            self._buffers[Employee.__tablename__].append(
+                {
+                    "id": new_id(self.rng),
+                    "name": f"Employee {employee_index}",
+                    "salary": self.rng.randrange(50_000, 500_000, 1_000),
+                    "image_url": "https://avatar.iran.liara.run/public",
+                    "role_id": self.rng.randint(1, len(ROLE_MAPPING)),
+                    "quality_id": self.rng.choices(range(1, len(QUALITY_WEIGHTS) + 1), QUALITY_WEIGHTS)[0],
+                    "lab_id": lab_id,
+                }
+            )
+
+    def _add_investments(self, player_index: int) -> None:
+        """Buffer investments of a player in labs owned by other players."""
+        n_investments = self.config.distribution.sample(self.config.investments_per_player, self.rng)
+        if not self._lab_ids or not n_investments:
+            return
+
+        player_id = self._player_ids[player_index]
+        # A lab can only be invested in once per player, and never by its owner (already linked with part=1.0)
+        lab_indexes = {self.rng.randrange(len(self._lab_ids)) for _ in range(n_investments)}
+        for lab_index in lab_indexes:
+            if self._lab_owners[lab_index] == player_index:
+                continue
+            lab_id = self._lab_ids[lab_index]
+            self._buffers[PlayerLabInvestmentLink.__tablename__].append(
+                {"player_id": player_id, "lab_id": lab_id, "part": round(self.rng.uniform(0.01, 0.2), 2)}
+            )
+
+    async def _flush(self, connection: AsyncConnection) -> None:
+        """Insert every buffered row, one `executemany` per table."""
+        for table in _TABLES:
+            rows = self._buffers[table.name]
+            if rows:
+                await connection.execute(insert(table), rows)
+                self._rows[table.name] += len(rows)
+                rows.clear()
+
+        await connection.commit()
+
+    async def _ensure_reference_data(self, connection: AsyncConnection) -> None:
+        """Insert the reference tables content when the database was created without the migrations."""
+        for table, rows in _REFERENCE_DATA:
+            count = await connection.scalar(select(func.count()).select_from(table))
+            if not count:
+                await connection.execute(insert(table), rows)
+
+        await connection.commit()
+
+
+async def seed_world(config: SeedConfig, db_connection_str: str | None = None) -> SeedReport:
+    """Create the tables if needed and populate the database with a synthetic world."""
+    async_engine = create_engine(db_connection_str)
+
+    try:
+        async with async_engine.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+
+        async with async_engine.connect() as connection:
+            if connection.dialect.name == "sqlite":
+                # The world can be regenerated at will, trade durability for a much faster bulk load
+                await connection.exec_driver_sql("PRAGMA synchronous = OFF")
+
+            return await WorldSeeder(config).run(connection)
+
+    finally:
+        await async_engine.dispose()
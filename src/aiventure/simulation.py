@@ -0,0 +1,261 @@
+"""Offline economy simulator running the income and valuation rules of the game over many ticks."""
+
+import enum
+import time
+
+from pydantic import BaseModel, Field
+
+from aiventure import economy
+from aiventure.constants import (
+    BASE_PLAYER_FUNDS,
+    CREATE_LAB_COST,
+    CREATE_MODEL_COST,
+    LOCATION_INCOME_MULTIPLIER,
+    LOCATION_VALUATION_MULTIPLIER,
+    QUALITY_WEIGHTS,
+)
+
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+
+class Policy(str, enum.Enum):
+    """Behaviour of a simulated player, deciding what they buy at every tick."""
+
+    IDLE = "idle"
+    """Never spends."""
+    EXPANDER = "expander"
+    """Creates a new lab whenever affordable, up to the labs limit."""
+    BUILDER = "builder"
+    """Creates a single lab, then a new model in it whenever affordable."""
+    BALANCED = "balanced"
+    """Fills its latest lab up to the models target before creating the next one."""
+
+
+class SimulationConfig(BaseModel):
+    """Population, behaviours and duration of a simulation."""
+
+    players: int = Field(default=1_000, gt=0)
+    ticks: int = Field(default=1_440, gt=0)
+    policies: dict[Policy, float] = Field(
+        default={Policy.BALANCED: 0.5, Policy.BUILDER: 0.25, Policy.EXPANDER: 0.15, Policy.IDLE: 0.1},
+        description="Share of the players following each policy.",
+    )
+    initial_funds: float = Field(default=BASE_PLAYER_FUNDS, ge=0)
+    max_labs_per_player: int = Field(default=10, gt=0)
+    models_per_lab: int = Field(default=5, gt=0, description="Models target of the balanced policy.")
+    employees_per_lab: float = Field(
+        default=0.0,
+        ge=0,
+        description=(
+            "Mean number of employees of a new lab. The game has no hire action, so its labs have none, any other "
+            "value simulates what hiring would change."
+        ),
+    )
+    sample_every: int = Field(default=60, gt=0, description="Number of ticks between two leaderboard samples.")
+    leaderboard_size: int = Field(default=100, gt=0)
+    seed: int | None = None
+
+
+class Percentiles(BaseModel):
+    """Summary of a distribution."""
+
+    mean: float
+    p10: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+    gini: float = Field(description="Inequality, from 0 when everyone has the same to 1 when one has everything.")
+
+    @classmethod
+    def from_values(cls, values: "np.ndarray") -> "Percentiles":
+        """Summarize an array of non-negative values."""
+        if not len(values):
+            return cls(mean=0, p10=0, p50=0, p90=0, p99=0, max=0, gini=0)
+
+        p10, p50, p90, p99 = np.percentile(values, [10, 50, 90, 99])
+        ranks = np.arange(1, len(values) + 1)
+        total = values.sum()
+        gini = float((2 * ranks - len(values) - 1) @ np.sort(values) / (len(values) * total)) if total else 0.0
+
+        return cls(mean=values.mean(), p10=p10, p50=p50, p90=p90, p99=p99, max=values.max(), gini=gini)
+
+
+class SimulationReport(BaseModel):
+    """Outcome of a simulation."""
+
+    players: int
+    labs: int
+    models: int
+    ticks: int
+    elapsed: float
+    funds: Percentiles
+    valuation: Percentiles
+    churn: list[float] = Field(description="Share of the leaderboard replaced since the previous sample.")
+
+    @property
+    def ticks_per_second(self) -> float:
+        """Simulation speed."""
+        return self.ticks / self.elapsed if self.elapsed else 0.0
+
+
+class EconomySimulator:
+    """Fast-forward the economy of a population of players without any database.
+
+    Players and labs are stored as columns of numpy arrays, so that every tick is a fixed number of array operations
+    whatever the population: labs income is credited to their owners, then each policy is evaluated as a mask over
+    the players to buy labs and models. Income and valuation come from the `economy` module, exactly as in the game.
+    Investments between players are not simulated, every lab is held by its owner only.
+    """
+
+    def __init__(self, config: SimulationConfig) -> None:
+        """Initialize the simulated world."""
+        if np is None:
+            raise ImportError("The economy simulator requires numpy, install it with `pip install aiventure[economy]`.")
+
+        self.config = config
+        self.rng = np.random.default_rng(config.seed)
+
+        policies = list(config.policies)
+        weights = np.array([config.policies[policy] for policy in policies], dtype=np.float64)
+        drawn = self.rng.choice(len(policies), size=config.players, p=weights / weights.sum())
+        self.follows = {policy: drawn == index for index, policy in enumerate(policies)}
+        for policy in Policy:
+            self.follows.setdefault(policy, np.zeros(config.players, dtype=bool))
+
+        self.funds = np.full(config.players, config.initial_funds, dtype=np.float64)
+        self.lab_count = np.zeros(config.players, dtype=np.int64)
+        self.latest_lab = np.full(config.players, -1, dtype=np.int64)
+
+        self.locations = list(LOCATION_INCOME_MULTIPLIER)
+        self.income_multipliers = np.array([LOCATION_INCOME_MULTIPLIER[name] for name in self.locations])
+        self.valuation_multipliers = np.array([LOCATION_VALUATION_MULTIPLIER[name] for name in self.locations])
+        self.quality_multipliers = np.array(
+            [economy.employee_quality_multiplier(quality_id) for quality_id in range(1, len(QUALITY_WEIGHTS) + 1)]
+        )
+        self.quality_odds = np.array(QUALITY_WEIGHTS, dtype=np.float64) / sum(QUALITY_WEIGHTS)
+
+        self.n_labs = 0
+        capacity = config.players
+        self.owner = np.zeros(capacity, dtype=np.int64)
+        self.location = np.zeros(capacity, dtype=np.int64)
+        self.model_count = np.zeros(capacity, dtype=np.int64)
+        self.employee_count = np.zeros(capacity, dtype=np.int64)
+        self.employee_quality_sum = np.zeros(capacity, dtype=np.float64)
+
+    def run(self) -> SimulationReport:
+        """Run every tick and summarize the resulting economy."""
+        start = time.perf_counter()
+        churn: list[float] = []
+        leaderboard: set[int] = set()
+
+        for tick in range(1, self.config.ticks + 1):
+            self.tick()
+            if tick % self.config.sample_every == 0 or tick == self.config.ticks:
+                current = self.leaderboard()
+                if leaderboard:
+                    churn.append(1 - len(current & leaderboard) / len(leaderboard))
+                leaderboard = current
+
+        _, valuation = self.metrics()
+        return SimulationReport(
+            players=self.config.players,
+            labs=self.n_labs,
+            models=int(self.model_count[: self.n_labs].sum()),
+            ticks=self.config.ticks,
+            elapsed=time.perf_counter() - start,
+            funds=Percentiles.from_values(self.funds),
+            valuation=Percentiles.from_values(valuation),
+            churn=churn,
+        )
+
+    def tick(self) -> None:
+        """Credit one tick of income, then let every player spend it following their policy."""
+        n = self.n_labs
+        income, _ = self.metrics()
+        self.funds += np.bincount(self.owner[:n], weights=income, minlength=self.config.players)
+
+        owned_models = np.bincount(self.owner[:n], weights=self.model_count[:n], minlength=self.config.players)
+        has_lab = self.lab_count > 0
+        below_limit = self.lab_count < self.config.max_labs_per_player
+        lab_is_full = owned_models >= self.lab_count * self.config.models_per_lab
+
+        wants_lab = (
+            (self.follows[Policy.EXPANDER] & below_limit)
+            | (self.follows[Policy.BUILDER] & ~has_lab)
+            | (self.follows[Policy.BALANCED] & below_limit & (~has_lab | lab_is_full))
+        )
+        wants_model = ~wants_lab & has_lab & (self.follows[Policy.BUILDER] | self.follows[Policy.BALANCED])
+
+        lab_buyers = np.flatnonzero(wants_lab & (self.funds >= CREATE_LAB_COST))
+        self._create_labs(lab_buyers)
+
+        model_buyers = np.flatnonzero(wants_model & (self.funds >= CREATE_MODEL_COST))
+        np.add.at(self.model_count, self.latest_lab[model_buyers], 1)
+        self.funds[model_buyers] -= CREATE_MODEL_COST
+
+    def metrics(self) -> tuple["np.ndarray", "np.ndarray"]:
+        """Income and valuation of every lab."""
+        n = self.n_labs
+        income = economy.lab_income(self.model_count[:n], self.income_multipliers[self.location[:n]])
+        valuation = economy.lab_valuation(
+            income,
+            self.model_count[:n],
+            self.employee_count[:n],
+            self.employee_quality_sum[:n],
+            np.ones(n, dtype=np.int64),
+            self.valuation_multipliers[self.location[:n]],
+        )
+        return income, valuation
+
+    def leaderboard(self) -> set[int]:
+        """Indexes of the most valued labs."""
+        _, valuation = self.metrics()
+        size = min(self.config.leaderboard_size, len(valuation))
+        if not size:
+            return set()
+        return set(np.argpartition(valuation, -size)[-size:].tolist())
+
+    def _create_labs(self, players: "np.ndarray") -> None:
+        """Create one lab for each of the given players, with randomly drawn location and employees."""
+        if not len(players):
+            return
+
+        start, end = self.n_labs, self.n_labs + len(players)
+        if end > len(self.owner):
+            self._grow(max(end, 2 * len(self.owner)))
+
+        employees = self.rng.poisson(self.config.employees_per_lab, size=len(players))
+        qualities = self.rng.choice(len(self.quality_multipliers), size=employees.sum(), p=self.quality_odds)
+
+        self.owner[start:end] = players
+        self.location[start:end] = self.rng.integers(len(self.locations), size=len(players))
+        self.model_count[start:end] = 0
+        self.employee_count[start:end] = employees
+        self.employee_quality_sum[start:end] = np.bincount(
+            np.repeat(np.arange(len(players)), employees),
+            weights=self.quality_multipliers[qualities],
+            minlength=len(players),
+        )
+
+        self.n_labs = end
+        self.funds[players] -= CREATE_LAB_COST
+        self.lab_count[players] += 1
+        self.latest_lab[players] = np.arange(start, end)
+
+    def _grow(self, capacity: int) -> None:
+        """Enlarge the lab columns."""
+        for name in ("owner", "location", "model_count", "employee_count", "employee_quality_sum"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[: len(column)] = column
+            setattr(self, name, grown)
+
+
+def simulate(config: SimulationConfig) -> SimulationReport:
+    """Simulate the economy with the given population and behaviours."""
+    return EconomySimulator(config).run()
@@ -0,0 +1,124 @@
+"""Versioned synchronization of the player and lab state, sending only what changed since the client's last ack."""
+
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from aiventure.constants import STATE_FULL_RESYNC_INTERVAL, STATE_MAX_PENDING_VERSIONS
+
+
+Entities = dict[str, dict[str, Any]]
+"""Flat state, mapping entity keys such as `labs/<id>/models/<id>` to their fields."""
+
+
+class StatePatch(BaseModel):
+    """Changes to apply to the state of version `base` to get the state of version `version`."""
+
+    version: int
+    base: int | None = Field(description="Acknowledged version the patch applies to, or None for a full state.")
+    upserts: Entities = Field(description="New entities with all their fields, changed entities with changed fields.")
+    removals: list[str] = Field(default_factory=list, description="Keys of the removed entities.")
+
+
+def flatten(key: str, document: dict[str, Any]) -> Entities:
+    """Split a dumped response into one entity per object, the lists of objects becoming child entities."""
+    entities: Entities = {}
+    fields: dict[str, Any] = {}
+    for name, value in document.items():
+        if isinstance(value, list) and all(isinstance(item, dict) for item in value):
+            for item in value:
+                entities |= flatten(f"{key}/{name}/{_entity_id(item)}", item)
+        else:
+            fields[name] = value
+    entities[key] = fields
+
+    return entities
+
+
+def _entity_id(item: dict[str, Any]) -> str:
+    """Id of an object, or of the object it links to for the investors and investments."""
+    if "id" in item:
+        return str(item["id"])
+    return next(str(value["id"]) for value in item.values() if isinstance(value, dict) and "id" in value)
+
+
+def _in_scope(key: str, scope: str) -> bool:
+    """Whether an entity belongs to the given scope, i.e. is the scope entity or one of its children."""
+    return key == scope or key.startswith(f"{scope}/")
+
+
+class StateSync:
+    """State last sent to a connection, diffed against the state the client acknowledged.
+
+    Each change of the state creates a new version. Patches are relative to the last acknowledged version, so a lost
+    or late ack only makes the next patch larger. A full state is sent first, every `full_resync_interval` versions,
+    when too many versions are waiting for an ack, and when the client acks a version unknown to the server (e.g. 0 to
+    request a resync).
+    """
+
+    def __init__(
+        self,
+        full_resync_interval: int = STATE_FULL_RESYNC_INTERVAL,
+        max_pending_versions: int = STATE_MAX_PENDING_VERSIONS,
+    ) -> None:
+        """Initialize an empty state, the first patch being a full state."""
+        self.full_resync_interval = full_resync_interval
+        self.max_pending_versions = max_pending_versions
+
+        self.version = 0
+        self.acked_version: int | None = None
+        self.acked: Entities = {}
+        self.current: Entities = {}
+        self.pending: dict[int, Entities] = {}
+        self._last_full_version = 0
+        self._resync = True
+
+    def update(self, scope: str, entities: Entities) -> StatePatch | None:
+        """Replace the entities of a scope, returning the patch to send or None when nothing changed."""
+        state = {key: fields for key, fields in self.current.items() if not _in_scope(key, scope)} | entities
+        if state == self.current and not self._resync:
+            return None
+
+        self.version += 1
+        self.current = state
+        self.pending[self.version] = state
+
+        if (
+            self._resync
+            or self.acked_version is None
+            or len(self.pending) > self.max_pending_versions
+            or self.version - self._last_full_version >= self.full_resync_interval
+        ):
+            # Older versions are not needed anymore once the client has the full state
+            self.pending = {self.version: state}
+            self._last_full_version = self.version
+            self._resync = False
+            return StatePatch(version=self.version, base=None, upserts=state)
+
+        upserts: Entities = {}
+        for key, fields in state.items():
+            acked_fields = self.acked.get(key)
+            if acked_fields is None:
+                upserts[key] = fields
+            elif acked_fields != fields:
+                upserts[key] = {name: value for name, value in fields.items() if acked_fields.get(name) != value}
+
+        return StatePatch(
+            version=self.version,
+            base=self.acked_version,
+            upserts=upserts,
+            removals=[key for key in self.acked if key not in state],
+        )
+
+    def ack(self, version: int) -> None:
+        """Record that the client applied a version, or schedule a full state if the version is unknown."""
+        acked = self.pending.get(version)
+        if acked is None:
+            # Late acks of the versions preceding a full state are stale, not a resync request
+            if not 0 < version < self._last_full_version:
+                self._resync = True
+            return
+
+        self.acked_version = version
+        self.acked = acked
+        self.pending = {pending: state for pending, state in self.pending.items() if pending > version}
@@ -0,0 +1,278 @@
+"""Write-behind buffer for player funds and lab metrics updates."""
+
+import asyncio
+import json
+import logging
+import os
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import Insert, bindparam, event, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import SQLModel
+
+from aiventure.config import settings
+from aiventure.keys import new_id
+from aiventure.metrics import metrics
+from aiventure.models import FundsLedgerEntry, FundsReasonEnum, Lab, Player
+
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class WriteJournal:
+    """Append-only file of the buffered operations, replayed after a crash.
+
+    On flush the journal is rotated to a `.flushing` file that is only removed once the database commit succeeded,
+    so operations are lost neither when the process dies nor when a flush fails. When the process dies between the
+    commit and the removal, the flushed operations are replayed again: funds ledger entries are then skipped by
+    their operation id, and lab metrics are set to the values they already have.
+    """
+
+    def __init__(self, path: str, fsync: bool = False) -> None:
+        """Initialize the journal."""
+        self.path = Path(path)
+        self.flushing_path = self.path.with_name(f"{self.path.name}.flushing")
+        self.fsync = fsync
+        self._file = self.path.open("a", encoding="utf-8")
+
+    async def append(self, operation: list[Any]) -> None:
+        """Append an operation."""
+        self._file.write(json.dumps(operation) + "\n")
+        self._file.flush()
+        if self.fsync:
+            await asyncio.to_thread(os.fsync, self._file.fileno())
+
+    def rotate(self) -> None:
+        """Move the current operations aside before flushing them and start a new journal."""
+        self._file.close()
+        with self.flushing_path.open("a", encoding="utf-8") as flushing:
+            flushing.write(self.path.read_text(encoding="utf-8"))
+        self._file = self.path.open("w", encoding="utf-8")
+
+    def commit(self) -> None:
+        """Forget the operations that were flushed."""
+        self.flushing_path.unlink(missing_ok=True)
+
+    def replay(self) -> list[list[Any]]:
+        """Read the operations that were not flushed, oldest first."""
+        operations = []
+        for path in (self.flushing_path, self.path):
+            if path.exists():
+                operations += [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line]
+        return operations
+
+    def close(self) -> None:
+        """Close the journal file."""
+        self._file.close()
+
+
+class WriteBehindBuffer:
+    """Buffer validated funds and lab metrics updates in memory and write them in bulk.
+
+    Funds updates are accumulated as funds ledger entries and lab metrics as the latest value per lab. They are
+    flushed every `write_behind_flush_interval_ms` milliseconds, or as soon as `write_behind_max_ops` operations
+    are pending, with a single `executemany` statement per table. Until they are committed, the pending values are
+    applied to every player and lab loaded from the database, whatever the query, so that callers always see the
+    buffered values.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the write-behind buffer."""
+        self.enabled = settings.write_behind_enabled
+
+        self._funds: dict[str, float] = {}
+        self._ledger: list[dict[str, Any]] = []
+        self._labs: dict[str, dict[str, float]] = {}
+        self._n_operations = 0
+        # Updates being flushed, still served until their commit
+        self._inflight_funds: dict[str, float] = {}
+        self._inflight_labs: dict[str, dict[str, float]] = {}
+
+        self._async_session: async_sessionmaker[AsyncSession] | None = None
+        self._journal: WriteJournal | None = None
+        self._flush_lock: asyncio.Lock | None = None
+        self._full: asyncio.Event | None = None
+        self._flush_task: asyncio.Task[None] | None = None
+
+    async def start(self, async_session: async_sessionmaker[AsyncSession]) -> None:
+        """Replay the journal and start the periodic flush."""
+        if not self.enabled:
+            return
+
+        self._async_session = async_session
+        self._flush_lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        if settings.write_behind_journal_path:
+            self._journal = WriteJournal(settings.write_behind_journal_path, settings.write_behind_journal_fsync)
+            for operation in self._journal.replay():
+                self._apply(operation)
+            if self._n_operations:
+                logger.info(f"Replayed {self._n_operations} operations from the write-behind journal")
+
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write everything that is still pending."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+
+        await self.flush()
+        if self._journal:
+            self._journal.close()
+
+    async def add_funds(self, player_id: str, amount: float, reason: FundsReasonEnum) -> None:
+        """Buffer a funds increment, or a decrement with a negative amount."""
+        await self._record(["funds", player_id, amount, reason.value, datetime.now(UTC).isoformat(), new_id()])
+
+    async def set_lab_metrics(self, lab_id: str, **values: float) -> None:
+        """Buffer new values of lab metrics such as `income` or `valuation`."""
+        await self._record(["lab", lab_id, values])
+
+    def pending_funds(self, player_id: str) -> float:
+        """Funds delta of a player that is not written to the database yet."""
+        return self._inflight_funds.get(player_id, 0.0) + self._funds.get(player_id, 0.0)
+
+    def pending_lab_metrics(self, lab_id: str) -> dict[str, float]:
+        """Metrics of a lab that are not written to the database yet."""
+        return self._inflight_labs.get(lab_id, {}) | self._labs.get(lab_id, {})
+
+    def apply_to_player(self, player: Player) -> None:
+        """Add the pending funds delta to a player freshly loaded from the database."""
+        if player.id in self._funds or player.id in self._inflight_funds:
+            set_committed_value(player, "funds", player.funds + self.pending_funds(player.id))
+
+    def apply_to_lab(self, lab: Lab) -> None:
+        """Replace the metrics of a lab freshly loaded from the database by the pending values."""
+        for name, value in self.pending_lab_metrics(lab.id).items():
+            set_committed_value(lab, name, value)
+
+    async def flush(self) -> None:
+        """Write every pending update, with one bulk statement per table."""
+        if self._flush_lock is None:
+            return
+
+        async with self._flush_lock:
+            if not self._n_operations or self._async_session is None:
+                return
+
+            funds, ledger, labs, n_operations = self._funds, self._ledger, self._labs, self._n_operations
+            self._funds, self._ledger, self._labs, self._n_operations = {}, [], {}, 0
+            self._inflight_funds, self._inflight_labs = funds, labs
+            if self._journal:
+                self._journal.rotate()
+
+            try:
+                async with self._async_session() as session:
+                    if ledger:
+                        await session.execute(_insert_ledger_entries(session.get_bind().dialect.name), ledger)
+                    # Labs are grouped by updated metrics, as each group needs its own statement
+                    labs_table = SQLModel.metadata.tables[Lab.__tablename__]
+                    for names in {tuple(sorted(values)) for values in labs.values()}:
+                        await session.execute(
+                            update(labs_table)
+                            .where(labs_table.c.id == bindparam("lab_id"))
+                            .values({name: bindparam(f"new_{name}") for name in names}),
+                            [
+                                {"lab_id": lab_id} | {f"new_{name}": values[name] for name in names}
+                                for lab_id, values in labs.items()
+                                if tuple(sorted(values)) == names
+                            ],
+                        )
+                    await session.commit()
+                    self._inflight_funds, self._inflight_labs = {}, {}
+
+            except Exception:
+                self._inflight_funds, self._inflight_labs = {}, {}
+                # Put the operations back in front of the ones received in the meantime
+                for player_id, delta in funds.items():
+                    self._funds[player_id] = delta + self._funds.get(player_id, 0.0)
+                for lab_id, values in labs.items():
+                    self._labs[lab_id] = values | self._labs.get(lab_id, {})
+                self._ledger = ledger + self._ledger
+                self._n_operations += n_operations
+                metrics.increment("write_behind.flush_errors")
+                raise
+
+            if self._journal:
+                self._journal.commit()
+            metrics.increment("write_behind.flushes")
+            metrics.observe("write_behind.flushed_operations", n_operations)
+
+    async def _record(self, operation: list[Any]) -> None:
+        """Journal and apply an operation, waking up the flush loop when the buffer is full."""
+        if self._journal:
+            await self._journal.append(operation)
+
+        self._apply(operation)
+        metrics.set_gauge("write_behind.pending_operations", self._n_operations)
+        if self._full and self._n_operations >= settings.write_behind_max_ops:
+            self._full.set()
+
+    def _apply(self, operation: list[Any]) -> None:
+        """Merge an operation in the pending updates."""
+        match operation:
+            case ["funds", player_id, amount, reason, created_at, operation_id]:
+                self._funds[player_id] = self._funds.get(player_id, 0.0) + amount
+                self._ledger.append(
+                    {
+                        "player_id": player_id,
+                        "amount": amount,
+                        "reason": FundsReasonEnum(reason),
+                        "created_at": datetime.fromisoformat(created_at),
+                        "operation_id": operation_id,
+                    }
+                )
+            case ["lab", lab_id, values]:
+                self._labs[lab_id] = self._labs.get(lab_id, {}) | values
+
+        self._n_operations += 1
+
+    async def _flush_loop(self) -> None:
+        """Flush the buffer periodically or when it is full."""
+        while self._full:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=settings.write_behind_flush_interval_ms / 1000)
+            except TimeoutError:
+                pass
+            self._full.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing the write-behind buffer: {e}")
+
+
+def _insert_ledger_entries(dialect_name: str) -> Insert:
+    """Bulk insert of funds ledger entries skipping the operations that a previous flush already wrote."""
+    table = SQLModel.metadata.tables[FundsLedgerEntry.__tablename__]
+    if dialect_name == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing(index_elements=["operation_id"])
+    if dialect_name == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing(index_elements=["operation_id"])
+    raise ValueError(f"The write-behind buffer does not support the {dialect_name} dialect.")
+
+
+write_buffer = WriteBehindBuffer()
+
+
+@event.listens_for(Player, "load")
+@event.listens_for(Player, "refresh")
+def _apply_pending_funds(player: Player, context: Any, attributes: Any = None) -> None:
+    """Serve the player funds through the write-behind buffer, unless they were not reloaded."""
+    if attributes is None or "funds" in attributes:
+        write_buffer.apply_to_player(player)
+
+
+@event.listens_for(Lab, "load")
+@event.listens_for(Lab, "refresh")
+def _apply_pending_lab_metrics(lab: Lab, context: Any, attributes: Any = None) -> None:
+    """Serve the lab metrics through the write-behind buffer."""
+    write_buffer.apply_to_lab(lab)
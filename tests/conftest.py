@@ -1,6 +1,18 @@
 """Fixtures module for the tests."""
 
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator
+
 import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlmodel import SQLModel
+
+from aiventure.constants import BASE_PLAYER_FUNDS
+from aiventure.database import create_engine
+from aiventure.db import LabCRUD, PlayerCRUD, UsersCRUD
+from aiventure.models import LabBase, LocationEnum, PlayerBase, UserCreate
 
 
 @pytest.fixture()
@@ -22,3 +34,81 @@ def readme_content() -> str:
     """Return the content of the README.md file."""
     with open("README.md", "r") as file:
         return file.read()
+
+
+@dataclass
+class World:
+    """Ids of the entities created by `build_world`."""
+
+    user_id: str
+    player_id: str
+    lab_id: str
+
+
+async def create_tables(async_engine: AsyncEngine) -> None:
+    """Create all the tables of the models."""
+    async with async_engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.create_all)
+
+
+@asynccontextmanager
+async def open_database(db_connection_str: str) -> AsyncIterator[async_sessionmaker[AsyncSession]]:
+    """Create the tables of a database and yield its session factory, disposing of the engine on exit."""
+    async_engine = create_engine(db_connection_str)
+    try:
+        await create_tables(async_engine)
+        yield async_sessionmaker(bind=async_engine, expire_on_commit=False)
+    finally:
+        await async_engine.dispose()
+
+
+async def build_world(
+    async_session: async_sessionmaker[AsyncSession],
+    name: str = "World",
+    funds: float = BASE_PLAYER_FUNDS,
+    valuation: float = 0,
+    income: float = 0,
+) -> World:
+    """Create a user and its player owning a "tech-tree" lab through the CRUDs, all named after `name`."""
+    async with async_session() as session:
+        user = await UsersCRUD(session).create(
+            UserCreate(email=f"{name.lower().replace(' ', '-')}@test.com", password="test")
+        )
+        player = await PlayerCRUD(session).create(PlayerBase(name=name, avatar="", user_id=user.id, funds=funds))
+        lab = await LabCRUD(session).create(
+            LabBase(
+                name=f"{name} Lab",
+                location=LocationEnum.US,
+                valuation=valuation,
+                income=income,
+                tech_tree_id="tech-tree",
+                player_id=player.id,
+            )
+        )
+
+    return World(user_id=user.id, player_id=player.id, lab_id=lab.id)
+
+
+@pytest.fixture()
+def async_engine() -> Iterator[AsyncEngine]:
+    """Return the engine of a new in-memory database with all the tables.
+
+    The database lives in a single connection, so it can be used by the successive `asyncio.run` of a test but not by
+    concurrent sessions.
+    """
+    async_engine = create_engine("sqlite+aiosqlite://")
+    asyncio.run(create_tables(async_engine))
+    yield async_engine
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture()
+def async_session(async_engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    """Return the session factory of the in-memory database."""
+    return async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+
+@pytest.fixture()
+def world(async_session: async_sessionmaker[AsyncSession]) -> World:
+    """Create a player owning a lab in the in-memory database."""
+    return asyncio.run(build_world(async_session))
@@ -0,0 +1,76 @@
+"""Test the per-player actors."""
+
+import asyncio
+
+import pytest
+
+from aiventure.actors import PlayerActors
+
+
+async def run_messages() -> dict[str, list[str]]:
+    """Send interleaving messages to two players, the messages of the second player unblocking the first one."""
+    actors = PlayerActors()
+    events: dict[str, list[str]] = {"one": [], "two": []}
+    unblocked = asyncio.Event()
+
+    async def work(player: str, name: str) -> str:
+        events[player].append(f"start {name}")
+        if player == "one" and name == "a":
+            await asyncio.wait_for(unblocked.wait(), 1)
+        else:
+            await asyncio.sleep(0)
+        if player == "two":
+            unblocked.set()
+        events[player].append(f"end {name}")
+        return name
+
+    results = await asyncio.gather(
+        actors.ask("one", lambda: work("one", "a")),
+        actors.ask("one", lambda: work("one", "b")),
+        actors.ask("two", lambda: work("two", "c")),
+    )
+    events["results"] = list(results)
+    await actors.stop()
+    return events
+
+
+async def stop_when_idle() -> tuple[int, int]:
+    """Run a message in an actor with a short idle timeout, and count the actors before and after it stopped."""
+    actors = PlayerActors(idle_timeout=0.01)
+    await actors.ask("one", lambda: asyncio.sleep(0))
+    running = len(actors._actors)
+    await asyncio.sleep(0.05)
+    return running, len(actors._actors)
+
+
+async def fail() -> None:
+    """Run a failing message in an actor, then a message in the same actor."""
+    actors = PlayerActors()
+
+    async def error() -> None:
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError, match="failed"):
+        await actors.ask("one", error)
+    assert await actors.ask("one", lambda: asyncio.sleep(0, result="next")) == "next"
+    await actors.stop()
+
+
+class TestPlayerActors:
+    """Test the serialization of the messages of each player."""
+
+    def test_messages_of_a_player_are_serialized(self) -> None:
+        """Test that messages of a player never interleave, while other players are not blocked by them."""
+        events = asyncio.run(run_messages())
+
+        assert events["one"] == ["start a", "end a", "start b", "end b"]
+        assert events["two"] == ["start c", "end c"]
+        assert events["results"] == ["a", "b", "c"]
+
+    def test_failures_are_returned(self) -> None:
+        """Test that the failure of a message is raised to its sender, and that the actor keeps running."""
+        asyncio.run(fail())
+
+    def test_idle_actors_stop(self) -> None:
+        """Test that actors stop once their mailbox stayed empty for the idle timeout."""
+        assert asyncio.run(stop_when_idle()) == (1, 0)
@@ -0,0 +1,62 @@
+"""Test the admission control of the game websocket handshakes."""
+
+import asyncio
+
+from aiventure.admission import AdmissionController
+from aiventure.game_manager import ConnectedUser, GameManager
+from aiventure.metrics import metrics
+
+from .test_heartbeat import HeartbeatWebSocket
+
+
+async def handshakes(controller: AdmissionController, n_handshakes: int) -> list[bool]:
+    """Start handshakes at once, each admitted one holding its slot for a while."""
+
+    async def handshake() -> bool:
+        async with controller.admit() as admitted:
+            if admitted:
+                await asyncio.sleep(0.01)
+            return admitted
+
+    return await asyncio.gather(*(handshake() for _ in range(n_handshakes)))
+
+
+async def connect_storm(manager: GameManager, n_users: int) -> None:
+    """Connect users at once, then wait for the global game state broadcast."""
+    for index in range(n_users):
+        manager.active_connections[str(index)] = ConnectedUser.model_construct(websocket=HeartbeatWebSocket())
+        manager._schedule_global_state()
+    await asyncio.sleep(manager._global_state_delay * 2)
+
+
+class TestAdmission:
+    """Test that handshakes are bounded, queued, then rejected."""
+
+    def test_admission(self) -> None:
+        """Test that the handshakes over the slots wait in the queue, and that those over the queue are rejected."""
+        admitted = asyncio.run(handshakes(AdmissionController(2, 2, 1.0, retry_after=5), 6))
+        assert admitted == [True, True, True, True, False, False]
+        assert metrics.gauges["game.admission.queue_depth"] == 0
+        assert metrics.histograms["game.admission.handshake_latency"].max >= 0.01
+
+        # The queued handshakes are rejected once they waited too long
+        admitted = asyncio.run(handshakes(AdmissionController(1, 2, 0.001, retry_after=5), 3))
+        assert admitted == [True, False, False]
+
+    def test_retry_after(self) -> None:
+        """Test that the retry delays are spread between the configured delay and twice as much."""
+        controller = AdmissionController(1, 0, 1.0, retry_after=5)
+        delays = {controller.jittered_retry_after() for _ in range(200)}
+        assert min(delays) >= 5 and max(delays) <= 10 and len(delays) > 1
+
+    def test_global_state_is_debounced(self) -> None:
+        """Test that a connection storm broadcasts the global game state once, with the final count."""
+        manager = GameManager()
+        manager._global_state_delay = 0.01
+        broadcasts = metrics.counters["game.global_state.broadcasts"]
+
+        asyncio.run(connect_storm(manager, 5))
+
+        assert metrics.counters["game.global_state.broadcasts"] == broadcasts + 1
+        for connection in manager.active_connections.values():
+            assert connection.websocket.sent == [{"n_connected_players": 5}]
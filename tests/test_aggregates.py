@@ -0,0 +1,78 @@
+"""Test the player aggregate kept in memory by the game connections."""
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+from aiventure.database import count_queries
+from aiventure.db import LabCRUD, UsersCRUD
+from aiventure.dispatch import GameConnection, registry
+from aiventure.metrics import metrics
+from aiventure.models import LabBase, LocationEnum, UserCreate
+
+from .conftest import open_database
+from .test_dispatch import FakeWebSocket
+
+
+async def play_with_outside_change(db_path: Path) -> dict[str, Any]:
+    """Create a lab and a model, then create another lab of the player outside of the connection."""
+    result: dict[str, Any] = {}
+    async with open_database(f"sqlite+aiosqlite:///{db_path}") as async_session:
+        async with async_session() as session:
+            user = await UsersCRUD(session).create(UserCreate(email="aggregate@test.com", password="test"))
+            connection = GameConnection(FakeWebSocket(), session, user)  # type: ignore[arg-type]
+
+            async def dispatch(action: str, payload: dict[str, Any]) -> None:
+                message = connection.codec.encode_data({"action": action, "payload": payload})
+                await registry.dispatch(connection, message)
+
+            await dispatch("create-player", {"name": "Player", "avatar": "a.png"})
+            await dispatch("create-lab", {"name": "Lab Zero", "location": "eu"})
+            lab_id = connection.player.data.labs[0].id
+            result["version"] = connection.player.version
+
+            with count_queries() as counter:
+                assert connection.player.owned_lab(lab_id)
+            result["ownership_queries"] = counter.count
+
+            reloads = metrics.counters.get("game.player_aggregate.reloads", 0)
+            await dispatch("create-model", {"name": "GPT", "category": 1, "lab_id": lab_id})
+            result["valuation"] = connection.player.data.labs[0].valuation
+            result["model_reloads"] = metrics.counters.get("game.player_aggregate.reloads", 0) - reloads
+
+        async with async_session() as session:
+            # A lab created by another connection of the same player
+            await LabCRUD(session).create(
+                LabBase(
+                    name="Other Lab",
+                    location=LocationEnum.US,
+                    valuation=0,
+                    income=0,
+                    tech_tree_id="tech-tree",
+                    player_id=connection.player.id,
+                )
+            )
+
+        async with async_session() as session:
+            connection.session = session
+            reloads = metrics.counters.get("game.player_aggregate.reloads", 0)
+            await dispatch("create-model", {"name": "BERT", "category": 1, "lab_id": lab_id})
+            result["outside_reloads"] = metrics.counters.get("game.player_aggregate.reloads", 0) - reloads
+            result["labs"] = sorted(lab.name for lab in connection.player.data.labs)
+
+    return result
+
+
+class TestPlayerAggregate:
+    """Test that the player aggregate follows the writes of the connection and the changes made elsewhere."""
+
+    def test_aggregate(self, tmp_path: Path) -> None:
+        """Test that connection writes apply locally, and that a change made elsewhere reloads the aggregate."""
+        result = asyncio.run(play_with_outside_change(tmp_path / "game.db"))
+
+        assert result["version"] == 1
+        assert result["ownership_queries"] == 0
+        assert result["valuation"] > 0
+        assert result["model_reloads"] == 0
+        assert result["outside_reloads"] == 1
+        assert result["labs"] == ["Lab Zero", "Other Lab"]
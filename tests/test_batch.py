@@ -0,0 +1,141 @@
+"""Test the batch action."""
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlmodel import SQLModel
+
+from aiventure.codecs import JSON
+from aiventure.config import settings
+from aiventure.constants import BASE_PLAYER_FUNDS, CREATE_LAB_COST, CREATE_MODEL_COST
+from aiventure.db import LabCRUD, UsersCRUD
+from aiventure.dispatch import GameConnection, registry
+from aiventure.models import UserCreate
+from aiventure.write_buffer import write_buffer
+
+from .conftest import open_database
+from .test_dispatch import FakeWebSocket, play
+
+
+def create_model(name: str, lab_id: str) -> dict:
+    """Build a create model action."""
+    return {"action": "create-model", "payload": {"name": name, "category": 1, "lab_id": lab_id}}
+
+
+async def fail(*_: Any) -> None:
+    """Fail a revaluation."""
+    raise RuntimeError("Revaluation failed")
+
+
+async def read_stored_metrics(async_session: async_sessionmaker[AsyncSession], lab_id: str) -> tuple[float, float]:
+    """Read the income and valuation of a lab as stored in the database, bypassing the write-behind buffer."""
+    columns = SQLModel.metadata.tables["labs"].c
+    async with async_session() as session:
+        result = await session.execute(select(columns.income, columns.valuation).where(columns.id == lab_id))
+        income, valuation = result.one()
+        return income, valuation
+
+
+async def fail_buffered_batch(db_path: Path) -> list[Any]:
+    """Fail the revaluation of a batch with the write-behind buffer running, reading the lab metrics around it."""
+    websocket = FakeWebSocket()
+    async with open_database(f"sqlite+aiosqlite:///{db_path}") as async_session, async_session() as session:
+        await write_buffer.start(async_session)
+        user = await UsersCRUD(session).create(UserCreate(email="batch@test.com", password="test"))
+        connection = GameConnection(websocket, session, user)  # type: ignore[arg-type]
+        for message in (
+            {"action": "create-player", "payload": {"name": "Player", "avatar": "a.png"}},
+            {"action": "create-lab", "payload": {"name": "Lab Zero", "location": "eu"}},
+        ):
+            await registry.dispatch(connection, JSON.encode_data(message))
+        lab_id = websocket.sent[1]["payload"]["id"]
+        await write_buffer.flush()
+        values: list[Any] = [await read_stored_metrics(async_session, lab_id)]
+
+        websocket.sent = []
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            monkeypatch.setattr(LabCRUD, "update_valuation", fail)
+            batch = {"action": "batch", "payload": {"actions": [create_model("GPT-1", lab_id)]}}
+            await registry.dispatch(connection, JSON.encode_data(batch))
+
+        await write_buffer.stop()
+        values += [websocket.sent, await read_stored_metrics(async_session, lab_id)]
+
+    return values
+
+
+class TestBatch:
+    """Test that batches are applied all or nothing with a single response."""
+
+    def test_batch(self, tmp_path: Path) -> None:
+        """Test that a lab and its models are created by one batch, and that a failing batch changes nothing."""
+        create_lab = {"action": "create-lab", "payload": {"name": "Lab Zero", "location": "eu"}}
+        responses = asyncio.run(
+            play(
+                tmp_path / "game.db",
+                [
+                    {"action": "create-player", "payload": {"name": "Player", "avatar": "a.png"}},
+                    {
+                        "action": "batch",
+                        "payload": {"actions": [create_lab, create_model("GPT-1", "$0"), create_model("GPT-2", "$0")]},
+                    },
+                    {
+                        "action": "batch",
+                        "payload": {"actions": [create_lab, create_model("GPT-3", "$0"), create_model("GPT-1", "$0")]},
+                    },
+                    {"action": "batch", "payload": {"actions": [create_model("GPT-4", "$0")]}},
+                    {"action": "retrieve-player-data", "payload": {}},
+                ],
+            )
+        )
+
+        funds = BASE_PLAYER_FUNDS - CREATE_LAB_COST - 2 * CREATE_MODEL_COST
+        assert len(responses[1]) == 1
+        batch = responses[1][0]["payload"]
+        assert [model["name"] for model in batch["models"]] == ["GPT-1", "GPT-2"]
+        assert [(lab["name"], len(lab["models"])) for lab in batch["labs"]] == [("Lab Zero", 2)]
+        assert batch["labs"][0]["valuation"] > 0
+        assert batch["funds"] == funds
+
+        assert responses[2] == [
+            {"action": "batch", "payload": {}, "error": "Action 2 (create-model) failed: Model name already exists"}
+        ]
+        assert responses[3][0]["error"].endswith("No lab is created by the action 0 of the batch")
+
+        player = responses[4][0]["payload"]
+        assert [lab["name"] for lab in player["labs"]] == ["Lab Zero"]
+        assert player["funds"] == funds
+
+    def test_failed_revaluation(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that a batch whose labs cannot be revalued is neither applied nor charged."""
+        monkeypatch.setattr(LabCRUD, "update_valuation", fail)
+        create_lab = {"action": "create-lab", "payload": {"name": "Lab Zero", "location": "eu"}}
+        responses = asyncio.run(
+            play(
+                tmp_path / "game.db",
+                [
+                    {"action": "create-player", "payload": {"name": "Player", "avatar": "a.png"}},
+                    {"action": "batch", "payload": {"actions": [create_lab, create_model("GPT-1", "$0")]}},
+                    {"action": "retrieve-player-data", "payload": {}},
+                ],
+            )
+        )
+
+        assert responses[1] == [{"error": "Revaluation failed"}]
+        player = responses[2][0]["payload"]
+        assert (player["labs"], player["funds"]) == ([], BASE_PLAYER_FUNDS)
+
+    def test_failed_buffered_revaluation(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that the labs revalued by a failing batch keep their metrics with the write-behind buffer enabled."""
+        monkeypatch.setattr(write_buffer, "enabled", True)
+        monkeypatch.setattr(settings, "write_behind_flush_interval_ms", 60_000)
+        monkeypatch.setattr(settings, "write_behind_journal_path", None)
+
+        metrics_before, responses, metrics_after = asyncio.run(fail_buffered_batch(tmp_path / "game.db"))
+
+        assert responses == [{"error": "Revaluation failed"}]
+        assert metrics_after == metrics_before
@@ -0,0 +1,105 @@
+"""Test the database engine factory."""
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import exc
+
+from aiventure.config import SQLITE_PROFILES, settings
+from aiventure.database import WARM_UP_STATEMENTS, count_queries, create_engine, read_sqlite_pragmas, warm_up
+from aiventure.metrics import Metrics
+
+from .conftest import create_tables
+
+
+async def open_and_read_pragmas(db_connection_str: str) -> dict[str, Any]:
+    """Open an engine and read back the pragmas active on its connections."""
+    async_engine = create_engine(db_connection_str)
+    try:
+        return await read_sqlite_pragmas(async_engine)
+    finally:
+        await async_engine.dispose()
+
+
+async def exhaust_pool(db_connection_str: str) -> None:
+    """Check out the only connection of the pool, then wait for another one."""
+    async_engine = create_engine(db_connection_str)
+    try:
+        async with async_engine.connect():
+            async with async_engine.connect():
+                pass
+    finally:
+        await async_engine.dispose()
+
+
+async def warm_up_pool(db_connection_str: str) -> tuple[int, int, int]:
+    """Warm up the pool of a new engine, returning the warmed up connections, their queries and the idle ones."""
+    async_engine = create_engine(db_connection_str)
+    try:
+        await create_tables(async_engine)
+        with count_queries() as counter:
+            n_connections = await warm_up(async_engine)
+        return n_connections, counter.count, async_engine.sync_engine.pool.checkedin()  # type: ignore[attr-defined]
+    finally:
+        await async_engine.dispose()
+
+
+class TestSQLitePragmas:
+    """Test the SQLite pragma profiles."""
+
+    def test_throughput_profile(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that every pragma of the throughput profile is active on the connections of the engine."""
+        monkeypatch.setattr(settings, "db_profile", "throughput")
+
+        pragmas = asyncio.run(open_and_read_pragmas(f"sqlite+aiosqlite:///{tmp_path / 'game.db'}"))
+
+        assert pragmas == SQLITE_PROFILES["throughput"]
+
+    def test_overrides(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that the individual overrides apply on top of the profile."""
+        monkeypatch.setattr(settings, "db_profile", "throughput")
+        monkeypatch.setattr(settings, "db_synchronous", "FULL")
+        monkeypatch.setattr(settings, "db_busy_timeout", 100)
+
+        pragmas = asyncio.run(open_and_read_pragmas(f"sqlite+aiosqlite:///{tmp_path / 'game.db'}"))
+
+        assert pragmas == SQLITE_PROFILES["throughput"] | {"synchronous": "FULL", "busy_timeout": 100}
+
+
+class TestConnectionPool:
+    """Test the instrumented connection pool."""
+
+    @pytest.fixture()
+    def pool_metrics(self, monkeypatch: pytest.MonkeyPatch) -> Metrics:
+        """Record the pool metrics in a registry of their own."""
+        pool_metrics = Metrics()
+        monkeypatch.setattr("aiventure.database.metrics", pool_metrics)
+        return pool_metrics
+
+    def test_exhaustion(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, pool_metrics: Metrics) -> None:
+        """Test that waiting for a connection of an exhausted pool times out and is recorded."""
+        monkeypatch.setattr(settings, "db_pool_size", 1)
+        monkeypatch.setattr(settings, "db_max_overflow", 0)
+        monkeypatch.setattr(settings, "db_pool_timeout", 0.05)
+
+        with pytest.raises(exc.TimeoutError):
+            asyncio.run(exhaust_pool(f"sqlite+aiosqlite:///{tmp_path / 'game.db'}"))
+
+        snapshot = pool_metrics.snapshot()
+        assert snapshot.counters == {"db.pool.exhausted": 1}
+        assert snapshot.gauges == {"db.pool.checked_out": 0, "db.pool.overflow": 0}
+        checkout_wait = snapshot.histograms["db.pool.checkout_wait"]
+        assert checkout_wait.count == 2
+        assert checkout_wait.max >= 0.05
+
+    def test_warm_up(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, pool_metrics: Metrics) -> None:
+        """Test that every connection of the pool is opened and runs the hot path queries."""
+        monkeypatch.setattr(settings, "db_pool_size", 3)
+
+        n_connections, n_queries, idle = asyncio.run(warm_up_pool(f"sqlite+aiosqlite:///{tmp_path / 'game.db'}"))
+
+        assert n_connections == idle == 3
+        assert n_queries == 3 * len(WARM_UP_STATEMENTS)
+        assert pool_metrics.gauges["db.pool.checked_out"] == 0
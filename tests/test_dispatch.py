@@ -0,0 +1,155 @@
+"""Test the dispatch of the game messages to their handlers."""
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from aiventure.codecs import JSON, MESSAGE_PACK, Codec
+from aiventure.db import UsersCRUD
+from aiventure.dispatch import GameConnection, registry
+from aiventure.game_manager import GameAction
+from aiventure.handlers import create_lab
+from aiventure.metrics import metrics
+from aiventure.models import UserCreate
+from aiventure.rate_limit import RateLimiter
+
+from .conftest import open_database
+
+
+class FakeWebSocket:
+    """Websocket recording the sent messages."""
+
+    def __init__(self) -> None:
+        """Initialize the websocket."""
+        self.sent: list[dict[str, Any]] = []
+
+    async def send_text(self, data: str) -> None:
+        """Record a text message."""
+        self.sent.append(json.loads(data))
+
+    async def send_bytes(self, data: bytes) -> None:
+        """Record a binary message."""
+        msgpack = pytest.importorskip("msgpack")
+        self.sent.append(msgpack.unpackb(data))
+
+
+async def play(
+    db_path: Path,
+    messages: list[dict[str, Any] | str],
+    codec: Codec = JSON,
+    max_in_flight: int | None = None,
+    rate_limiter: RateLimiter | None = None,
+) -> list[list[dict[str, Any]]]:
+    """Dispatch messages on a new connection, returning the responses of each message.
+
+    With `max_in_flight`, read actions are pipelined and their responses come with the last list, sent once they all
+    completed.
+    """
+    websocket = FakeWebSocket()
+    async with open_database(f"sqlite+aiosqlite:///{db_path}") as async_session, async_session() as session:
+        user = await UsersCRUD(session).create(UserCreate(email="dispatch@test.com", password="test"))
+        connection = GameConnection(
+            websocket,  # type: ignore[arg-type]
+            session,
+            user,
+            codec,
+            async_session=async_session if max_in_flight else None,
+            max_in_flight=max_in_flight or 1,
+            rate_limiter=rate_limiter,
+        )
+
+        responses = []
+        for message in messages:
+            await registry.dispatch(connection, message if isinstance(message, str) else codec.encode_data(message))
+            responses.append(websocket.sent)
+            websocket.sent = []
+
+        await connection.wait_in_flight()
+        responses.append(websocket.sent)
+
+    return responses
+
+
+class TestDispatch:
+    """Test the handler registry and its middlewares."""
+
+    def test_actions_flow(self, tmp_path: Path) -> None:
+        """Test that messages reach their handlers, and that failures are shaped as error responses."""
+        responses = asyncio.run(
+            play(
+                tmp_path / "game.db",
+                [
+                    {"action": "create-lab", "payload": {"name": "Lab Zero", "location": "eu"}},
+                    {"action": "create-player", "payload": {"name": "Player", "avatar": "a.png"}},
+                    {"action": "create-lab", "payload": {"name": "Lab Zero", "location": "eu"}},
+                    {"action": "create-model", "payload": {"name": "GPT", "category": 9, "lab_id": "unknown"}},
+                    {"action": "create-lab", "payload": {"name": "Lab Zero"}},
+                    "{",
+                ],
+            )
+        )
+
+        assert responses[0] == [{"action": "create-lab", "payload": {}, "error": "Player not found"}]
+        assert [response["action"] for response in responses[1]] == ["create-player"]
+        assert [response["action"] for response in responses[2]] == ["create-lab", "update-funds"]
+        assert responses[2][0]["payload"]["name"] == "Lab Zero"
+        assert responses[3][0]["error"] == "You can only create a model for your lab."
+        assert responses[4][0]["error"] == "Invalid message"
+        assert responses[4][0]["details"][0]["loc"] == ["create-lab", "payload", "location"]
+        assert responses[5][0]["error"] == "Invalid message"
+
+        assert registry.routes[GameAction.CREATE_LAB].handler is create_lab
+        assert metrics.counters["game.actions.create-lab.calls"] >= 2
+        assert metrics.counters["game.actions.create-lab.errors"] >= 1
+        assert metrics.histograms["game.actions.create-lab.queries"].max > 0
+
+    def test_message_pack_encoding(self, tmp_path: Path) -> None:
+        """Test that a MessagePack connection receives the same responses as a JSON one."""
+        pytest.importorskip("msgpack")
+        messages: list[dict[str, Any] | str] = [
+            {"action": "create-player", "payload": {"name": "Player", "avatar": "a.png"}},
+            {"action": "create-lab", "payload": {"name": "Lab Zero"}},
+        ]
+        responses = asyncio.run(play(tmp_path / "game.db", messages, MESSAGE_PACK))
+
+        assert responses[0][0]["action"] == "create-player"
+        assert responses[0][0]["payload"]["name"] == "Player"
+        assert responses[1][0]["error"] == "Invalid message"
+
+    def test_pipelined_reads(self, tmp_path: Path) -> None:
+        """Test that read actions run concurrently up to the in-flight limit, with their responses identified."""
+        lab_read = {"action": "retrieve-lab", "payload": {"id": "unknown", "include": []}}
+        responses = asyncio.run(
+            play(
+                tmp_path / "game.db",
+                [
+                    {"action": "create-player", "payload": {"name": "Player", "avatar": "a.png"}, "request_id": "1"},
+                    lab_read | {"request_id": "2"},
+                    lab_read | {"request_id": "3"},
+                    {"action": "retrieve-player-data", "payload": {}, "request_id": "4"},
+                    {"action": "create-lab", "payload": {"name": "Lab Zero", "location": "eu"}, "request_id": "5"},
+                    {"action": "retrieve-player-data", "payload": {}},
+                ],
+                max_in_flight=2,
+            )
+        )
+
+        sent = [response for message_responses in responses for response in message_responses]
+        assert sent[0] == {"action": "create-player", "payload": sent[0]["payload"], "error": None, "request_id": "1"}
+        # The reads are answered in any order, but before the write, whose responses precede those of the next read
+        assert sorted((response["request_id"], response["error"]) for response in sent[1:4]) == [
+            ("2", "Lab not found"),
+            ("3", "Lab not found"),
+            ("4", None),
+        ]
+        assert [(response["action"], response["request_id"]) for response in sent[4:6]] == [
+            ("create-lab", "5"),
+            ("update-funds", "5"),
+        ]
+        assert [lab["name"] for lab in sent[6]["payload"]["labs"]] == ["Lab Zero"]
+        assert "request_id" not in sent[6]
+        assert len(sent) == 7
+        assert metrics.histograms["game.actions.in_flight"].max == 2
@@ -0,0 +1,50 @@
+"""Test the funds ledger and its snapshots."""
+
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlmodel import SQLModel
+
+from aiventure.db import PlayerCRUD
+from aiventure.models import FundsReasonEnum
+
+from .conftest import build_world
+
+
+async def record_and_snapshot(async_session: async_sessionmaker[AsyncSession]) -> list[tuple[float, float]]:
+    """Record funds changes around a snapshot, returning the read funds and the stored snapshot at each step."""
+    players = SQLModel.metadata.tables["players"]
+
+    async def read_funds(player_id: str) -> tuple[float, float]:
+        async with async_session() as session:
+            player = await PlayerCRUD(session).get_by_id(player_id)
+            snapshot = await session.execute(select(players.c.funds).where(players.c.id == player_id))
+            return (player.funds if player else 0.0, snapshot.scalar_one())
+
+    world = await build_world(async_session, "Ledger", funds=100)
+    async with async_session() as session:
+        await PlayerCRUD(session).increment_funds(world.player_id, 50, FundsReasonEnum.INCOME)
+        await PlayerCRUD(session).decrement_funds(world.player_id, 30, FundsReasonEnum.CREATE_LAB)
+
+    steps = [await read_funds(world.player_id)]
+    async with async_session() as session:
+        since = await PlayerCRUD(session).snapshot_funds()
+    steps.append(await read_funds(world.player_id))
+
+    async with async_session() as session:
+        await PlayerCRUD(session).increment_funds(world.player_id, 5, FundsReasonEnum.INCOME)
+    steps.append(await read_funds(world.player_id))
+    async with async_session() as session:
+        await PlayerCRUD(session).snapshot_funds(since)
+    steps.append(await read_funds(world.player_id))
+
+    return steps
+
+
+class TestFundsLedger:
+    """Test the funds ledger."""
+
+    def test_snapshot_plus_tail(self, async_session: async_sessionmaker[AsyncSession]) -> None:
+        """Test that funds are read as the snapshot plus the tail, whether the ledger is folded or not."""
+        assert asyncio.run(record_and_snapshot(async_session)) == [(120, 100), (120, 120), (125, 120), (125, 125)]
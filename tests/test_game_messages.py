@@ -0,0 +1,65 @@
+"""Test the parsing of the game messages."""
+
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from aiventure.game_manager import (
+    CreateLabMessage,
+    CreateModelMessage,
+    GameAction,
+    GameMessageResponse,
+    RetrievePlayerDataMessage,
+    encode_error,
+    encode_response,
+    game_message_adapter,
+)
+from aiventure.models import FundsUpdate, LocationEnum
+
+
+class TestGameMessages:
+    """Test the game messages."""
+
+    def test_action_selects_payload(self) -> None:
+        """Test that each action is parsed with its own payload model."""
+        message = game_message_adapter.validate_json(
+            '{"action": "create-lab", "payload": {"name": "Lab Zero", "location": "eu"}}'
+        )
+        assert isinstance(message, CreateLabMessage)
+        assert message.payload.location == LocationEnum.EU
+
+        message = game_message_adapter.validate_json(
+            '{"action": "create-model", "payload": {"name": "GPT", "category": 3, "lab_id": "abc"}}'
+        )
+        assert isinstance(message, CreateModelMessage)
+        assert message.payload.category == 3
+
+        message = game_message_adapter.validate_json('{"action": "retrieve-player-data"}')
+        assert isinstance(message, RetrievePlayerDataMessage)
+        assert message.action == GameAction.RETRIEVE_PLAYER_DATA
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            '{"action": "create-model", "payload": {"name": "GPT", "category": 3}}',
+            '{"action": "create-lab", "payload": {"name": "Lab Zero", "location": "mars"}}',
+            '{"action": "update-funds", "payload": {}}',
+            '{"payload": {}}',
+            "not json",
+        ],
+    )
+    def test_malformed_messages_are_rejected(self, data: str) -> None:
+        """Test that missing keys, invalid values and unknown actions fail validation."""
+        with pytest.raises(ValidationError):
+            game_message_adapter.validate_json(data)
+
+    def test_encoded_responses(self) -> None:
+        """Test that responses encoded from their payload model match the dumped responses, and errors are cached."""
+        payload = FundsUpdate(funds=12.5, update_type="increment")
+        expected = GameMessageResponse(action=GameAction.UPDATE_FUNDS, payload=payload.model_dump()).model_dump()
+
+        assert json.loads(encode_response(GameAction.UPDATE_FUNDS, payload)) == json.loads(json.dumps(expected))
+        assert encode_error(GameAction.CREATE_LAB, "Player not found") is encode_error(
+            GameAction.CREATE_LAB, "Player not found"
+        )
@@ -0,0 +1,71 @@
+"""Test the heartbeats and the reaper of the game connections."""
+
+import asyncio
+import json
+import time
+from typing import Any
+
+from aiventure.game_manager import ConnectedUser, GameManager
+from aiventure.metrics import metrics
+
+
+class HeartbeatWebSocket:
+    """Websocket recording the sent messages and its closing, failing to send if `broken`."""
+
+    def __init__(self, broken: bool = False) -> None:
+        """Initialize the websocket."""
+        self.broken = broken
+        self.sent: list[dict[str, Any]] = []
+        self.close_code: int | None = None
+
+    async def send_text(self, data: str) -> None:
+        """Record a text message."""
+        if self.broken:
+            raise ConnectionResetError("Connection reset by peer")
+        self.sent.append(json.loads(data))
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        """Record the closing code."""
+        self.close_code = code
+
+
+class TestHeartbeat:
+    """Test that only the live connections stay active."""
+
+    def test_reaper(self) -> None:
+        """Test that live connections are pinged, while dead, broken and idle ones are closed and forgotten."""
+        manager = GameManager()
+        now = time.monotonic()
+        websockets = {name: HeartbeatWebSocket(broken=name == "broken") for name in ("live", "dead", "broken", "idle")}
+        for name, websocket in websockets.items():
+            manager.active_connections[name] = ConnectedUser.model_construct(
+                player_id=name,
+                websocket=websocket,
+                last_seen=now - (manager._heartbeat_timeout + 1 if name == "dead" else 0),
+                last_active=now - (manager._idle_timeout + 1 if name == "idle" else 0),
+            )
+        reaped = {reason: metrics.counters[f"game.connections.reaped.{reason}"] for reason in ("dead", "idle")}
+
+        asyncio.run(manager._heartbeat())
+
+        assert list(manager.active_connections) == ["live"]
+        assert websockets["live"].sent == [{"action": "ping", "payload": {}, "error": None}]
+        assert {name: websocket.close_code for name, websocket in websockets.items()} == {
+            "live": None,
+            "dead": 4002,
+            "broken": 4002,
+            "idle": 4003,
+        }
+        assert metrics.counters["game.connections.reaped.dead"] == reaped["dead"] + 2
+        assert metrics.counters["game.connections.reaped.idle"] == reaped["idle"] + 1
+
+    def test_disconnect_keeps_newer_connections(self) -> None:
+        """Test that the end of a replaced websocket doesn't forget the newer connection of the same user."""
+        manager = GameManager()
+        old, new = HeartbeatWebSocket(), HeartbeatWebSocket()
+        manager.active_connections["user"] = ConnectedUser.model_construct(websocket=new)
+
+        manager.disconnect("user", old)
+        assert "user" in manager.active_connections
+        manager.disconnect("user", new)
+        assert "user" not in manager.active_connections
@@ -0,0 +1,87 @@
+"""Test the UUID keys, their generators and their storage."""
+
+import asyncio
+import random
+import uuid
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from sqlalchemy import Column, MetaData, Table, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from aiventure.keys import UUIDKey, convert_keys, uuid7
+
+from .conftest import World
+
+
+KEY_TABLES = ("users", "players", "labs")
+
+
+async def round_trip(async_engine: AsyncEngine, binary: bool, key: str) -> dict[str, Any]:
+    """Store a key in a column of the given storage, then read it back and look it up with another id."""
+    table = Table("keys", MetaData(), Column("id", UUIDKey(binary=binary), primary_key=True))
+    async with async_engine.begin() as connection:
+        await connection.run_sync(table.create)
+        await connection.execute(insert(table).values(id=key))
+        stored = await connection.exec_driver_sql("SELECT typeof(id) FROM keys")
+        return {
+            "storage": stored.scalar_one(),
+            "read": (await connection.execute(select(table.c.id))).scalar_one(),
+            "found": (await connection.execute(select(table.c.id).where(table.c.id == key))).scalar_one(),
+            "unknown": (await connection.execute(select(table.c.id).where(table.c.id == "unknown"))).all(),
+        }
+
+
+async def convert_and_read(async_engine: AsyncEngine, binary: bool) -> tuple[int, dict[str, set[str]]]:
+    """Convert the keys of the database, returning the number of rewritten rows and the storage of each table."""
+    async with async_engine.begin() as connection:
+        n_rows = await connection.run_sync(convert_keys, binary)
+        storages = {
+            table: set((await connection.exec_driver_sql(f"SELECT typeof(id) FROM {table}")).scalars())
+            for table in KEY_TABLES
+        }
+
+    return n_rows, storages
+
+
+class TestUUIDKeys:
+    """Test the UUID keys."""
+
+    def test_uuid7(self) -> None:
+        """Test that version 7 UUIDs are valid, time-ordered and reproducible from a seeded generator."""
+        ids = [uuid7() for _ in range(100)]
+
+        assert all(key.version == 7 and key.variant == uuid.RFC_4122 for key in ids)
+        assert [key.int >> 80 for key in ids] == sorted(key.int >> 80 for key in ids)
+        assert len(set(ids)) == len(ids)
+        assert (uuid7(random.Random(1)).int & ((1 << 62) - 1)) == (uuid7(random.Random(1)).int & ((1 << 62) - 1))
+
+    @pytest.mark.parametrize(("binary", "storage"), [(False, "text"), (True, "blob")])
+    def test_round_trip(self, async_engine: AsyncEngine, binary: bool, storage: str) -> None:
+        """Test that keys are stored in the given form, read back as strings, and that other ids match nothing."""
+        key = str(uuid7())
+
+        assert asyncio.run(round_trip(async_engine, binary, key)) == {
+            "storage": storage,
+            "read": key,
+            "found": key,
+            "unknown": [],
+        }
+
+    def test_convert_keys(self, async_engine: AsyncEngine, world: World) -> None:
+        """Test that the keys are converted to binary and back, and that converted rows are not rewritten."""
+        # The world is stored with the configured keys, start from text ones
+        asyncio.run(convert_and_read(async_engine, binary=False))
+
+        # A user, a player, a lab and the investment link of its owner
+        assert asyncio.run(convert_and_read(async_engine, binary=True)) == (4, dict.fromkeys(KEY_TABLES, {"blob"}))
+        assert asyncio.run(convert_and_read(async_engine, binary=True)) == (0, dict.fromkeys(KEY_TABLES, {"blob"}))
+        assert asyncio.run(convert_and_read(async_engine, binary=False)) == (4, dict.fromkeys(KEY_TABLES, {"text"}))
+
+    def test_convert_keys_requires_sqlite(self) -> None:
+        """Test that converting the keys of another database names its dialect."""
+        connection = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+
+        with pytest.raises(ValueError, match="postgresql"):
+            convert_keys(connection, binary=True)  # type: ignore[arg-type]
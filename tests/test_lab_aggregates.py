@@ -0,0 +1,63 @@
+"""Test the lab aggregates maintained by the CRUD operations."""
+
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from aiventure.db import AIModelCRUD, EmployeeCRUD, LabCRUD, PlayerLabInvestmentLinkCRUD
+from aiventure.models import AIModelBase, EmployeeBase
+
+from .conftest import build_world
+
+
+AGGREGATES = ("model_count", "employee_count", "employee_quality_sum", "investor_count")
+
+
+async def build_lab(
+    async_session: async_sessionmaker[AsyncSession],
+) -> tuple[dict[str, float], dict[str, float], tuple[float, float]]:
+    """Grow a lab through the CRUDs and return its incremental aggregates, the recounted ones and its metrics."""
+    owner = await build_world(async_session, "Aggregates")
+    investor = await build_world(async_session, "Investor")
+    lab_id = owner.lab_id
+
+    async with async_session() as session:
+        for index in range(3):
+            await AIModelCRUD(session).create(
+                AIModelBase(name=f"Model {index}", ai_model_type_id=1, tech_tree_id="tech-tree", lab_id=lab_id)
+            )
+        employees = [
+            await EmployeeCRUD(session).create(
+                EmployeeBase(name="Employee", salary=1, image_url="", role_id=1, quality_id=quality_id, lab_id=lab_id)
+            )
+            for quality_id in (1, 5, 7)
+        ]
+        await EmployeeCRUD(session).delete(employees[0].id)
+        await EmployeeCRUD(session).update(EmployeeBase(**employees[1].model_dump() | {"quality_id": 6}))
+        await PlayerLabInvestmentLinkCRUD(session).create(investor.player_id, lab_id, 0.1)
+
+    async with async_session() as session:
+        await LabCRUD(session).update_income(lab_id)
+        lab = await LabCRUD(session).update_valuation(lab_id)
+        incremental = {name: getattr(lab, name) for name in AGGREGATES}
+        metrics = (lab.income, lab.valuation) if lab else (0.0, 0.0)
+
+    async with async_session() as session:
+        await LabCRUD(session).recount_aggregates()
+        lab = await LabCRUD(session).get_by_id(lab_id)
+        recounted = {name: getattr(lab, name) for name in AGGREGATES}
+
+    return incremental, recounted, metrics
+
+
+class TestLabAggregates:
+    """Test the lab aggregates."""
+
+    def test_incremental_aggregates(self, async_session: async_sessionmaker[AsyncSession]) -> None:
+        """Test that the CRUDs keep the aggregates equal to a full recount, and the metrics use them."""
+        incremental, recounted, (income, valuation) = asyncio.run(build_lab(async_session))
+
+        assert incremental == recounted
+        assert incremental == {"model_count": 3, "employee_count": 2, "employee_quality_sum": 5.2, "investor_count": 2}
+        assert income > 0
+        assert valuation > 0
@@ -0,0 +1,62 @@
+"""Test the loader profiles of the relationships."""
+
+import asyncio
+from typing import Any
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from aiventure.database import count_queries
+from aiventure.db import LabCRUD, PlayerCRUD, PlayerLabInvestmentLinkCRUD
+from aiventure.db.loaders import LAB_DETAIL, PLAYER_DETAIL
+
+from .conftest import build_world
+
+
+async def load_profiles(async_session: async_sessionmaker[AsyncSession]) -> dict[str, Any]:
+    """Create a player owning a lab, then load them with the default and detail profiles."""
+    world = await build_world(async_session, "Loader", income=2.5)
+
+    loaders = {
+        "player": lambda session: PlayerCRUD(session).get_by_id(world.player_id),
+        "lab": lambda session: LabCRUD(session).get_by_id(world.lab_id),
+        "player_detail": lambda session: PlayerCRUD(session).get_by_id(world.player_id, PLAYER_DETAIL),
+        "lab_detail": lambda session: LabCRUD(session).get_by_id(world.lab_id, LAB_DETAIL),
+        "income": lambda session: PlayerLabInvestmentLinkCRUD(session).get_income_for_player(world.player_id),
+    }
+    loaded: dict[str, Any] = {}
+    for name, load in loaders.items():
+        # A session per load, so that an entity doesn't get the relationships loaded by another profile
+        async with async_session() as session:
+            with count_queries() as counter:
+                loaded[name] = await load(session)
+            loaded[f"{name}_queries"] = counter.count
+
+    return loaded
+
+
+class TestLoaderProfiles:
+    """Test that relationships are only loaded through loader profiles."""
+
+    def test_profiles(self, async_session: async_sessionmaker[AsyncSession]) -> None:
+        """Test that unloaded relationships raise, and that each profile loads its relationships in fixed queries."""
+        loaded = asyncio.run(load_profiles(async_session))
+
+        assert loaded["player_queries"] == loaded["lab_queries"] == 1
+        with pytest.raises(InvalidRequestError):
+            assert loaded["player"].labs
+        with pytest.raises(InvalidRequestError):
+            assert loaded["lab"].investors
+
+        player = loaded["player_detail"]
+        assert [lab.name for lab in player.labs] == [investment.lab.name for investment in player.investments]
+        assert loaded["player_detail_queries"] == 3
+
+        lab = loaded["lab_detail"]
+        assert lab.player.name == "Loader"
+        assert (lab.employees, lab.models) == ([], [])
+        assert [investor.player.name for investor in lab.investors] == ["Loader"]
+        assert loaded["lab_detail_queries"] == 4
+
+        assert loaded["income"] == 2.5 and loaded["income_queries"] == 1
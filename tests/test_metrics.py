@@ -0,0 +1,56 @@
+"""Test the in-process metrics and their endpoint."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from aiventure.metrics import Histogram, Metrics
+from aiventure.models import HistogramSnapshot
+from aiventure.router import core_router
+
+
+class TestMetrics:
+    """Test the metrics registry."""
+
+    def test_histogram(self) -> None:
+        """Test that a histogram summarizes the observed values."""
+        histogram = Histogram()
+        assert histogram.snapshot() == HistogramSnapshot(count=0, total=0, mean=0, max=0)
+
+        for value in (0.5, 2.0, 1.0):
+            histogram.observe(value)
+
+        assert histogram.snapshot() == HistogramSnapshot(count=3, total=3.5, mean=3.5 / 3, max=2.0)
+
+    def test_registry(self) -> None:
+        """Test that counters add up, gauges keep their last value and histograms are created on first use."""
+        registry = Metrics()
+        registry.increment("calls")
+        registry.increment("calls", 2)
+        registry.set_gauge("connections", 3)
+        registry.set_gauge("connections", 1)
+        registry.observe("latency", 0.25)
+
+        snapshot = registry.snapshot()
+
+        assert snapshot.counters == {"calls": 3}
+        assert snapshot.gauges == {"connections": 1}
+        assert snapshot.histograms == {"latency": HistogramSnapshot(count=1, total=0.25, mean=0.25, max=0.25)}
+
+    def test_endpoint(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that the endpoint serves a snapshot of the registry."""
+        registry = Metrics()
+        registry.increment("db.pool.exhausted")
+        registry.observe("db.pool.checkout_wait", 0.5)
+        monkeypatch.setattr("aiventure.router.core.metrics", registry)
+        app = FastAPI()
+        app.include_router(core_router)
+
+        response = TestClient(app).get("/metrics")
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "counters": {"db.pool.exhausted": 1},
+            "gauges": {},
+            "histograms": {"db.pool.checkout_wait": {"count": 1, "total": 0.5, "mean": 0.5, "max": 0.5}},
+        }
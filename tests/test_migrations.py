@@ -0,0 +1,66 @@
+"""Test the database migrations."""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from aiventure.config import settings
+
+
+# Last revision before the UUID keys can be stored as binary
+TEXT_KEYS_REVISION = "6d57858f27b4"
+
+
+def read_key_storages(db_path: Path) -> dict[str, set[str]]:
+    """Return the storage of the keys of the users and players."""
+    with sqlite3.connect(db_path) as connection:
+        return {
+            "users": {row[0] for row in connection.execute("SELECT typeof(id) FROM users")},
+            "players": {row[0] for row in connection.execute("SELECT typeof(id) || typeof(user_id) FROM players")},
+        }
+
+
+class TestMigrations:
+    """Test the alembic migrations."""
+
+    @pytest.fixture()
+    def alembic_config(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Config:
+        """Configure alembic on a new database file, without its logging configuration."""
+        monkeypatch.setattr(settings, "db_connection_str", f"sqlite+aiosqlite:///{tmp_path / 'game.db'}")
+        alembic_config = Config()
+        alembic_config.set_main_option("script_location", "migrations")
+        return alembic_config
+
+    def test_binary_keys_round_trip(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, alembic_config: Config
+    ) -> None:
+        """Test that the keys are converted to binary up to the last revision and back to text down to the first."""
+        monkeypatch.setattr(settings, "db_uuid_keys", "binary")
+        db_path = tmp_path / "game.db"
+
+        command.upgrade(alembic_config, TEXT_KEYS_REVISION)
+        with sqlite3.connect(db_path) as connection:
+            connection.execute(
+                "INSERT INTO users (id, email, password, is_admin) "
+                "VALUES ('0192a3b4-c5d6-7e8f-9a0b-1c2d3e4f5a6b', 'round-trip@test.com', 'test', 0)"
+            )
+            connection.execute(
+                "INSERT INTO players (id, name, avatar, funds, user_id) "
+                "VALUES ('0192a3b4-c5d6-7e8f-9a0b-1c2d3e4f5a6c', 'Round Trip', '', 0, "
+                "'0192a3b4-c5d6-7e8f-9a0b-1c2d3e4f5a6b')"
+            )
+
+        command.upgrade(alembic_config, "head")
+        assert read_key_storages(db_path) == {"users": {"blob"}, "players": {"blobblob"}}
+
+        command.downgrade(alembic_config, TEXT_KEYS_REVISION)
+        assert read_key_storages(db_path) == {"users": {"text"}, "players": {"texttext"}}
+
+        command.downgrade(alembic_config, "base")
+        with sqlite3.connect(db_path) as connection:
+            assert [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")] == [
+                "alembic_version"
+            ]
@@ -0,0 +1,104 @@
+"""Test that the CRUD queries are backed by indexes."""
+
+import asyncio
+from dataclasses import asdict
+from typing import Any, Awaitable, Callable
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from aiventure.db import AIModelCRUD, EmployeeCRUD, LabCRUD, PlayerCRUD, PlayerLabInvestmentLinkCRUD, UsersCRUD
+from aiventure.db.loaders import LAB_DETAIL, LEADERBOARD_ROW, PLAYER_DETAIL
+from aiventure.models import AIModelBase, FundsReasonEnum
+
+from .conftest import build_world
+
+
+CrudCall = Callable[[AsyncSession, dict[str, Any]], Awaitable[Any]]
+
+CRUD_CALLS: dict[str, CrudCall] = {
+    "users.get_by_id": lambda session, world: UsersCRUD(session).get_by_id(world["user_id"]),
+    "users.get_by_email": lambda session, world: UsersCRUD(session).get_by_email("plan@test.com"),
+    "players.get_by_id": lambda session, world: PlayerCRUD(session).get_by_id(world["player_id"]),
+    "players.get_by_id.player_detail": lambda session, world: PlayerCRUD(session).get_by_id(
+        world["player_id"], PLAYER_DETAIL
+    ),
+    "players.get_by_user_id": lambda session, world: PlayerCRUD(session).get_by_user_id(world["user_id"]),
+    "players.increment_funds": lambda session, world: PlayerCRUD(session).increment_funds(
+        world["player_id"], 1, FundsReasonEnum.INCOME
+    ),
+    "players.snapshot_funds": lambda session, world: PlayerCRUD(session).snapshot_funds(),
+    "players.read_data_by_id": lambda session, world: PlayerCRUD(session).read_data_by_id(world["player_id"]),
+    "players.read_data_by_user_id": lambda session, world: PlayerCRUD(session).read_data_by_user_id(world["user_id"]),
+    "labs.get_by_id": lambda session, world: LabCRUD(session).get_by_id(world["lab_id"]),
+    "labs.get_by_id.lab_detail": lambda session, world: LabCRUD(session).get_by_id(world["lab_id"], LAB_DETAIL),
+    "labs.get_by_player_id.leaderboard_row": lambda session, world: LabCRUD(session).get_by_player_id(
+        world["player_id"], LEADERBOARD_ROW
+    ),
+    "labs.get_by_player_id": lambda session, world: LabCRUD(session).get_by_player_id(world["player_id"]),
+    "labs.read_data_by_id": lambda session, world: LabCRUD(session).read_data_by_id(world["lab_id"]),
+    "labs.read_leaderboard": lambda session, world: LabCRUD(session).read_leaderboard(),
+    "labs.update_income": lambda session, world: LabCRUD(session).update_income(world["lab_id"]),
+    "labs.update_valuation": lambda session, world: LabCRUD(session).update_valuation(world["lab_id"]),
+    "ai_models.get_by_id": lambda session, world: AIModelCRUD(session).get_by_id(world["ai_model_id"]),
+    "ai_models.get_by_name": lambda session, world: AIModelCRUD(session).get_by_name("Plan Model"),
+    "employees.get_by_lab_id": lambda session, world: EmployeeCRUD(session).get_by_lab_id(world["lab_id"]),
+    "links.get_by_player_id": lambda session, world: PlayerLabInvestmentLinkCRUD(session).get_by_player_id(
+        world["player_id"]
+    ),
+    "links.get_by_lab_id": lambda session, world: PlayerLabInvestmentLinkCRUD(session).get_by_lab_id(world["lab_id"]),
+    "links.get_income_for_player": lambda session, world: PlayerLabInvestmentLinkCRUD(session).get_income_for_player(
+        world["player_id"]
+    ),
+}
+
+
+async def build_plan_world(async_session: async_sessionmaker[AsyncSession]) -> dict[str, Any]:
+    """Create one user owning a player, a lab and a model."""
+    world = await build_world(async_session, "Plan")
+    async with async_session() as session:
+        ai_model = await AIModelCRUD(session).create(
+            AIModelBase(name="Plan Model", ai_model_type_id=1, tech_tree_id="tech-tree", lab_id=world.lab_id)
+        )
+
+    return asdict(world) | {"ai_model_id": ai_model.id}
+
+
+async def explain_crud_call(async_engine: AsyncEngine, crud_call: CrudCall) -> list[tuple[str, list[str]]]:
+    """Run a CRUD call and return the query plan of every statement it executed."""
+    async_session = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+    world = await build_plan_world(async_session)
+
+    statements: list[tuple[str, Any]] = []
+
+    def capture(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    async with async_session() as session:
+        await crud_call(session, world)
+    event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+
+    plans = []
+    async with async_engine.connect() as connection:
+        for statement, parameters in statements:
+            result = await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plans.append((statement, [row.detail for row in result]))
+
+    return plans
+
+
+class TestQueryPlans:
+    """Test that the CRUD queries never scan a full table."""
+
+    @pytest.mark.parametrize("name", CRUD_CALLS)
+    def test_no_full_table_scan(self, async_engine: AsyncEngine, name: str) -> None:
+        """Test that every statement of the CRUD call is resolved through an index."""
+        plans = asyncio.run(explain_crud_call(async_engine, CRUD_CALLS[name]))
+
+        assert plans
+        for statement, details in plans:
+            scans = [detail for detail in details if detail.startswith("SCAN") and "USING" not in detail]
+            assert not scans, f"{name} scans a full table: {scans}\n{statement}"
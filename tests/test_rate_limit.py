@@ -0,0 +1,48 @@
+"""Test the rate limiting of the game messages."""
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+from aiventure.metrics import metrics
+from aiventure.rate_limit import RateLimiter, TokenBucket
+
+from .test_dispatch import play
+
+
+create_player = {"action": "create-player", "payload": {"name": "Player", "avatar": "a.png"}}
+
+
+class TestRateLimit:
+    """Test the token buckets and the rejection of the messages over the limits."""
+
+    def test_token_bucket(self) -> None:
+        """Test that a bucket allows its capacity at once, then its rate, holding back messages up to `max_wait`."""
+        bucket = TokenBucket(rate=2.0, capacity=2)
+        bucket.updated_at = 0.0
+
+        assert [bucket.reserve(now=0.0) for _ in range(3)] == [0.0, 0.0, None]
+        assert bucket.reserve(max_wait=0.5, now=0.0) == 0.5
+        # The reserved token is refilled first
+        assert bucket.reserve(max_wait=0.5, now=0.5) == 0.5
+        assert bucket.reserve(now=10.0) == 0.0
+        assert bucket.tokens == 1.0
+
+    def test_rejections(self, tmp_path: Path) -> None:
+        """Test that the messages over the connection or action limits get a rejection without reaching a handler."""
+        rejected = metrics.counters["game.rate_limit.rejected"]
+        messages: list[dict[str, Any] | str] = [create_player, create_player, "{", "{"]
+        responses = asyncio.run(
+            play(
+                tmp_path / "game.db",
+                messages,
+                rate_limiter=RateLimiter(0.001, 3, 0.0, {"create-player": 0.001}, 1),
+            )
+        )
+
+        assert responses[0][0]["action"] == "create-player" and responses[0][0]["error"] is None
+        assert responses[1] == [{"action": "create-player", "payload": {}, "error": "Rate limited"}]
+        assert responses[2] == [{"error": "Invalid message", "details": responses[2][0]["details"]}]
+        assert responses[3] == [{"error": "Rate limited"}]
+        assert metrics.counters["game.rate_limit.rejected"] == rejected + 1
+        assert metrics.counters["game.actions.create-player.rate_limited"] >= 1
@@ -0,0 +1,115 @@
+"""Test the lab and player responses built from column projections."""
+
+import asyncio
+import uuid
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from aiventure.database import count_queries
+from aiventure.db import AIModelCRUD, EmployeeCRUD, LabCRUD, PlayerCRUD, PlayerLabInvestmentLinkCRUD
+from aiventure.models import AIModelBase, EmployeeBase, LabBase, LabIncludeEnum, LabSummary, LocationEnum
+
+from .conftest import build_world
+
+
+async def read_responses(async_session: async_sessionmaker[AsyncSession]) -> dict[str, Any]:
+    """Create two players investing in two labs, then read the responses and count their queries."""
+    worlds = [await build_world(async_session, f"P{index}", valuation=index) for index in range(2)]
+    async with async_session() as session:
+        await AIModelCRUD(session).create(
+            AIModelBase(name="Model", ai_model_type_id=1, tech_tree_id="tech-tree", lab_id=worlds[0].lab_id)
+        )
+        await EmployeeCRUD(session).create(
+            EmployeeBase(name="Employee", salary=1, image_url="", role_id=1, quality_id=1, lab_id=worlds[1].lab_id)
+        )
+        await PlayerLabInvestmentLinkCRUD(session).create(worlds[0].player_id, worlds[1].lab_id, 0.25)
+
+    responses: dict[str, Any] = {}
+    async with async_session() as session:
+        for name, read in (
+            ("leaderboard", LabCRUD(session).read_leaderboard()),
+            ("lab", LabCRUD(session).read_data_by_id(worlds[1].lab_id)),
+            ("missing_lab", LabCRUD(session).read_data_by_id("missing")),
+            ("player", PlayerCRUD(session).read_data_by_user_id(worlds[0].user_id)),
+            ("bare_leaderboard", LabCRUD(session).read_leaderboard(include=[])),
+            ("owners_leaderboard", LabCRUD(session).read_leaderboard(include=[LabIncludeEnum.PLAYER])),
+            ("models_lab", LabCRUD(session).read_data_by_id(worlds[0].lab_id, {LabIncludeEnum.MODELS})),
+        ):
+            with count_queries() as counter:
+                responses[name] = await read
+            responses[f"{name}_queries"] = counter.count
+
+    return responses
+
+
+async def read_lab_without_owner(async_session: async_sessionmaker[AsyncSession]) -> dict[str, Any]:
+    """Create a lab whose owner does not exist, then read it with its player."""
+    async with async_session() as session:
+        lab = await LabCRUD(session).create(
+            LabBase(
+                name="Orphan Lab",
+                location=LocationEnum.US,
+                valuation=0,
+                income=0,
+                tech_tree_id="tech-tree",
+                player_id=str(uuid.uuid4()),
+            )
+        )
+        response = await LabCRUD(session).read_data_by_id(lab.id, {LabIncludeEnum.PLAYER})
+
+    return response.model_dump(mode="json") if response else {}
+
+
+class TestReadModels:
+    """Test the projection reads of the lab and player responses."""
+
+    def test_responses(self, async_session: async_sessionmaker[AsyncSession]) -> None:
+        """Test that the responses hold their relationships, with one query per relationship at most."""
+        responses = asyncio.run(read_responses(async_session))
+
+        assert [lab.name for lab in responses["leaderboard"]] == ["P1 Lab", "P0 Lab"]
+        assert [len(lab.models) for lab in responses["leaderboard"]] == [0, 1]
+        assert responses["leaderboard_queries"] == 4
+
+        lab = responses["lab"]
+        assert lab.player.name == "P1"
+        assert [employee.name for employee in lab.employees] == ["Employee"]
+        assert sorted((investor.player.name, investor.part) for investor in lab.investors) == [
+            ("P0", 0.25),
+            ("P1", 1.0),
+        ]
+        assert responses["lab_queries"] == 4
+        assert responses["missing_lab"] is None and responses["missing_lab_queries"] == 1
+
+        player = responses["player"]
+        assert [lab.name for lab in player.labs] == ["P0 Lab"]
+        assert sorted((investment.lab.name, investment.part) for investment in player.investments) == [
+            ("P0 Lab", 1.0),
+            ("P1 Lab", 0.25),
+        ]
+        assert responses["player_queries"] == 3
+
+    def test_sparse_responses(self, async_session: async_sessionmaker[AsyncSession]) -> None:
+        """Test that the relationships that are not included are neither queried nor serialized."""
+        responses = asyncio.run(read_responses(async_session))
+
+        assert [lab.model_dump().keys() for lab in responses["bare_leaderboard"]] == [set(LabSummary.model_fields)] * 2
+        assert responses["bare_leaderboard_queries"] == 1
+
+        assert [lab.player.name for lab in responses["owners_leaderboard"]] == ["P1", "P0"]
+        assert "models" not in responses["owners_leaderboard"][0].model_dump()
+        assert responses["owners_leaderboard_queries"] == 1
+
+        lab = responses["models_lab"].model_dump(mode="json")
+        assert [model["name"] for model in lab["models"]] == ["Model"]
+        assert not {"employees", "investors", "player"} & lab.keys()
+        assert responses["models_lab_queries"] == 2
+
+    def test_lab_without_owner(self, async_session: async_sessionmaker[AsyncSession]) -> None:
+        """Test that an included player is serialized as null for a lab without owner, rather than left out."""
+        lab = asyncio.run(read_lab_without_owner(async_session))
+
+        assert lab["name"] == "Orphan Lab"
+        assert lab["player"] is None
+        assert not {"employees", "models", "investors"} & lab.keys()
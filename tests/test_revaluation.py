@@ -0,0 +1,44 @@
+"""Test the bulk revaluation of the labs."""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlmodel import select
+
+from aiventure.models import Lab
+from aiventure.revaluation import RevaluationConfig, RevaluationReport, revalue_labs
+from aiventure.seed import SeedConfig, seed_world
+
+
+pytest.importorskip("numpy")
+
+
+async def revalue_seeded_world(db_connection_str: str) -> tuple[RevaluationReport, RevaluationReport, list[Lab]]:
+    """Seed a small world, revalue it twice and load the labs back through the ORM."""
+    await seed_world(SeedConfig(players=50, seed=1), db_connection_str)
+    first = await revalue_labs(RevaluationConfig(chunk_size=16), db_connection_str)
+    second = await revalue_labs(RevaluationConfig(chunk_size=16, recount=True), db_connection_str)
+
+    async_engine = create_async_engine(db_connection_str)
+    async with AsyncSession(async_engine) as session:
+        labs = list((await session.execute(select(Lab))).scalars().all())
+    await async_engine.dispose()
+
+    return first, second, labs
+
+
+class TestRevaluation:
+    """Test the bulk revaluation."""
+
+    def test_matches_lab_formulas(self, tmp_path: Path) -> None:
+        """Test that the array formulas give the same metrics as the lab methods, and only write changes."""
+        first, second, labs = asyncio.run(revalue_seeded_world(f"sqlite+aiosqlite:///{tmp_path / 'world.db'}"))
+
+        assert first.labs == second.labs == len(labs)
+        assert first.updated > 0
+        assert second.updated == 0
+        for lab in labs:
+            assert lab.income == pytest.approx(lab.calculate_income())
+            assert lab.valuation == pytest.approx(lab.calculate_valuation())
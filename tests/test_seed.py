@@ -0,0 +1,98 @@
+"""Test the synthetic world generator."""
+
+import asyncio
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aiventure.config import settings
+from aiventure.database import create_engine
+from aiventure.db import LabCRUD
+from aiventure.seed import Distribution, SeedConfig, seed_world
+
+
+TABLES = ("users", "players", "labs", "player_lab_investment_link", "ai_models", "employees")
+AGGREGATES = "model_count, employee_count, employee_quality_sum, investor_count"
+
+# Every player owns a lab with two models and two employees, and invests in up to two other labs
+CONFIG = SeedConfig(
+    players=6,
+    labs_per_player=1,
+    models_per_lab=2,
+    employees_per_lab=2,
+    investments_per_player=2,
+    distribution=Distribution.CONSTANT,
+    batch_size=5,
+    seed=42,
+)
+
+
+def read_tables(db_path: Path) -> dict[str, list[tuple[Any, ...]]]:
+    """Read every generated row, leaving out the salted password hashes."""
+    with sqlite3.connect(db_path) as connection:
+        tables = {table: connection.execute(f"SELECT * FROM {table} ORDER BY rowid").fetchall() for table in TABLES}
+        tables["users"] = connection.execute("SELECT id, email, is_admin FROM users ORDER BY rowid").fetchall()
+        return tables
+
+
+def read_aggregates(db_path: Path) -> list[tuple[Any, ...]]:
+    """Read the aggregates of every lab."""
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute(f"SELECT id, {AGGREGATES} FROM labs ORDER BY rowid").fetchall()
+
+
+async def recount_aggregates(db_connection_str: str) -> None:
+    """Recompute the aggregates of every lab from the relationship tables."""
+    async_engine = create_engine(db_connection_str)
+    try:
+        async with AsyncSession(async_engine) as session:
+            await LabCRUD(session).recount_aggregates()
+    finally:
+        await async_engine.dispose()
+
+
+class TestSeed:
+    """Test the world seeder."""
+
+    @pytest.fixture(autouse=True)
+    def uuid4_keys(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Generate random keys, which only depend on the seed unlike the time-ordered ones."""
+        monkeypatch.setattr(settings, "db_uuid_version", 4)
+
+    def test_seed_world(self, tmp_path: Path) -> None:
+        """Test that the world has the configured size, consistent aggregates and resolvable foreign keys."""
+        db_connection_str = f"sqlite+aiosqlite:///{tmp_path / 'world.db'}"
+
+        report = asyncio.run(seed_world(CONFIG, db_connection_str))
+
+        tables = read_tables(tmp_path / "world.db")
+        assert report.rows == {table: len(rows) for table, rows in tables.items()}
+        assert {table: report.rows[table] for table in TABLES if table != "player_lab_investment_link"} == {
+            "users": 6,
+            "players": 6,
+            "labs": 6,
+            "ai_models": 12,
+            "employees": 12,
+        }
+        assert 6 < report.rows["player_lab_investment_link"] <= 6 + 6 * 2
+
+        aggregates = read_aggregates(tmp_path / "world.db")
+        assert {(model_count, employee_count) for _, model_count, employee_count, _, _ in aggregates} == {(2, 2)}
+        assert sum(investor_count for *_, investor_count in aggregates) == report.rows["player_lab_investment_link"]
+        asyncio.run(recount_aggregates(db_connection_str))
+        assert read_aggregates(tmp_path / "world.db") == aggregates
+
+        # The reference data has dangling keys of its own, as the location modifiers are not defined yet
+        with sqlite3.connect(tmp_path / "world.db") as connection:
+            for table in TABLES:
+                assert connection.execute(f"PRAGMA foreign_key_check({table})").fetchall() == []
+
+    def test_seed_is_reproducible(self, tmp_path: Path) -> None:
+        """Test that the same seed generates the same world."""
+        for name in ("first.db", "second.db"):
+            asyncio.run(seed_world(CONFIG, f"sqlite+aiosqlite:///{tmp_path / name}"))
+
+        assert read_tables(tmp_path / "first.db") == read_tables(tmp_path / "second.db")
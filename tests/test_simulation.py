@@ -0,0 +1,90 @@
+"""Test the offline economy simulator."""
+
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from aiventure.constants import BASE_PLAYER_FUNDS, CREATE_LAB_COST
+from aiventure.db import AIModelCRUD, LabCRUD
+from aiventure.models import AIModelBase, Lab, LocationEnum
+from aiventure.simulation import EconomySimulator, Policy, SimulationConfig, simulate
+
+from .conftest import build_world
+
+
+pytest.importorskip("numpy")
+
+
+async def build_production_lab(async_session: async_sessionmaker[AsyncSession]) -> tuple[float, float]:
+    """Create a lab and a model through the CRUDs, as the game does, and return the income and valuation of the lab."""
+    lab_id = (await build_world(async_session, "Production")).lab_id
+    async with async_session() as session:
+        await AIModelCRUD(session).create(
+            AIModelBase(name="Model", ai_model_type_id=1, tech_tree_id="tech-tree", lab_id=lab_id)
+        )
+        await LabCRUD(session).update_income(lab_id)
+        lab = await LabCRUD(session).update_valuation(lab_id)
+
+    assert lab is not None
+    return lab.income, lab.valuation
+
+
+class TestSimulation:
+    """Test the economy simulator."""
+
+    def test_idle_players_keep_their_funds(self) -> None:
+        """Test that players who never spend end with their initial funds and no labs."""
+        report = simulate(SimulationConfig(players=20, ticks=10, policies={Policy.IDLE: 1.0}, seed=1))
+
+        assert report.labs == 0
+        assert report.funds.mean == report.funds.max == BASE_PLAYER_FUNDS
+        assert report.funds.gini == 0
+
+    def test_expanders_are_capped_and_reproducible(self) -> None:
+        """Test that expanders stop at the labs limit and that a seed gives the same outcome."""
+        config = SimulationConfig(
+            players=50, ticks=20, policies={Policy.EXPANDER: 1.0}, max_labs_per_player=3, sample_every=5, seed=7
+        )
+        first, second = simulate(config), simulate(config)
+
+        assert first.labs == 50 * 3
+        assert first.funds.mean == BASE_PLAYER_FUNDS - 3 * CREATE_LAB_COST
+        assert first.valuation == second.valuation
+        assert len(first.churn) == 3
+
+    def test_metrics_match_lab_formulas(self) -> None:
+        """Test that the simulated labs, hiring employees, are valued with the formulas of the game."""
+        config = SimulationConfig(players=30, ticks=1, policies={Policy.BALANCED: 1.0}, employees_per_lab=5.0, seed=3)
+        simulator = EconomySimulator(config)
+        for _ in range(30):
+            simulator.tick()
+        income, valuation = simulator.metrics()
+
+        assert simulator.model_count[: simulator.n_labs].sum() > 0
+        for index in range(simulator.n_labs):
+            lab = Lab(
+                name="Lab",
+                location=simulator.locations[simulator.location[index]],
+                valuation=0,
+                income=income[index],
+                tech_tree_id="",
+                player_id="",
+                model_count=simulator.model_count[index],
+                employee_count=simulator.employee_count[index],
+                employee_quality_sum=simulator.employee_quality_sum[index],
+                investor_count=1,
+            )
+            assert income[index] == pytest.approx(lab.calculate_income())
+            assert valuation[index] == pytest.approx(lab.calculate_valuation())
+
+    def test_ticks_match_production_labs(self, async_session: async_sessionmaker[AsyncSession]) -> None:
+        """Test that by default a simulated lab is valued like a lab created in the game, which has no employees."""
+        simulator = EconomySimulator(SimulationConfig(players=1, ticks=2, policies={Policy.BUILDER: 1.0}, seed=5))
+        simulator.tick()
+        simulator.location[0] = simulator.locations.index(LocationEnum.US.value)
+        simulator.tick()
+        income, valuation = simulator.metrics()
+
+        assert (simulator.n_labs, simulator.model_count[0], simulator.employee_count[0]) == (1, 1, 0)
+        assert (income[0], valuation[0]) == pytest.approx(asyncio.run(build_production_lab(async_session)))
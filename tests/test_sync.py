@@ -0,0 +1,78 @@
+"""Test the delta synchronization of the player and lab state."""
+
+from typing import Any
+
+from aiventure.sync import Entities, StateSync, flatten
+
+
+def lab(valuation: float, models: list[str]) -> dict[str, Any]:
+    """Build a dumped lab response."""
+    return {
+        "id": "lab",
+        "name": "Lab Zero",
+        "valuation": valuation,
+        "models": [{"id": model, "name": model.upper()} for model in models],
+        "investors": [{"player": {"id": "owner", "name": "Owner"}, "part": 1.0}],
+    }
+
+
+def apply(state: Entities, upserts: Entities, removals: list[str]) -> Entities:
+    """Apply a patch the way a client does."""
+    patched = {key: {**state.get(key, {}), **fields} for key, fields in upserts.items()}
+    return {key: fields for key, fields in (state | patched).items() if key not in removals}
+
+
+class TestStateSync:
+    """Test the state synchronization."""
+
+    def test_flatten(self) -> None:
+        """Test that nested lists of objects become child entities keyed by id."""
+        assert flatten("labs/lab", lab(10.0, ["a"])) == {
+            "labs/lab": {"id": "lab", "name": "Lab Zero", "valuation": 10.0},
+            "labs/lab/models/a": {"id": "a", "name": "A"},
+            "labs/lab/investors/owner": {"player": {"id": "owner", "name": "Owner"}, "part": 1.0},
+        }
+
+    def test_patches_contain_only_changes(self) -> None:
+        """Test that after a full state, patches only carry the changed fields and entities."""
+        sync = StateSync()
+        full = sync.update("labs/lab", flatten("labs/lab", lab(10.0, ["a"])))
+        assert full is not None and full.base is None
+        client = full.upserts
+        sync.ack(full.version)
+
+        assert sync.update("labs/lab", flatten("labs/lab", lab(10.0, ["a"]))) is None
+
+        patch = sync.update("labs/lab", flatten("labs/lab", lab(12.5, ["b"])))
+        assert patch is not None and patch.base == full.version
+        assert patch.upserts == {"labs/lab": {"valuation": 12.5}, "labs/lab/models/b": {"id": "b", "name": "B"}}
+        assert patch.removals == ["labs/lab/models/a"]
+        assert apply(client, patch.upserts, patch.removals) == sync.current
+
+    def test_patches_are_relative_to_the_acked_version(self) -> None:
+        """Test that unacknowledged versions are folded into the next patch, and that acking 0 requests a full state."""
+        sync = StateSync()
+        full = sync.update("labs/lab", flatten("labs/lab", lab(10.0, [])))
+        assert full is not None
+        sync.ack(full.version)
+
+        sync.update("labs/lab", flatten("labs/lab", lab(11.0, ["a"])))
+        patch = sync.update("labs/lab", flatten("labs/lab", lab(12.0, ["a"])))
+        assert patch is not None and patch.base == full.version
+        assert apply(full.upserts, patch.upserts, patch.removals) == sync.current
+
+        sync.ack(0)
+        resync = sync.update("labs/lab", flatten("labs/lab", lab(12.0, ["a"])))
+        assert resync is not None and resync.base is None and resync.upserts == sync.current
+
+    def test_periodic_full_state(self) -> None:
+        """Test that a full state is sent every `full_resync_interval` versions."""
+        sync = StateSync(full_resync_interval=3)
+        bases = []
+        for valuation in range(7):
+            patch = sync.update("labs/lab", flatten("labs/lab", lab(float(valuation), [])))
+            assert patch is not None
+            sync.ack(patch.version)
+            bases.append(patch.base)
+
+        assert bases == [None, 1, 2, None, 4, 5, None]
@@ -0,0 +1,166 @@
+"""Test the write-behind buffer."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlmodel import SQLModel
+
+from aiventure.config import settings
+from aiventure.db import LabCRUD, PlayerCRUD
+from aiventure.models import FundsReasonEnum
+from aiventure.write_buffer import WriteBehindBuffer, WriteJournal, write_buffer
+
+from .conftest import build_world
+
+
+async def read_stored(async_session: async_sessionmaker[AsyncSession], table: str, key: str, column: str) -> Any:
+    """Read a value as stored in the database, bypassing the buffer."""
+    columns = SQLModel.metadata.tables[table].c
+    async with async_session() as session:
+        result = await session.execute(select(columns[column]).where(columns.id == key))
+        return result.scalar_one()
+
+
+async def read_ledger_total(async_session: async_sessionmaker[AsyncSession], player_id: str) -> float:
+    """Sum the funds ledger entries stored for a player."""
+    columns = SQLModel.metadata.tables["funds_ledger"].c
+    async with async_session() as session:
+        result = await session.execute(select(func.sum(columns.amount)).where(columns.player_id == player_id))
+        return result.scalar_one() or 0.0
+
+
+async def buffered_updates(async_session: async_sessionmaker[AsyncSession]) -> list[Any]:
+    """Update funds and income through the CRUDs, reading loaded and stored values before and after a flush."""
+    world = await build_world(async_session, "Buffer", funds=100)
+    player_id, lab_id = world.player_id, world.lab_id
+
+    await write_buffer.start(async_session)
+    async with async_session() as session:
+        await PlayerCRUD(session).increment_funds(player_id, 50, FundsReasonEnum.INCOME)
+        await PlayerCRUD(session).decrement_funds(player_id, 30, FundsReasonEnum.CREATE_MODEL)
+        await write_buffer.set_lab_metrics(lab_id, income=12.5)
+        player = await PlayerCRUD(session).get_by_id(player_id)
+        lab = await LabCRUD(session).get_by_id(lab_id)
+        player_data = await PlayerCRUD(session).read_data_by_id(player_id)
+        lab_data = await LabCRUD(session).read_data_by_id(lab_id)
+
+    values = [
+        player.funds if player else None,
+        lab.income if lab else None,
+        player_data.funds if player_data else None,
+        lab_data.income if lab_data else None,
+        await read_ledger_total(async_session, player_id),
+        await read_stored(async_session, "labs", lab_id, "income"),
+    ]
+    await write_buffer.stop()
+    values += [
+        await read_ledger_total(async_session, player_id),
+        await read_stored(async_session, "labs", lab_id, "income"),
+    ]
+
+    return values
+
+
+async def read_funds_during_flush(async_session: async_sessionmaker[AsyncSession]) -> list[float | None]:
+    """Buffer a funds decrement, then read the funds before a flush, while it waits for its session and after it."""
+    player_id = (await build_world(async_session, "Buffer", funds=1000)).player_id
+    release = asyncio.Event()
+
+    @asynccontextmanager
+    async def blocked_session() -> AsyncIterator[AsyncSession]:
+        await release.wait()
+        async with async_session() as session:
+            yield session
+
+    async def read_funds() -> float | None:
+        async with async_session() as session:
+            player = await PlayerCRUD(session).get_by_id(player_id)
+        return player.funds if player else None
+
+    await write_buffer.start(async_session)
+    await write_buffer.add_funds(player_id, -900, FundsReasonEnum.CREATE_LAB)
+    values = [await read_funds()]
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(write_buffer, "_async_session", blocked_session)
+        flush = asyncio.create_task(write_buffer.flush())
+        await asyncio.sleep(0)
+        values.append(await read_funds())
+        release.set()
+        await flush
+
+    values.append(await read_funds())
+    await write_buffer.stop()
+    return values
+
+
+class Crash(Exception):
+    """Simulated death of the process."""
+
+
+def crash(*_: Any) -> None:
+    """Kill the process."""
+    raise Crash()
+
+
+async def crash_and_replay(async_session: async_sessionmaker[AsyncSession], after_commit: bool) -> float:
+    """Buffer funds updates, lose the process before a flush or right after its commit, then replay the journal."""
+    player_id = (await build_world(async_session, "Buffer", funds=100)).player_id
+
+    crashed_buffer = WriteBehindBuffer()
+    await crashed_buffer.start(async_session)
+    await crashed_buffer.add_funds(player_id, 40, FundsReasonEnum.INCOME)
+    await crashed_buffer.add_funds(player_id, 2, FundsReasonEnum.INCOME)
+    if after_commit:
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            monkeypatch.setattr(WriteJournal, "commit", crash)
+            with pytest.raises(Crash):
+                await crashed_buffer.flush()
+
+    recovered_buffer = WriteBehindBuffer()
+    await recovered_buffer.start(async_session)
+    await recovered_buffer.stop()
+    return await read_ledger_total(async_session, player_id)
+
+
+class TestWriteBehindBuffer:
+    """Test the write-behind buffer."""
+
+    def test_reads_see_pending_updates(
+        self, monkeypatch: pytest.MonkeyPatch, async_session: async_sessionmaker[AsyncSession]
+    ) -> None:
+        """Test that pending updates are visible to reads and only stored once flushed."""
+        monkeypatch.setattr(write_buffer, "enabled", True)
+        monkeypatch.setattr(settings, "write_behind_journal_path", None)
+
+        assert asyncio.run(buffered_updates(async_session)) == [120, 12.5, 120, 12.5, 0, 0, 20, 12.5]
+
+    def test_reads_during_flush(
+        self, monkeypatch: pytest.MonkeyPatch, async_session: async_sessionmaker[AsyncSession]
+    ) -> None:
+        """Test that the updates being flushed are still visible to reads until they are committed."""
+        monkeypatch.setattr(write_buffer, "enabled", True)
+        monkeypatch.setattr(settings, "write_behind_flush_interval_ms", 60_000)
+        monkeypatch.setattr(settings, "write_behind_journal_path", None)
+
+        assert asyncio.run(read_funds_during_flush(async_session)) == [100, 100, 100]
+
+    @pytest.mark.parametrize("after_commit", [False, True])
+    def test_journal_replay(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: Path,
+        async_session: async_sessionmaker[AsyncSession],
+        after_commit: bool,
+    ) -> None:
+        """Test that the journal recovers the operations lost before a flush, and skips those flushed before a crash."""
+        monkeypatch.setattr(settings, "write_behind_enabled", True)
+        monkeypatch.setattr(settings, "write_behind_flush_interval_ms", 60_000)
+        monkeypatch.setattr(settings, "write_behind_journal_path", str(tmp_path / "write_behind.jsonl"))
+
+        assert asyncio.run(crash_and_replay(async_session, after_commit)) == 42